@@ -0,0 +1,401 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import sqlite3
+import threading
+from datetime import datetime
+
+from Config import load_app_config
+from ArticleLister import ArticleLister, known_page_size, DEFAULT_CONCURRENCY
+
+# --- 文章列表本地缓存 ---
+# 每次任务都要通过限速的 /api/v1/article 接口逐页获取公众号的全部历史文章列表，大号仅列表就要很久。
+# 这里把文章元数据（标题、链接、aid、发布时间、摘要）按 fakeid 保存在本地SQLite中：
+#   <下载文件夹>/_article_index.sqlite
+# 新鲜度策略：
+#   - 已同步到最早一篇文章、且距上次刷新不超过 article_index_ttl 秒的公众号，直接使用本地列表，不访问接口
+#   - 否则从第一页开始向接口获取，直到遇到本地已有的文章为止（只获取新发布的文章），
+#     其余页从本地读取；本地还没有同步到最早一篇时，超出本地部分继续向接口获取
+# 本地列表总是从最新一篇开始连续保存的，因此本地的第 N 篇与接口的 begin=N 对应。
+# 本地尚未同步到最早一篇时，先用 ArticleLister 并行获取剩余的全部列表，再从本地分页。
+# 任务指定了发布时间范围（PublishWindow）时，获取到早于范围起点的文章即停止，不再同步更早的列表。
+
+INDEX_FILENAME = '_article_index.sqlite'
+DEFAULT_TTL = 6 * 3600
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+class ArticleIndex:
+    """按公众号保存的文章元数据"""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS articles (
+                fakeid TEXT NOT NULL,
+                link TEXT NOT NULL,
+                aid TEXT,
+                title TEXT,
+                digest TEXT,
+                create_time INTEGER,
+                fetched_at TEXT,
+                PRIMARY KEY (fakeid, link)
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_articles_time ON articles (fakeid, create_time DESC)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_articles_link ON articles (link)")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS accounts (
+                fakeid TEXT PRIMARY KEY,
+                complete INTEGER NOT NULL DEFAULT 0,
+                refreshed_at REAL
+            )
+        """)
+        self.conn.commit()
+
+    # --- 读写 ---
+
+    def merge(self, fakeid, articles):
+        """保存（或更新）一批文章，返回其中新增的篇数"""
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        added = 0
+        with self.lock:
+            for article in articles:
+                link = article.get('link')
+                if not link:
+                    continue
+                cursor = self.conn.execute(
+                    "INSERT OR IGNORE INTO articles (fakeid, link, aid, title, digest, create_time, fetched_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (fakeid, link, str(article.get('aid', '')), article.get('title', ''),
+                     article.get('digest', ''), int(article.get('create_time') or 0), now)
+                )
+                added += cursor.rowcount
+            self.conn.commit()
+        return added
+
+    def known_links(self, fakeid, links):
+        """links 中本地已有的链接"""
+        links = [link for link in links if link]
+        if not links:
+            return set()
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT link FROM articles WHERE fakeid = ? AND link IN ({','.join('?' * len(links))})",
+                [fakeid] + links
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def count(self, fakeid, start=None, end=None):
+        """公众号的文章数；指定 start / end（发布时间戳，end不含）时只统计该范围内的文章"""
+        sql, params = "SELECT COUNT(*) FROM articles WHERE fakeid = ?", [fakeid]
+        if start is not None:
+            sql += " AND create_time >= ?"
+            params.append(start)
+        if end is not None:
+            sql += " AND create_time < ?"
+            params.append(end)
+        with self.lock:
+            return self.conn.execute(sql, params).fetchone()[0]
+
+    def oldest_time(self, fakeid):
+        """本地最早一篇文章的发布时间戳，没有文章时返回None"""
+        with self.lock:
+            return self.conn.execute("SELECT MIN(create_time) FROM articles WHERE fakeid = ?", (fakeid,)).fetchone()[0]
+
+    def page(self, fakeid, begin=0, count=20):
+        """按发布时间从新到旧分页读取，返回与接口相同格式的文章字典列表"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT aid, title, link, digest, create_time FROM articles WHERE fakeid = ? "
+                "ORDER BY create_time DESC, rowid ASC LIMIT ? OFFSET ?",
+                (fakeid, count, begin)
+            ).fetchall()
+        return [{'aid': aid, 'title': title, 'link': link, 'digest': digest, 'create_time': create_time}
+                for aid, title, link, digest, create_time in rows]
+
+    def lookup(self, link):
+        """根据链接查询文章元数据，不存在时返回None"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT fakeid, aid, title, digest, create_time FROM articles WHERE link = ? LIMIT 1", (link,)
+            ).fetchone()
+        if row is None:
+            return None
+        fakeid, aid, title, digest, create_time = row
+        return {'fakeid': fakeid, 'aid': aid, 'title': title, 'link': link, 'digest': digest, 'create_time': create_time}
+
+    # --- 同步状态 ---
+
+    def get_account(self, fakeid):
+        """返回 (是否已同步到最早一篇, 上次刷新时间戳或None)"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT complete, refreshed_at FROM accounts WHERE fakeid = ?", (fakeid,)
+            ).fetchone()
+        return (bool(row[0]), row[1]) if row else (False, None)
+
+    def mark_refreshed(self, fakeid, complete=None):
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO accounts (fakeid, complete, refreshed_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(fakeid) DO UPDATE SET refreshed_at = excluded.refreshed_at, "
+                "complete = COALESCE(?, accounts.complete)",
+                (fakeid, int(bool(complete)), time.time(), None if complete is None else int(complete))
+            )
+            self.conn.commit()
+
+    def stats(self, fakeid):
+        complete, refreshed_at = self.get_account(fakeid)
+        return {
+            'fakeid': fakeid,
+            'articles': self.count(fakeid),
+            'complete': complete,
+            'refreshed_at': datetime.fromtimestamp(refreshed_at).strftime("%Y-%m-%d %H:%M:%S") if refreshed_at else None,
+        }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class PublishWindow:
+    """
+    任务的发布时间范围（含起止日期两端，YYYY-MM-DD，可只指定一端），用文章列表中的 create_time 判断
+    未指定任何一端时不过滤
+    """
+
+    def __init__(self, start_date=None, end_date=None):
+        self.start_date = start_date or None
+        self.end_date = end_date or None
+        self.start = self._timestamp(self.start_date) if self.start_date else None
+        # 结束日期当天的文章也在范围内
+        self.end = self._timestamp(self.end_date) + 86400 if self.end_date else None
+        if self.start is not None and self.end is not None and self.start >= self.end:
+            raise ValueError(f"开始日期 {self.start_date} 晚于结束日期 {self.end_date}")
+
+    @staticmethod
+    def _timestamp(date_text):
+        try:
+            return int(datetime.strptime(date_text.strip(), "%Y-%m-%d").timestamp())
+        except ValueError:
+            raise ValueError(f"日期格式应为 YYYY-MM-DD: {date_text}")
+
+    def __bool__(self):
+        return self.start is not None or self.end is not None
+
+    def __str__(self):
+        return f"{self.start_date or '最早'} 至 {self.end_date or '最新'}"
+
+    def contains(self, article):
+        create_time = article.get('create_time')
+        if not create_time:
+            # 没有发布时间的文章不过滤
+            return True
+        create_time = int(create_time)
+        return (self.start is None or create_time >= self.start) and (self.end is None or create_time < self.end)
+
+    def split(self, page):
+        """
+        返回 (页中范围内的文章, 是否已早于范围起点)
+        列表从新到旧，页的最后一篇早于起点时之后的页都在范围外，不必再翻页（只看最后一篇，避免置顶文章误判）
+        """
+        if not self:
+            return list(page), False
+        inside = [article for article in page if self.contains(article)]
+        past = self.start is not None and bool(page) and int(page[-1].get('create_time') or 0) < self.start
+        return inside, past
+
+
+def unpinned_articles(page):
+    """
+    去掉页中的置顶文章：接口标记为置顶的（is_pinned/is_top），以及发布时间早于其后某篇文章的
+    （列表按从新到旧排列，置顶的旧文章会排在新文章前面）
+    """
+    result = []
+    newest_after = 0
+    for article in reversed(page):
+        create_time = int(article.get('create_time') or 0)
+        pinned = article.get('is_pinned') or article.get('is_top') or (create_time and create_time < newest_after)
+        if not pinned:
+            result.append(article)
+        newest_after = max(newest_after, create_time)
+    result.reverse()
+    return result
+
+
+class ArticleListSource:
+    """
+    任务中代替逐页调用 get_articles_with_begin：
+    source = ArticleListSource(fakeid, token, output_dir)
+    articles = source.get_page(begin, 20)
+    """
+
+    def __init__(self, fakeid, token=None, output_dir=None, index=None, ttl=None, fetch=None,
+                 concurrency=DEFAULT_CONCURRENCY, task_status=None, window=None):
+        from WeChat import get_articles_with_begin
+        self.fakeid = fakeid
+        self.token = token
+        self.index = index if index is not None else get_article_index_for(output_dir)
+        self.ttl = DEFAULT_TTL if ttl is None else ttl
+        self.fetch = fetch or get_articles_with_begin
+        self.concurrency = concurrency
+        self.task_status = task_status
+        self.window = window or PublishWindow()
+        self.head_checked = False
+        self.stats = {'remote_pages': 0, 'local_pages': 0, 'new_articles': 0, 'page_size': None, 'list_seconds': 0.0}
+
+    def _fetch(self, begin, count):
+        self.stats['remote_pages'] += 1
+        return self.fetch(self.fakeid, begin, count, self.token)
+
+    def _refresh_head(self, count):
+        """
+        从第一页开始获取，直到某一页的文章（置顶文章除外）都已在本地；新文章一次性写入，保证本地列表从最新一篇开始连续。
+        置顶的旧文章总在第一页，只凭"页中有已知文章"就停止会漏掉第一页之后的新文章
+        """
+        complete, refreshed_at = self.index.get_account(self.fakeid)
+        if complete and refreshed_at and time.time() - refreshed_at < self.ttl:
+            print(f"文章列表本地缓存仍在有效期内（{self.index.count(self.fakeid)} 篇），不访问接口")
+            return True
+        if self.index.count(self.fakeid) == 0:
+            # 本地还没有该公众号的文章：边处理边逐页向接口获取并保存
+            return True
+
+        fresh = []
+        begin = 0
+        reached_end = False
+        # 每页数量尚未确认时，不足一页的页可能只是接口上限，要等到空页才算到了最后一篇
+        confirmed = known_page_size() is not None
+        count = known_page_size(count)
+        while True:
+            articles = self._fetch(begin, count)
+            if articles is None:
+                # 接口失败时只要本地有数据就继续使用本地列表
+                return self.index.count(self.fakeid) > 0
+            known = self.index.known_links(self.fakeid, [a.get('link') for a in articles])
+            fresh.extend(a for a in articles if a.get('link') not in known)
+            unpinned = unpinned_articles(articles)
+            if unpinned and all(a.get('link') in known for a in unpinned):
+                break
+            if not articles or (confirmed and len(articles) < count):
+                reached_end = True
+                break
+            begin += len(articles)
+
+        self.stats['new_articles'] += self.index.merge(self.fakeid, fresh)
+        self.index.mark_refreshed(self.fakeid, complete=True if reached_end else None)
+        print(f"文章列表已更新：新增 {self.stats['new_articles']} 篇，本地共 {self.index.count(self.fakeid)} 篇")
+        return True
+
+    def _sync_tail(self):
+        """本地尚未同步到最早一篇时，并行获取剩余的全部文章列表"""
+        start = self.index.count(self.fakeid)
+        started = time.perf_counter()
+        lister = ArticleLister(
+            self.fetch, self.fakeid, self.token, self.concurrency,
+            should_continue=lambda: self.task_status is None or self.task_status.get('running', True),
+            stop_before=self.window.start
+        )
+        articles, reached_end = lister.list_from(start)
+        elapsed = time.perf_counter() - started
+        self.stats['remote_pages'] += lister.stats['calls']
+        self.stats['page_size'] = lister.stats['page_size']
+        self.stats['list_seconds'] = round(self.stats['list_seconds'] + elapsed, 2)
+        self.stats['new_articles'] += self.index.merge(self.fakeid, articles)
+        if reached_end:
+            self.index.mark_refreshed(self.fakeid, complete=True)
+        if lister.stats['reached_window']:
+            outcome = f"已到发布时间范围起点 {self.window.start_date}"
+        else:
+            outcome = '完成' if reached_end else '中断'
+        print(f"文章列表获取{outcome}：新获取 {len(articles)} 篇，"
+              f"调用接口 {lister.stats['calls']} 次，耗时 {elapsed:.1f} 秒")
+
+    def known_total(self):
+        """
+        本地列表已覆盖任务范围时返回需要处理的总篇数（指定了发布时间范围时只统计范围内的文章），
+        否则返回None（下载接口不返回总数）
+        """
+        if self.index is None:
+            return None
+        complete = self.index.get_account(self.fakeid)[0]
+        if not complete:
+            oldest = self.index.oldest_time(self.fakeid)
+            if self.window.start is None or oldest is None or oldest >= self.window.start:
+                return None
+        return self.index.count(self.fakeid, self.window.start, self.window.end)
+
+    def get_page(self, begin=0, count=20):
+        """返回第 begin 篇开始的 count 篇文章（从新到旧），获取失败时返回None"""
+        if self.index is None:
+            return self._fetch(begin, count)
+
+        if not self.head_checked:
+            self.head_checked = True
+            if not self._refresh_head(count):
+                return None
+            if not self.index.get_account(self.fakeid)[0]:
+                self._sync_tail()
+
+        local_count = self.index.count(self.fakeid)
+        complete, _ = self.index.get_account(self.fakeid)
+        if begin + count <= local_count or (complete and begin < local_count):
+            self.stats['local_pages'] += 1
+            return self.index.page(self.fakeid, begin, count)
+        if complete:
+            return []
+
+        # 并行获取中断时（接口持续限流等），超出本地的部分逐页向接口获取并保存
+        articles = self._fetch(begin, count)
+        if articles is None:
+            return None
+        self.stats['new_articles'] += self.index.merge(self.fakeid, articles)
+        if len(articles) < count:
+            self.index.mark_refreshed(self.fakeid, complete=True)
+        return articles
+
+
+def get_index_path(download_folder):
+    """
+    文章列表缓存的位置：优先使用 app_config.json 中的 article_index_path，否则放在下载文件夹下
+    """
+    app_config = load_app_config()
+    if app_config.get('article_index_path'):
+        return app_config['article_index_path']
+    return os.path.join(download_folder, INDEX_FILENAME)
+
+
+def get_article_index(path):
+    """获取（必要时打开）指定路径的索引，同一路径共用一个实例"""
+    path = os.path.abspath(path)
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = ArticleIndex(path)
+        return _indexes[path]
+
+
+def get_article_index_for(output_dir):
+    """获取下载目录对应的索引；app_config.json 中关闭了 enable_article_index 时返回None"""
+    if not output_dir or not load_app_config().get('enable_article_index', True):
+        return None
+    # 公众号目录的上一级为下载文件夹
+    return get_article_index(get_index_path(os.path.dirname(os.path.abspath(output_dir))))
+
+
+def create_article_source(fakeid, token, output_dir, task_status=None, window=None):
+    """根据应用配置创建文章列表来源，window 为任务的发布时间范围（PublishWindow）"""
+    app_config = load_app_config()
+    return ArticleListSource(
+        fakeid, token, output_dir,
+        ttl=app_config.get('article_index_ttl', DEFAULT_TTL),
+        concurrency=app_config.get('list_concurrency', DEFAULT_CONCURRENCY),
+        task_status=task_status,
+        window=window
+    )
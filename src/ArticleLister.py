@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from Resilience import backoff_delay
+
+# --- 并行获取文章列表 ---
+# 原来的任务按固定的 size=20 一页一页串行获取文章列表，大号的完整列表需要上百次往返。
+# 这里先用较大的 size 试探接口实际接受的每页数量（接口可能只返回前若干篇），
+# 然后同时请求后面的若干页，直到某一页不足一页为止。
+# 请求失败（接口限流等）时并发数减半并退避重试；并发数降到1仍连续失败则停止，
+# 已获取的从头开始连续的部分仍然有效。
+# 指定 stop_before（发布时间戳）时，某一页的最后一篇（该页最早的一篇）早于它即停止，不再获取更早的文章。
+
+# 试探每页数量时依次尝试的值
+PAGE_SIZE_CANDIDATES = (100, 50, 20)
+DEFAULT_CONCURRENCY = 4
+MAX_FAILURES = 3
+
+# 已确定的每页数量（同一接口的所有公众号相同）
+_discovered_page_size = None
+_discovered_lock = threading.Lock()
+
+
+def known_page_size(default=None):
+    """已确定的每页数量，尚未确定时返回 default"""
+    with _discovered_lock:
+        return _discovered_page_size or default
+
+
+class ArticleLister:
+    """按接口接受的最大每页数量、有限并发地获取文章列表"""
+
+    def __init__(self, fetch, fakeid, token=None, concurrency=DEFAULT_CONCURRENCY, should_continue=None,
+                 stop_before=None):
+        self.fetch = fetch
+        self.fakeid = fakeid
+        self.token = token
+        self.concurrency = max(1, int(concurrency))
+        self.should_continue = should_continue or (lambda: True)
+        self.stop_before = stop_before
+        self.stats = {'calls': 0, 'failures': 0, 'page_size': None, 'reached_window': False}
+
+    def _past_window(self, page):
+        """该页是否已早于 stop_before（列表从新到旧，看最后一篇）"""
+        if self.stop_before is None or not page:
+            return False
+        return int(page[-1].get('create_time') or 0) < self.stop_before
+
+    def _fetch(self, begin, size):
+        self.stats['calls'] += 1
+        return self.fetch(self.fakeid, begin, size, self.token)
+
+    def _remember_page_size(self, page_size):
+        """每页数量已被确认（收到恰好一整页，或不足一页但之后还有文章），供之后的公众号直接使用"""
+        global _discovered_page_size
+        with _discovered_lock:
+            _discovered_page_size = page_size
+        self.stats['page_size'] = page_size
+        print(f"文章列表接口每页最多 {page_size} 篇")
+
+    def discover_page_size(self, start=0):
+        """
+        确定接口接受的每页数量，返回 (每页数量, 已获取的页 {begin: 文章列表}, 是否已确认)
+        只有收到恰好一整页，或不足一页但下一页仍有文章时才算确认；
+        未确认时不足一页的页不能说明已到最后一篇（可能是接口上限）
+        """
+        with _discovered_lock:
+            known_size = _discovered_page_size
+        if known_size:
+            self.stats['page_size'] = known_size
+            return known_size, {}, True
+
+        for size in PAGE_SIZE_CANDIDATES:
+            articles = self._fetch(start, size)
+            if articles is None:
+                # 接口拒绝过大的 size 时换较小的值再试
+                self.stats['failures'] += 1
+                continue
+            pages = {start: articles}
+            if len(articles) == size:
+                self._remember_page_size(size)
+                return size, pages, True
+            if not articles:
+                # 该位置之后没有文章，无法确定上限
+                return size, pages, False
+            # 返回的篇数少于请求的数量：可能是接口上限，也可能已到最后一篇，看下一页是否还有文章
+            following = self._fetch(start + len(articles), size)
+            if following:
+                pages[start + len(articles)] = following
+                self._remember_page_size(len(articles))
+                return len(articles), pages, True
+            if following is not None:
+                # 已到最后一篇，尚不能确定上限
+                pages[start + len(articles)] = following
+            return size, pages, False
+        return PAGE_SIZE_CANDIDATES[-1], {}, False
+
+    def list_from(self, start=0):
+        """
+        获取第 start 篇开始直到最后一篇（或早于 stop_before）的全部文章
+        返回 (从 start 开始连续的文章列表, 是否已到最后一篇)
+        """
+        page_size, pages, confirmed = self.discover_page_size(start)
+        self.stats['page_size'] = page_size
+        collected = []
+        next_begin = start
+        failures = 0
+        concurrency = self.concurrency
+
+        while self.should_continue():
+            # 先把已获取的连续页收下
+            while next_begin in pages:
+                page = pages.pop(next_begin)
+                collected.extend(page)
+                next_begin += len(page)
+                if not confirmed and page and len(page) == page_size:
+                    confirmed = True
+                    self._remember_page_size(page_size)
+                if len(page) < page_size:
+                    if confirmed or not page:
+                        return collected, True
+                    # 每页数量尚未确认：不足一页可能只是接口上限，下一页仍有文章时以该篇数为每页数量
+                    following = pages.pop(next_begin, None)
+                    if following is None:
+                        following = self._fetch(next_begin, page_size)
+                    if following is None:
+                        print(f"无法确认是否已到最后一篇，停止（已获取 {len(collected)} 篇）")
+                        return collected, False
+                    if not following:
+                        return collected, True
+                    page_size, confirmed = len(page), True
+                    self._remember_page_size(page_size)
+                    pages = {next_begin: following}
+                if self._past_window(page):
+                    self.stats['reached_window'] = True
+                    return collected, False
+
+            offsets = [next_begin + i * page_size for i in range(concurrency)]
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                results = list(executor.map(lambda begin: (begin, self._fetch(begin, page_size)), offsets))
+
+            failed = False
+            for begin, articles in results:
+                if articles is None:
+                    failed = True
+                    break
+                pages[begin] = articles
+                if len(articles) < page_size:
+                    # 之后的页不再需要
+                    break
+
+            if failed:
+                self.stats['failures'] += 1
+                failures = failures + 1 if concurrency == 1 else failures
+                if failures >= MAX_FAILURES:
+                    print(f"获取文章列表连续失败，停止（已获取 {len(collected)} 篇）")
+                    break
+                concurrency = max(1, concurrency // 2)
+                print(f"获取文章列表失败，并发数降为 {concurrency}，稍后重试")
+                time.sleep(backoff_delay(failures))
+            else:
+                # 只统计连续失败：成功获取一轮后重新计数
+                failures = 0
+
+        return collected, False
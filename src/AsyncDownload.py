@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import collections
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from WeChat import BASE_URL, TOKEN, save_article_content, load_stored_article
+from Resilience import get_breaker, backoff_delay, get_exporter_timeout, RETRY_STATUS_CODES
+from Throughput import record_outcome
+from Tracing import span
+
+# --- asyncio 下载引擎（只下载模式） ---
+# 只下载时几乎全部时间都在等待网络，这里用asyncio同时保持多个下载请求：
+# - max_in_flight: 同时进行中的请求总数上限
+# - 速率预算: rate_window 秒内最多发起 rate_count 次下载请求（与原来"每20篇暂停20秒"的节奏一致），
+#   批次之间不再固定暂停
+# 停止任务时直接取消所有进行中的请求，不必等当前文章下载完。
+# 失败的请求按指数退避重试；下载接口熔断时所有下载暂停，等到可以试探时再继续。
+# 安装了 aiohttp 时使用原生异步HTTP，否则退回到线程池中执行 requests。
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class RateBudget:
+    """滑动窗口速率预算：window 秒内最多允许 max_requests 次请求（可跨事件循环复用）"""
+
+    def __init__(self, max_requests=20, window=20):
+        self.max_requests = max(1, int(max_requests))
+        self.window = float(window)
+        self.timestamps = collections.deque()
+        self.lock = threading.Lock()
+
+    def _reserve(self):
+        """尝试占用一次请求额度，成功返回0，否则返回需要等待的秒数"""
+        with self.lock:
+            now = time.monotonic()
+            while self.timestamps and now - self.timestamps[0] >= self.window:
+                self.timestamps.popleft()
+            if len(self.timestamps) < self.max_requests:
+                self.timestamps.append(now)
+                return 0
+            return self.window - (now - self.timestamps[0])
+
+    async def acquire(self):
+        while True:
+            delay = self._reserve()
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+
+class AsyncDownloader:
+    """
+    异步批量下载文章。同一个实例可以多次调用 run()（例如每获取一页文章列表调用一次），
+    速率预算在多次调用之间保持。
+    """
+
+    def __init__(self, output_dir, token=None, task_status=None, max_in_flight=4,
+                 rate_count=20, rate_window=20, timeout=(5, 20), max_retries=3):
+        self.output_dir = output_dir
+        self.token = token if token else TOKEN
+        self.task_status = task_status
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.budget = RateBudget(rate_count, rate_window)
+        # (连接超时, 读取超时)
+        self.timeout = timeout
+        self.max_retries = max(1, int(max_retries))
+        self.cancelled = False
+        self._loop = None
+        self._main_task = None
+
+    def cancel(self):
+        """立即取消进行中的下载（可从其他线程调用）"""
+        self.cancelled = True
+        loop, main_task = self._loop, self._main_task
+        if loop is not None and main_task is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(main_task.cancel)
+
+    def run(self, articles):
+        """
+        下载一批文章，返回 [(article, file_path或None), ...]（被取消的文章不在结果中）
+        """
+        if self.cancelled or not articles:
+            return []
+        return asyncio.run(self._run(articles))
+
+    def _is_running(self):
+        return not self.cancelled and (self.task_status is None or self.task_status.get('running', True))
+
+    async def _run(self, articles):
+        self._loop = asyncio.get_running_loop()
+        self._main_task = asyncio.current_task()
+        self._global_sem = asyncio.Semaphore(self.max_in_flight)
+        self._total = len(articles)
+        self._done = 0
+        # 使用独立线程池：取消时不等待其中尚未返回的阻塞请求
+        self._executor = ThreadPoolExecutor(max_workers=self.max_in_flight)
+
+        session = None
+        if aiohttp is not None:
+            session = aiohttp.ClientSession(
+                headers={"Authorization": self.token, "Content-Type": "application/json"},
+                timeout=aiohttp.ClientTimeout(total=None, connect=self.timeout[0], sock_read=self.timeout[1])
+            )
+
+        tasks = [asyncio.create_task(self._download_one(session, article)) for article in articles]
+        watcher = asyncio.create_task(self._watch_stop())
+        results = []
+        try:
+            results = await asyncio.gather(*tasks)
+        except asyncio.CancelledError:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            results = [task.result() for task in tasks if task.done() and not task.cancelled() and task.exception() is None]
+            print(f"\n下载已取消，已完成 {len(results)}/{len(articles)} 篇")
+        finally:
+            watcher.cancel()
+            if session is not None:
+                await session.close()
+            self._executor.shutdown(wait=False)
+            self._main_task = None
+            self._loop = None
+
+        return results
+
+    async def _watch_stop(self):
+        """轮询停止信号，检测到后立即取消全部下载"""
+        while self._is_running():
+            await asyncio.sleep(0.2)
+        if self._main_task is not None:
+            self._main_task.cancel()
+
+    async def _fetch(self, session, api_url, params):
+        """发起下载请求，返回 (HTTP状态码, 响应文本)"""
+        if session is not None:
+            async with session.get(api_url, params=params) as response:
+                return response.status, await response.text()
+
+        headers = {"Authorization": self.token, "Content-Type": "application/json"}
+        response = await asyncio.get_running_loop().run_in_executor(
+            self._executor,
+            functools.partial(requests.get, api_url, headers=headers, params=params, timeout=self.timeout)
+        )
+        return response.status_code, response.text
+
+    async def _download_one(self, session, article):
+        api_url = f"{BASE_URL}/api/v1/download"
+        params = {"url": article["link"], "format": "markdown"}
+        title = article["title"]
+        loop = asyncio.get_running_loop()
+
+        # 本地已保存原始HTML时不占用下载额度
+        file_path = await loop.run_in_executor(self._executor, load_stored_article, article["link"], self.output_dir, title,
+                                               article.get("create_time"))
+        if file_path:
+            self._mark_done('downloaded')
+            return article, file_path
+
+        breaker = get_breaker("exporter")
+        print(f"准备下载文章: {title}")
+        for attempt in range(self.max_retries):
+            # 熔断期间暂停，等到可以试探时再发请求
+            while not breaker.allow():
+                await asyncio.sleep(max(breaker.retry_in(), 0.5))
+            async with self._global_sem:
+                await self.budget.acquire()
+                try:
+                    with span("download", url=article["link"], article=title):
+                        status, text = await self._fetch(session, api_url, params)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    status, text = None, None
+                    print(f"下载文章 '{title}' 时发生网络错误: {e}")
+            if status is not None and status not in RETRY_STATUS_CODES:
+                breaker.record_success()
+                break
+            breaker.record_failure()
+            if attempt < self.max_retries - 1:
+                await asyncio.sleep(backoff_delay(attempt))
+
+        if status == 200:
+            # 转换和写文件在线程中执行，避免阻塞事件循环
+            file_path = await loop.run_in_executor(
+                self._executor, save_article_content, text, self.output_dir, title, article["link"],
+                article.get("create_time")
+            )
+        elif status is not None:
+            print(f"下载文章 '{title}' 失败! HTTP 状态码: {status}")
+
+        if file_path:
+            print(f"文章已下载: {title}")
+        else:
+            print(f"文章下载失败，跳过: {title}")
+
+        self._mark_done('downloaded' if file_path else 'failed')
+        return article, file_path
+
+    def _mark_done(self, outcome):
+        """更新进度"""
+        self._done += 1
+        record_outcome(self.task_status, outcome)
+        if self.task_status is not None:
+            self.task_status['progress'] = int((self._done / self._total) * 100)
+            self.task_status['processed_articles'] = self.task_status.get('processed_articles', 0) + 1
+
+
+def create_async_downloader(output_dir, token=None, task_status=None, app_config=None):
+    """根据应用配置创建异步下载器"""
+    app_config = app_config or {}
+    return AsyncDownloader(
+        output_dir,
+        token=token,
+        task_status=task_status,
+        max_in_flight=app_config.get('download_concurrency', 4),
+        rate_count=app_config.get('download_rate_count', 20),
+        rate_window=app_config.get('download_rate_window', 20),
+        timeout=get_exporter_timeout(),
+        max_retries=app_config.get('exporter_max_retries', 3),
+    )
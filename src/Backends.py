@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+import requests
+
+# --- 多主机Ollama后端池 ---
+# ollama_config.json 中可以配置多个推理服务器:
+#   "backends": [{"url": "http://10.0.0.11:11434", "weight": 2}, {"url": "http://10.0.0.12:11434", "weight": 1}]
+# 未配置 backends 时只使用 ollama_url。
+# 每次请求选择"进行中请求数/权重"最小的健康后端（加权最少进行中请求）。
+# 请求失败或超时的后端被暂时剔除，后台健康检查（GET /api/tags）恢复正常后自动重新加入；
+# 连续失败时剔除时间按倍数增长，最长 MAX_EJECT_SECONDS。
+
+EJECT_SECONDS = 30
+MAX_EJECT_SECONDS = 600
+HEALTH_CHECK_INTERVAL = 15
+HEALTH_CHECK_TIMEOUT = 5
+# 统计吞吐量的时间窗口（秒）
+THROUGHPUT_WINDOW = 60
+
+
+class Backend:
+    """单个Ollama后端"""
+
+    def __init__(self, url, weight=1):
+        self.url = url.rstrip('/')
+        self.weight = max(float(weight), 0.01)
+        self.outstanding = 0
+        self.healthy = True
+        self.ejected_until = 0.0
+        self.consecutive_failures = 0
+        self.requests = 0
+        self.failures = 0
+        self.total_latency = 0.0
+        self.completed_at = deque()
+
+    @property
+    def chat_url(self):
+        return self.url + '/api/chat'
+
+    def load(self):
+        """加权负载：进行中请求数/权重"""
+        return (self.outstanding + 1) / self.weight
+
+    def stats(self, now):
+        while self.completed_at and now - self.completed_at[0] > THROUGHPUT_WINDOW:
+            self.completed_at.popleft()
+        succeeded = self.requests - self.failures
+        return {
+            'url': self.url,
+            'weight': self.weight,
+            'healthy': self.healthy,
+            'ejected_seconds': max(0, round(self.ejected_until - now)) if not self.healthy else 0,
+            'outstanding': self.outstanding,
+            'requests': self.requests,
+            'failures': self.failures,
+            'avg_latency': round(self.total_latency / succeeded, 2) if succeeded else 0,
+            'throughput_per_min': round(len(self.completed_at) * 60 / THROUGHPUT_WINDOW, 1),
+        }
+
+
+class BackendPool:
+    """加权最少进行中请求的后端池，带剔除与健康检查"""
+
+    def __init__(self, backends):
+        self.backends = backends
+        self.lock = threading.Lock()
+        self._health_thread = None
+        self._closed = False
+
+    @classmethod
+    def from_config(cls, ollama_config):
+        """根据Ollama配置创建后端池"""
+        entries = ollama_config.get('backends') or []
+        backends = []
+        for entry in entries:
+            if isinstance(entry, str):
+                backends.append(Backend(entry))
+            elif isinstance(entry, dict) and entry.get('url'):
+                backends.append(Backend(entry['url'], entry.get('weight', 1)))
+        if not backends:
+            backends.append(Backend(ollama_config['ollama_url']))
+        return cls(backends)
+
+    def close(self):
+        """停止健康检查"""
+        self._closed = True
+
+    def _ensure_health_thread(self):
+        if self._health_thread is None and len(self.backends) > 1:
+            self._health_thread = threading.Thread(target=self._health_loop, daemon=True)
+            self._health_thread.start()
+
+    def _health_loop(self):
+        while not self._closed:
+            time.sleep(HEALTH_CHECK_INTERVAL)
+            now = time.monotonic()
+            for backend in list(self.backends):
+                if backend.healthy or now < backend.ejected_until:
+                    continue
+                try:
+                    response = requests.get(backend.url + '/api/tags', timeout=HEALTH_CHECK_TIMEOUT)
+                    ok = response.status_code == 200
+                except requests.exceptions.RequestException:
+                    ok = False
+                with self.lock:
+                    if ok:
+                        backend.healthy = True
+                        print(f"Ollama后端已恢复: {backend.url}")
+                    else:
+                        # 健康检查仍失败时剔除时间继续加倍
+                        backend.consecutive_failures += 1
+                        self._eject(backend, time.monotonic())
+
+    def _eject(self, backend, now):
+        """剔除后端，连续失败时剔除时间加倍"""
+        backend.healthy = False
+        delay = min(EJECT_SECONDS * (2 ** max(backend.consecutive_failures - 1, 0)), MAX_EJECT_SECONDS)
+        backend.ejected_until = now + delay
+
+    def acquire(self):
+        """选择一个后端并占用一个进行中名额"""
+        self._ensure_health_thread()
+        with self.lock:
+            candidates = [b for b in self.backends if b.healthy]
+            if not candidates:
+                # 全部被剔除时，尝试最早可以重试的后端，而不是直接失败
+                candidates = [min(self.backends, key=lambda b: b.ejected_until)]
+            backend = min(candidates, key=lambda b: b.load())
+            backend.outstanding += 1
+            backend.requests += 1
+            return backend
+
+    def release(self, backend, latency, success):
+        """释放名额并记录结果"""
+        with self.lock:
+            now = time.monotonic()
+            backend.outstanding -= 1
+            if success:
+                backend.consecutive_failures = 0
+                backend.total_latency += latency
+                backend.completed_at.append(now)
+                if not backend.healthy:
+                    backend.healthy = True
+            else:
+                backend.failures += 1
+                backend.consecutive_failures += 1
+                if len(self.backends) > 1:
+                    self._eject(backend, now)
+                    print(f"Ollama后端请求失败，暂时剔除: {backend.url}")
+
+    @contextmanager
+    def use(self):
+        """
+        with pool.use() as backend:
+            requests.post(backend.chat_url, ...)
+        代码块抛出异常时记为失败
+        """
+        backend = self.acquire()
+        start = time.perf_counter()
+        success = False
+        try:
+            yield backend
+            success = True
+        finally:
+            self.release(backend, time.perf_counter() - start, success)
+
+    def get_stats(self):
+        """各后端的状态、吞吐量和平均延迟"""
+        with self.lock:
+            now = time.monotonic()
+            return [backend.stats(now) for backend in self.backends]
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+资料汇总的Parquet列式副本。
+
+示例:
+    # 由已有的 资料汇总.csv 重建Parquet数据集（首次使用或手动修改CSV后）
+    python src/CatalogParquet.py --catalog-folder D:\\智能分类\\核心案例库
+
+    # 在分析脚本中按大类、月份读取
+    from CatalogParquet import load_catalog
+    df = load_catalog(r"D:\\智能分类\\核心案例库", months=["2024-05", "2024-06"])
+"""
+
+import argparse
+import importlib.util
+import os
+import shutil
+import sys
+import uuid
+from datetime import datetime
+
+sys.path.append(os.path.dirname(__file__))
+
+from Config import load_app_config
+
+# --- 资料汇总的Parquet列式副本 ---
+# 资料汇总.csv 中有数万行较长的中文标题和链接，分析时每次读取都要重新解析CSV。
+# 这里在写入CSV的同时，把新记录追加到同一文件夹下按 大类/月份 分区的Parquet数据集：
+#   <资料汇总.csv所在文件夹>/_catalog_parquet/大类=<大类>/月份=<YYYY-MM>/part-*.parquet
+# （目录名中的中文由 pyarrow 按URL编码，用 load_catalog 或 pyarrow/pandas 读取时自动还原）
+# 月份取发布日期，没有发布日期时取入库日期。"小类"使用字典编码，"大类"和"月份"为分区目录，
+# 读取时只读需要的分区和列。序号只在CSV中维护，不写入Parquet。
+# 每批追加写入新文件；重新分类修改CSV后整体重建，重建同时把小文件合并。
+# 需要安装 pyarrow，未安装时跳过（只写CSV）。pyarrow 和 pandas 在第一次写入或读取时才导入，
+# 导入本模块（以及 Classification）不会加载它们。
+
+PARQUET_FOLDER_NAME = '_catalog_parquet'
+CATALOG_FILENAME = '资料汇总.csv'
+PARTITION_COLUMNS = ['大类', '月份']
+# 取值种类很少的列，按字典编码保存
+DICTIONARY_COLUMNS = ['小类']
+CATALOG_COLUMNS = ['大类', '小类', '文档名称', '入库日期', '来源', '发布日期']
+UNKNOWN_MONTH = '未知'
+
+_missing_warned = False
+
+
+def parquet_available():
+    """是否安装了 pyarrow（只检查，不导入）"""
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def get_parquet_root(catalog_folder):
+    """资料汇总.csv 所在文件夹对应的Parquet数据集目录"""
+    return os.path.join(catalog_folder, PARQUET_FOLDER_NAME)
+
+
+def _to_table(df):
+    """把资料汇总的DataFrame整理为写入Parquet的表：补齐列、统一为字符串、加上月份列"""
+    df = df.reindex(columns=CATALOG_COLUMNS).fillna('').astype(str)
+    publish_month = df['发布日期'].str.slice(0, 7)
+    storage_month = df['入库日期'].str.slice(0, 7)
+    month = publish_month.where(publish_month.str.match(r'^\d{4}-\d{2}$'), storage_month)
+    df['月份'] = month.where(month.str.match(r'^\d{4}-\d{2}$'), UNKNOWN_MONTH)
+    df['大类'] = df['大类'].replace('', '未指定')
+    for column in DICTIONARY_COLUMNS:
+        df[column] = df[column].astype('category')
+    import pyarrow as pa
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def _write(table, root, existing_data_behavior):
+    import pyarrow.parquet as pq
+    pq.write_to_dataset(
+        table, root,
+        partition_cols=PARTITION_COLUMNS,
+        basename_template=f"part-{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}-{{i}}.parquet",
+        existing_data_behavior=existing_data_behavior,
+        use_dictionary=DICTIONARY_COLUMNS,
+        compression='zstd'
+    )
+
+
+def _enabled():
+    global _missing_warned
+    if not load_app_config().get('enable_parquet_catalog', True):
+        return False
+    if not parquet_available():
+        if not _missing_warned:
+            print("提示: 未安装 pyarrow，资料汇总只保存为CSV（pip install pyarrow 后启用Parquet副本）")
+            _missing_warned = True
+        return False
+    return True
+
+
+def append_catalog_records(records, catalog_folder):
+    """把新写入资料汇总.csv的记录追加到Parquet数据集，返回写入的行数"""
+    if not records or not _enabled():
+        return 0
+    try:
+        import pandas as pd
+        _write(_to_table(pd.DataFrame(records)), get_parquet_root(catalog_folder), 'overwrite_or_ignore')
+        return len(records)
+    except Exception as e:
+        print(f"追加Parquet资料汇总失败（CSV不受影响，可稍后重建）: {e}")
+        return 0
+
+
+def rebuild_catalog_parquet(catalog_folder):
+    """由资料汇总.csv重建整个Parquet数据集（同时合并小文件），返回写入的行数"""
+    if not _enabled():
+        return 0
+    csv_path = os.path.join(catalog_folder, CATALOG_FILENAME)
+    if not os.path.exists(csv_path):
+        print(f"找不到资料汇总表: {csv_path}")
+        return 0
+    import pandas as pd
+    df = pd.read_csv(csv_path, encoding='utf-8-sig', dtype=str)
+    root = get_parquet_root(catalog_folder)
+    # 先写入临时目录再替换，重建失败时保留原数据集
+    temp_root = root + '.tmp'
+    shutil.rmtree(temp_root, ignore_errors=True)
+    if len(df):
+        _write(_to_table(df), temp_root, 'delete_matching')
+    else:
+        os.makedirs(temp_root, exist_ok=True)
+    shutil.rmtree(root, ignore_errors=True)
+    os.replace(temp_root, root)
+    print(f"Parquet资料汇总已重建: {root}（{len(df)} 条记录）")
+    return len(df)
+
+
+def load_catalog(catalog_folder, categories=None, subcategories=None, months=None, columns=None):
+    """
+    读取Parquet资料汇总，返回pandas DataFrame
+    categories / subcategories / months: 只读取指定的大类、小类、月份（YYYY-MM）
+    columns: 只读取指定的列
+    """
+    if not parquet_available():
+        raise ImportError("读取Parquet资料汇总需要安装 pyarrow")
+    import pyarrow.dataset as ds
+    dataset = ds.dataset(
+        get_parquet_root(catalog_folder), format='parquet',
+        partitioning=ds.HivePartitioning.discover(infer_dictionary=True)
+    )
+    conditions = []
+    if categories:
+        conditions.append(ds.field('大类').isin(list(categories)))
+    if subcategories:
+        conditions.append(ds.field('小类').isin(list(subcategories)))
+    if months:
+        conditions.append(ds.field('月份').isin(list(months)))
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return dataset.to_table(columns=columns, filter=expression).to_pandas()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="由资料汇总.csv重建Parquet数据集")
+    parser.add_argument("--catalog-folder", action="append", default=[],
+                        help="资料汇总.csv所在文件夹（<分类结果文件夹>/<大类>），可重复指定")
+    args = parser.parse_args(argv)
+
+    folders = args.catalog_folder
+    if not folders:
+        app_config = load_app_config()
+        folders = [os.path.join(app_config.get('classification_folder', ''), app_config.get('category_name', ''))]
+    if not parquet_available():
+        print("错误: 需要安装 pyarrow", file=sys.stderr)
+        return 2
+    for folder in folders:
+        rebuild_catalog_parquet(folder)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
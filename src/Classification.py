@@ -1,41 +1,41 @@
-import pandas as pd
 import requests
 import time
 import os
 import re
-import markdown
-from bs4 import BeautifulSoup
 import shutil
 from datetime import datetime
 import warnings
 import json
 import sys
+import threading
 
-# 添加当前目录到路径，以便导入app模块
+# 添加当前目录到路径，以便导入同目录下的模块
 sys.path.append(os.path.dirname(__file__))
 
-# 忽略 pandas 的 SettingWithCopyWarning 警告
-warnings.filterwarnings('ignore', category=pd.errors.SettingWithCopyWarning)
+from Tracing import span
+from Converter import extract_text
+# 共享配置（只依赖标准库，不会导入app模块及Flask/Socket.IO）
+from Config import get_default_ollama_config, get_default_prompt_config, load_app_config
+from Backends import BackendPool
+from Tokens import TokenEstimator, ContextSizer, CHAT_TEMPLATE_OVERHEAD
+from Summary import build_summary_text
+from Resilience import get_breaker, backoff_delay, CircuitOpenError
+from CatalogParquet import append_catalog_records
+from SearchIndex import index_article
+from Layout import article_path, find_article, record_file, forget_file, list_article_files
+
+# pandas 导入较慢，仅在首次使用时加载，
+# 以便只做分类的工作进程和命令行工具能快速启动
+
+def _import_pandas():
+    """按需导入pandas"""
+    import pandas as pd
+    # 忽略 pandas 的 SettingWithCopyWarning 警告
+    warnings.filterwarnings('ignore', category=pd.errors.SettingWithCopyWarning)
+    return pd
 
 # --- 1. 配置参数 ---
 
-# 导入共享配置函数
-try:
-    from app import get_default_ollama_config
-except ImportError:
-    # 如果无法导入，定义本地默认配置作为备用
-    def get_default_ollama_config():
-        return {
-            'ollama_url': 'http://localhost:11434',
-            'model_id': 'qwen3:8b',
-            'temperature': 0.3,
-            'timeout': 80,
-            'max_retries': 3,
-            'max_summary_length': 600,
-            'num_ctx': 5120,
-            'min_text_length': 150,
-        }
-
 def load_ollama_config():
     """加载Ollama配置"""
     config_path = os.path.join(os.path.dirname(__file__), 'config', 'ollama_config.json')
@@ -117,6 +117,22 @@ def generate_system_prompt_from_config(config):
     
     return '\n'.join(prompt_parts)
 
+def generate_title_prompt_from_config(config):
+    """根据配置生成标题初筛的系统提示词（只使用角色定义和无关判定规则）"""
+    config = config or get_default_prompt_config()
+    prompt_parts = []
+    if config.get('role_definition'):
+        prompt_parts.append(config['role_definition'])
+    if config.get('irrelevant_rules'):
+        prompt_parts.append("【无关判定规则】（满足任一条即为\"无关\"）：")
+        for i, rule in enumerate(config['irrelevant_rules'], 1):
+            prompt_parts.append(f"{i}.{rule}")
+    prompt_parts.append("【输出要求】：")
+    prompt_parts.append("-只根据文章标题和摘要，判断这篇文章属于\"无关\"的把握有多大")
+    prompt_parts.append("-仅输出0到100之间的一个整数（100表示肯定无关，0表示肯定相关），不加任何解释")
+    prompt_parts.append("/no_think")
+    return '\n'.join(prompt_parts)
+
 def update_categories_from_config(config):
     """根据配置更新分类映射"""
     global VALID_CATEGORIES, FOLDER_CATEGORIES
@@ -136,7 +152,7 @@ def update_categories_from_config(config):
 
 def reload_config():
     """重新加载配置并更新全局变量"""
-    global OLLAMA_URL, MODEL_ID, TEMPERATURE, TIMEOUT, MAX_RETRIES, MAX_SUMMARY_LENGTH, NUM_CTX, MIN_TEXT_LENGTH, SYSTEM_PROMPT
+    global OLLAMA_URL, MODEL_ID, TEMPERATURE, TIMEOUT, CONNECT_TIMEOUT, MAX_RETRIES, MAX_SUMMARY_LENGTH, NUM_CTX, MIN_TEXT_LENGTH, SYSTEM_PROMPT, STREAM_RESPONSE, BACKEND_POOL, AUTO_NUM_CTX, MAX_SUMMARY_TOKENS, RESPONSE_TOKEN_RESERVE, CLEAN_SUMMARY, TITLE_MODEL_ID, TITLE_IRRELEVANT_THRESHOLD, TITLE_SYSTEM_PROMPT
     
     # 加载Ollama配置
     ollama_config = load_ollama_config()
@@ -144,10 +160,21 @@ def reload_config():
     MODEL_ID = ollama_config['model_id']
     TEMPERATURE = ollama_config['temperature']
     TIMEOUT = ollama_config['timeout']
+    CONNECT_TIMEOUT = ollama_config['connect_timeout']
     MAX_RETRIES = ollama_config['max_retries']
     MAX_SUMMARY_LENGTH = ollama_config['max_summary_length']
     NUM_CTX = ollama_config['num_ctx']
     MIN_TEXT_LENGTH = ollama_config['min_text_length']
+    STREAM_RESPONSE = ollama_config['stream_response']
+    BACKEND_POOL.close()
+    BACKEND_POOL = BackendPool.from_config(ollama_config)
+    AUTO_NUM_CTX = ollama_config['auto_num_ctx']
+    MAX_SUMMARY_TOKENS = ollama_config['max_summary_tokens']
+    RESPONSE_TOKEN_RESERVE = ollama_config['response_token_reserve']
+    CLEAN_SUMMARY = ollama_config['clean_summary']
+    TITLE_MODEL_ID = ollama_config['title_model_id']
+    TITLE_IRRELEVANT_THRESHOLD = ollama_config['title_irrelevant_threshold']
+    CONTEXT_SIZER.reset(NUM_CTX)
     
     # 加载系统提示词配置
     prompt_config = load_prompt_config()
@@ -161,6 +188,7 @@ def reload_config():
         # 使用Ollama配置中的系统提示词或默认值
         SYSTEM_PROMPT = ollama_config.get('system_prompt', DEFAULT_SYSTEM_PROMPT)
         print(f"使用默认系统提示词配置")
+    TITLE_SYSTEM_PROMPT = generate_title_prompt_from_config(prompt_config)
     
     print(f"Ollama配置已重新加载: {ollama_config}")
     return ollama_config
@@ -171,10 +199,26 @@ OLLAMA_URL = config['ollama_url'] + '/api/chat'
 MODEL_ID = config['model_id']
 TEMPERATURE = config['temperature']
 TIMEOUT = config['timeout']
+# 连接超时单独设置：Ollama不可达时几秒内失败，不必等满读取超时
+CONNECT_TIMEOUT = config['connect_timeout']
 MAX_RETRIES = config['max_retries']
 MAX_SUMMARY_LENGTH = config['max_summary_length']
 NUM_CTX = config['num_ctx']
 MIN_TEXT_LENGTH = config['min_text_length']
+STREAM_RESPONSE = config['stream_response']
+# Ollama后端池（支持多台推理服务器）
+BACKEND_POOL = BackendPool.from_config(config)
+# 按token预算截取摘要、按提示词长度选择num_ctx档位（NUM_CTX 为上限）
+AUTO_NUM_CTX = config['auto_num_ctx']
+MAX_SUMMARY_TOKENS = config['max_summary_tokens']
+RESPONSE_TOKEN_RESERVE = config['response_token_reserve']
+# 去掉公众号页眉页脚、图片和链接后再构建摘要
+CLEAN_SUMMARY = config['clean_summary']
+# 两级分类：小模型先根据标题和摘要打分，把握足够大的"无关"文章不再下载、不再调用主模型
+TITLE_MODEL_ID = config['title_model_id']
+TITLE_IRRELEVANT_THRESHOLD = config['title_irrelevant_threshold']
+TOKEN_ESTIMATOR = TokenEstimator()
+CONTEXT_SIZER = ContextSizer(NUM_CTX)
 
 # 路径配置 (!!! 请根据您的实际情况修改这里的路径 !!!)
 OUTPUT_FOLDER = r"C:\Users\27549\OneDrive - whcqadc\桌面\test2"  # 新的分类结果输出文件夹
@@ -225,6 +269,8 @@ if prompt_config:
 else:
     # 使用配置文件中的系统提示词，如果没有则使用默认值
     SYSTEM_PROMPT = config.get('system_prompt', DEFAULT_SYSTEM_PROMPT)
+# 标题初筛的系统提示词
+TITLE_SYSTEM_PROMPT = generate_title_prompt_from_config(prompt_config)
 
 # --- 2. 辅助函数 (部分复用原脚本) ---
 
@@ -247,17 +293,50 @@ def normalize_string_for_matching(text):
     # 移除非字母、非数字、非中文字符
     return re.sub(r'[^\w\u4e00-\u9fa5]', '', text).lower()
 
+def read_markdown_file(md_file):
+    """读取markdown文件内容"""
+    with open(md_file, 'r', encoding='utf-8') as f:
+        return f.read()
+
 def extract_text_from_markdown(md_file):
     """从markdown文件中提取纯文本"""
-    with open(md_file, 'r', encoding='utf-8') as f:
-        md_content = f.read()
-    html = markdown.markdown(md_content)
-    soup = BeautifulSoup(html, 'html.parser')
-    return soup.get_text(separator=' ', strip=True)
+    # 大文章交给转换进程池提取
+    return extract_text(read_markdown_file(md_file))
+
+def get_summary_token_budget():
+    """
+    摘要的token预算：不超过 MAX_SUMMARY_TOKENS，
+    并为系统提示词和回复预留空间，保证系统提示词不会因上下文不足被截断
+    """
+    system_tokens = TOKEN_ESTIMATOR.estimate(SYSTEM_PROMPT)
+    available = NUM_CTX - system_tokens - RESPONSE_TOKEN_RESERVE - CHAT_TEMPLATE_OVERHEAD
+    return max(0, min(MAX_SUMMARY_TOKENS, available))
 
-def create_summary(text, max_length=MAX_SUMMARY_LENGTH):
-    """创建文章摘要"""
-    return text[:max_length]
+def create_summary(text, max_length=None):
+    """创建文章摘要：配置了 max_summary_tokens 时按token预算截取，否则按字符数截取"""
+    if max_length is None and MAX_SUMMARY_TOKENS > 0:
+        return TOKEN_ESTIMATOR.trim_to_tokens(text, get_summary_token_budget())
+    return text[:max_length or MAX_SUMMARY_LENGTH]
+
+def build_classification_summary(text_content, filename="", markdown_content=None):
+    """
+    构建发给模型的摘要：有Markdown原文时去掉页眉页脚、图片和链接，按 标题+开头段落+小标题 拼接后截取，
+    并输出与直接截取正文开头相比节省的token数
+    """
+    baseline = create_summary(text_content)
+    if not CLEAN_SUMMARY or not markdown_content:
+        return baseline
+
+    summary = create_summary(build_summary_text(markdown_content, extract_title_from_filename(filename)))
+    if not summary.strip():
+        return baseline
+    tokens_before = TOKEN_ESTIMATOR.estimate(baseline)
+    tokens_after = TOKEN_ESTIMATOR.estimate(summary)
+    with _llm_stats_lock:
+        llm_stats['summary_tokens_before'] += tokens_before
+        llm_stats['summary_tokens_after'] += tokens_after
+    print(f"✂️ 文件 '{filename}' 摘要 {tokens_before} → {tokens_after} tokens（节省 {tokens_before - tokens_after}）")
+    return summary
 
 def clean_response(content):
     """清洗响应内容"""
@@ -267,6 +346,140 @@ def clean_response(content):
         return "无关"  # 如果模型输出意外内容，默认为"无关"
     return cleaned
 
+# 大模型调用统计：decision_seconds 为从发出请求到输出中出现分类名称的耗时，
+# generation_seconds 为模型生成的总耗时（完整响应取Ollama返回的 total_duration，提前结束的请求取断开连接时的耗时）
+llm_stats = {'calls': 0, 'early_stops': 0, 'decision_seconds': 0.0, 'generation_seconds': 0.0, 'prompt_tokens': 0, 'num_ctx': 0,
+             'summary_tokens_before': 0, 'summary_tokens_after': 0}
+# 标题初筛统计：screened 为初筛的文章数，rejected 为初筛直接判为无关的文章数，
+# escalated 为交给主模型的文章数，failures 为初筛请求失败（按交给主模型处理）的次数
+cascade_stats = {'screened': 0, 'rejected': 0, 'escalated': 0, 'failures': 0, 'screen_seconds': 0.0}
+_llm_stats_lock = threading.Lock()
+
+
+def reset_llm_stats():
+    """重置大模型调用统计"""
+    with _llm_stats_lock:
+        llm_stats.update({'calls': 0, 'early_stops': 0, 'decision_seconds': 0.0, 'generation_seconds': 0.0, 'prompt_tokens': 0, 'num_ctx': 0,
+                          'summary_tokens_before': 0, 'summary_tokens_after': 0})
+        cascade_stats.update({'screened': 0, 'rejected': 0, 'escalated': 0, 'failures': 0, 'screen_seconds': 0.0})
+
+
+def get_llm_stats():
+    """获取大模型调用统计（含平均耗时）"""
+    with _llm_stats_lock:
+        stats = dict(llm_stats)
+    calls = stats['calls'] or 1
+    stats['avg_decision_seconds'] = round(stats['decision_seconds'] / calls, 3)
+    stats['avg_generation_seconds'] = round(stats['generation_seconds'] / calls, 3)
+    stats['avg_prompt_tokens'] = round(stats['prompt_tokens'] / calls, 1)
+    stats['summary_tokens_saved'] = stats['summary_tokens_before'] - stats['summary_tokens_after']
+    stats['cascade'] = get_cascade_stats(stats)
+    return stats
+
+
+def get_cascade_stats(llm=None):
+    """
+    两级分类的分流情况和估算的提速：
+    被初筛拦下的文章按主模型的平均耗时估算节省的时间（不含省下的下载时间）
+    """
+    with _llm_stats_lock:
+        stats = dict(cascade_stats)
+        main_seconds = llm['generation_seconds'] if llm else llm_stats['generation_seconds']
+        main_calls = llm['calls'] if llm else llm_stats['calls']
+    avg_main = main_seconds / main_calls if main_calls else 0.0
+    baseline_seconds = main_seconds + stats['rejected'] * avg_main
+    actual_seconds = main_seconds + stats['screen_seconds']
+    stats['screen_seconds'] = round(stats['screen_seconds'], 2)
+    stats['rejected_ratio'] = round(stats['rejected'] / stats['screened'], 3) if stats['screened'] else 0
+    stats['estimated_saved_seconds'] = round(baseline_seconds - actual_seconds, 1)
+    stats['estimated_speedup'] = round(baseline_seconds / actual_seconds, 2) if actual_seconds else 1.0
+    return stats
+
+
+def _record_llm_call(result, prompt_tokens, num_ctx):
+    with _llm_stats_lock:
+        llm_stats['calls'] += 1
+        llm_stats['early_stops'] += 1 if result['early_stop'] else 0
+        llm_stats['decision_seconds'] += result['decision_seconds']
+        llm_stats['generation_seconds'] += result['generation_seconds']
+        llm_stats['prompt_tokens'] += prompt_tokens
+        llm_stats['num_ctx'] = num_ctx
+
+
+def _streamed_label(content):
+    """去掉已闭合的<think>块后，输出恰好等于某个分类时返回该分类，否则返回None"""
+    visible = re.sub(r'<think>.*?</think>', '', content, flags=re.DOTALL)
+    if '<think>' in visible:
+        # 思考块尚未结束
+        return None
+    visible = visible.strip()
+    return visible if visible in VALID_CATEGORIES else None
+
+
+def resolve_streamed_category(content):
+    """
+    判断流式输出到目前为止是否已能确定分类：
+    输出恰好等于某个分类且不是其他更长分类的前缀时返回该分类，否则返回None
+    """
+    visible = _streamed_label(content)
+    if visible is None:
+        return None
+    if any(other != visible and other.startswith(visible) for other in VALID_CATEGORIES):
+        return None
+    return visible
+
+
+def _generation_seconds(data, elapsed):
+    """Ollama在最后一个响应块中返回的生成总耗时（纳秒），没有时使用本地计时"""
+    total_duration = data.get("total_duration")
+    return total_duration / 1e9 if total_duration else elapsed
+
+
+def _chat_streaming(chat_url, payload):
+    """
+    流式请求Ollama，输出一旦能确定分类就断开连接（Ollama随之停止生成）
+    返回包含 content/decision_seconds/generation_seconds/early_stop/prompt_eval_count 的字典
+    """
+    start = time.perf_counter()
+    content = ""
+    decision_seconds = None
+    with requests.post(chat_url, json=dict(payload, stream=True), timeout=(CONNECT_TIMEOUT, TIMEOUT), stream=True) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            content += chunk.get("message", {}).get("content", "")
+            # 输出中第一次出现分类名称的时间（可能还是更长分类名称的前缀，此时继续接收）
+            if decision_seconds is None and _streamed_label(content):
+                decision_seconds = time.perf_counter() - start
+            category = resolve_streamed_category(content)
+            if category:
+                elapsed = time.perf_counter() - start
+                return {'content': category, 'decision_seconds': decision_seconds or elapsed, 'generation_seconds': elapsed,
+                        'early_stop': True, 'prompt_eval_count': None}
+            if chunk.get("done"):
+                elapsed = time.perf_counter() - start
+                return {'content': content, 'decision_seconds': decision_seconds or elapsed,
+                        'generation_seconds': _generation_seconds(chunk, elapsed),
+                        'early_stop': False, 'prompt_eval_count': chunk.get("prompt_eval_count")}
+    elapsed = time.perf_counter() - start
+    return {'content': content, 'decision_seconds': decision_seconds or elapsed, 'generation_seconds': elapsed,
+            'early_stop': False, 'prompt_eval_count': None}
+
+
+def _chat_blocking(chat_url, payload):
+    """非流式请求Ollama，返回格式同 _chat_streaming（收到完整响应时才能确定分类）"""
+    start = time.perf_counter()
+    response = requests.post(chat_url, json=payload, timeout=(CONNECT_TIMEOUT, TIMEOUT))
+    response.raise_for_status()
+    data = response.json()
+    elapsed = time.perf_counter() - start
+    return {'content': data["message"]["content"], 'decision_seconds': elapsed,
+            'generation_seconds': _generation_seconds(data, elapsed),
+            'early_stop': False, 'prompt_eval_count': data.get("prompt_eval_count")}
+
+
 def query_ollama_with_retry(prompt):
     """带重试机制的Ollama查询"""
     user_prompt = f"{prompt} /no think"
@@ -274,24 +487,198 @@ def query_ollama_with_retry(prompt):
         {"role": "system", "content": SYSTEM_PROMPT},
         {"role": "user", "content": user_prompt}
     ]
+
+    # 估算提示词token数，选择能容纳提示词和回复的最小num_ctx档位
+    prompt_tokens = TOKEN_ESTIMATOR.estimate(SYSTEM_PROMPT) + TOKEN_ESTIMATOR.estimate(user_prompt) + CHAT_TEMPLATE_OVERHEAD
+    num_ctx = CONTEXT_SIZER.choose(prompt_tokens + RESPONSE_TOKEN_RESERVE) if AUTO_NUM_CTX else NUM_CTX
+
     payload = {
         "model": MODEL_ID, "messages": messages, "stream": False,
-        "options": {"temperature": TEMPERATURE, "num_ctx": NUM_CTX}
+        "options": {"temperature": TEMPERATURE, "num_ctx": num_ctx}
     }
+    chat = _chat_streaming if STREAM_RESPONSE else _chat_blocking
+    breaker = get_breaker("ollama")
 
     for attempt in range(MAX_RETRIES):
+        # 熔断期间立即失败，不再逐篇等待超时
+        if not breaker.allow():
+            return f"[错误] Ollama处于熔断状态，{breaker.retry_in():.0f} 秒后重试"
         try:
-            response = requests.post(OLLAMA_URL, json=payload, timeout=TIMEOUT)
-            response.raise_for_status()
-            content = response.json()["message"]["content"]
-            return clean_response(content)
-        except requests.exceptions.RequestException as e:
+            with BACKEND_POOL.use() as backend:
+                with span("llm_attempt", attempt=attempt + 1, model=MODEL_ID, stream=STREAM_RESPONSE,
+                          backend=backend.url, prompt_tokens=prompt_tokens, num_ctx=num_ctx):
+                    result = chat(backend.chat_url, payload)
+            breaker.record_success()
+            if result['prompt_eval_count']:
+                # 用Ollama返回的实际token数校准估算
+                prompt_tokens = result['prompt_eval_count']
+                TOKEN_ESTIMATOR.observe([SYSTEM_PROMPT, user_prompt], prompt_tokens)
+            _record_llm_call(result, prompt_tokens, num_ctx)
+            if result['early_stop']:
+                print(f"⏱️ 流式输出已确定分类，提前结束（决策耗时 {result['decision_seconds']:.2f} 秒）")
+            return clean_response(result['content'])
+        except (requests.exceptions.RequestException, ValueError) as e:
+            breaker.record_failure()
             if attempt == MAX_RETRIES - 1:
                 return f"[错误] 请求失败: {str(e)}"
-            time.sleep(2)
+            time.sleep(backoff_delay(attempt))
     return "[错误] 达到最大重试次数"
 
 
+def classify_text(text_content, filename="", markdown_content=None):
+    """
+    对文章正文进行分类，返回分类名称；请求失败时返回以"[错误]"开头的字符串
+    提供 markdown_content 时用它构建去掉页眉页脚的摘要
+    """
+    # 如果内容过短，直接归为"无关"
+    if len(text_content) < MIN_TEXT_LENGTH:
+        print(f"⏩ 文件 '{filename}' 内容过短（{len(text_content)}字 < {MIN_TEXT_LENGTH}字），自动归为'无关'。")
+        return "无关"
+    # 创建摘要
+    summary = build_classification_summary(text_content, filename, markdown_content)
+    # 调用大模型进行分类
+    return query_ollama_with_retry(summary)
+
+
+def parse_title_score(content):
+    """从小模型的输出中解析0-100的无关把握分数，无法解析时返回None"""
+    cleaned = re.sub(r'<think>.*?</think>', '', content, flags=re.DOTALL)
+    match = re.search(r'\d{1,3}', cleaned)
+    if not match:
+        return None
+    score = int(match.group())
+    return score if 0 <= score <= 100 else None
+
+
+def screen_article_title(title, digest=""):
+    """
+    标题初筛：用小模型（title_model_id）根据标题和摘要判断是否明显无关
+    把握分数达到 title_irrelevant_threshold 时返回"无关"，否则（或未配置小模型、请求失败时）返回None，交给主模型分类
+    """
+    if not TITLE_MODEL_ID or not title:
+        return None
+
+    user_prompt = f"标题：{title}"
+    if digest:
+        user_prompt += f"\n摘要：{digest}"
+    payload = {
+        "model": TITLE_MODEL_ID,
+        "messages": [
+            {"role": "system", "content": TITLE_SYSTEM_PROMPT},
+            {"role": "user", "content": f"{user_prompt} /no think"}
+        ],
+        "stream": False,
+        "options": {"temperature": 0, "num_ctx": 2048, "num_predict": 16}
+    }
+
+    # 初筛模型单独熔断，不影响主模型
+    breaker = get_breaker("ollama_title")
+    start = time.perf_counter()
+    score = None
+    failed = False
+    try:
+        if not breaker.allow():
+            raise CircuitOpenError("标题初筛模型处于熔断状态")
+        try:
+            with BACKEND_POOL.use() as backend:
+                with span("title_screen", model=TITLE_MODEL_ID, backend=backend.url):
+                    content = _chat_blocking(backend.chat_url, payload)['content']
+        except (requests.exceptions.RequestException, ValueError, KeyError):
+            breaker.record_failure()
+            raise
+        breaker.record_success()
+        score = parse_title_score(content)
+    except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+        print(f"标题初筛请求失败，交给主模型分类: {e}")
+        failed = True
+    elapsed = time.perf_counter() - start
+
+    rejected = score is not None and score >= TITLE_IRRELEVANT_THRESHOLD
+    with _llm_stats_lock:
+        cascade_stats['screened'] += 1
+        cascade_stats['screen_seconds'] += elapsed
+        cascade_stats['failures'] += 1 if failed else 0
+        cascade_stats['rejected' if rejected else 'escalated'] += 1
+    if rejected:
+        print(f"⏩ 标题初筛判为无关（把握 {score}）: {title}")
+        return "无关"
+    return None
+
+
+# --- 文件放置策略 ---
+# 相关文章从下载文件夹放入 <分类结果文件夹>/<大类>/<小类>/ 时的方式（app_config.json 中的 placement_mode）：
+#   hardlink: 同一文件系统上创建硬链接，不额外占用磁盘，跨文件系统时退回复制（默认）；
+#             下载时先写临时文件再替换（WeChat.write_article_file），重新下载不会改动已分类的文章
+#   move:     下载文件夹只作为中转时直接原子改名，跨文件系统时退回复制后删除原文件
+#   copy:     始终复制（原有行为）
+PLACEMENT_MODES = ("hardlink", "move", "copy")
+
+placement_stats = {'linked': 0, 'moved': 0, 'copied': 0, 'bytes_written': 0}
+_placement_lock = threading.Lock()
+
+
+def reset_placement_stats():
+    """重置本次任务的放置统计"""
+    with _placement_lock:
+        for key in placement_stats:
+            placement_stats[key] = 0
+
+
+def get_placement_stats():
+    """获取本次任务的放置统计（bytes_written 为放置过程实际写入的字节数）"""
+    with _placement_lock:
+        return dict(placement_stats)
+
+
+def get_placement_mode():
+    """读取文件放置方式"""
+    mode = load_app_config().get('placement_mode', 'hardlink')
+    return mode if mode in PLACEMENT_MODES else 'hardlink'
+
+
+def place_article_file(source_path, target_path, mode=None, target_folder=None):
+    """
+    按放置策略把文章文件放入分类目录，返回实际使用的方式（linked/moved/copied）
+    target_folder 为目标小类文件夹，用于登记清单（未传入时按布局推断）
+    """
+    mode = mode or get_placement_mode()
+    result = None
+
+    if mode == 'hardlink':
+        try:
+            os.link(source_path, target_path)
+            result = 'linked'
+        except OSError:
+            # 跨文件系统或文件系统不支持硬链接
+            result = None
+    elif mode == 'move':
+        try:
+            os.replace(source_path, target_path)
+            result = 'moved'
+        except OSError:
+            result = None
+
+    written = 0
+    if result is None:
+        shutil.copy2(source_path, target_path)
+        written = os.path.getsize(target_path)
+        if mode == 'move':
+            os.remove(source_path)
+            result = 'moved'
+        else:
+            result = 'copied'
+
+    # 同步两边文件夹的清单
+    record_file(target_path, target_folder)
+    if result == 'moved':
+        forget_file(source_path)
+
+    with _placement_lock:
+        placement_stats[result] += 1
+        placement_stats['bytes_written'] += written
+    return result
+
+
 def initialize_classification(classification_folder=None, category_name=None):
     """
     初始化分类环境，创建输出文件夹（不包括"无关"文件夹）
@@ -320,20 +707,14 @@ def classify_single_article(file_path, sequence_number, article_info=None, class
     
     try:
         # 提取文本内容
-        text_content = extract_text_from_markdown(file_path)
+        with span("extract"):
+            markdown_content = read_markdown_file(file_path)
+            text_content = extract_text(markdown_content)
         if not text_content.strip():
             print(f"跳过空文件: {filename}")
             return None
         
-        # 如果内容过短，直接归为"无关"
-        if len(text_content) < MIN_TEXT_LENGTH:
-            classification_result = "无关"
-            print(f"⏩ 文件 '{filename}' 内容过短（{len(text_content)}字 < {MIN_TEXT_LENGTH}字），自动归为'无关'。")
-        else:
-            # 创建摘要
-            summary = create_summary(text_content)
-            # 调用大模型进行分类
-            classification_result = query_ollama_with_retry(summary)
+        classification_result = classify_text(text_content, filename, markdown_content)
         
         if classification_result.startswith("[错误]"):
             print(f"❌ 文件 '{filename}' 处理失败: {classification_result}")
@@ -353,14 +734,17 @@ def classify_single_article(file_path, sequence_number, article_info=None, class
             current_output_folder = os.path.join(current_output_folder, category_name)
         
         target_folder = os.path.join(current_output_folder, classification_result)
-        target_path = os.path.join(target_folder, filename)
+        # 按 directory_layout 放入分片子文件夹；是否已存在优先查文件夹清单，不列出整个文件夹
+        target_path = article_path(target_folder, filename, article_info.get("create_time") if article_info else None)
         
-        if os.path.exists(target_path):
+        if find_article(target_folder, filename) or os.path.exists(target_path):
             print(f"⚠️ 文件 '{filename}' 在分类目录中已存在，跳过保存和记录")
             return None
         
-        # 复制文件到新的分类目录
-        shutil.copy2(file_path, target_path)
+        # 将文件放入分类目录（硬链接/移动/复制）
+        with span("copy"):
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            place_article_file(file_path, target_path, target_folder=target_folder)
         
         # 创建分类记录
         file_title = extract_title_from_filename(filename)
@@ -383,6 +767,12 @@ def classify_single_article(file_path, sequence_number, article_info=None, class
             except:
                 record["发布日期"] = ""
         
+        # 加入全文检索索引（索引位于分类结果文件夹根目录，覆盖所有大类）
+        with span("search_index"):
+            index_article(classification_folder if classification_folder else OUTPUT_FOLDER, target_path,
+                          file_title, record["大类"], classification_result, text_content,
+                          record["发布日期"], record["来源"])
+        
         print(f"✅ 文件 '{filename}' -> 分类为: '{classification_result}'")
         return record
         
@@ -395,6 +785,7 @@ def save_classification_results(classification_records, output_folder=None, cate
     保存分类结果到CSV文件
     """
     if classification_records:
+        pd = _import_pandas()
         df_results = pd.DataFrame(classification_records)
         
         # 使用传入的输出文件夹或默认文件夹
@@ -410,24 +801,29 @@ def save_classification_results(classification_records, output_folder=None, cate
         if not os.path.exists(current_output_folder):
             os.makedirs(current_output_folder)
         
-        # 检查CSV文件是否存在，如果存在则追加，否则创建新文件
-        if os.path.exists(csv_path):
-            # 读取现有数据
-            existing_df = pd.read_csv(csv_path, encoding='utf-8-sig')
-            # 合并数据
-            combined_df = pd.concat([existing_df, df_results], ignore_index=True)
-            # 重新编号序号列
-            combined_df['序号'] = range(1, len(combined_df) + 1)
-            # 保存合并后的数据
-            combined_df.to_csv(csv_path, index=False, encoding='utf-8-sig')
-            print(f"成功！追加记录 {len(classification_records)} 条文档分类结果。")
-        else:
-            # 文件不存在，直接保存
-            df_results.to_csv(csv_path, index=False, encoding='utf-8-sig')
-            print(f"成功！新建记录 {len(classification_records)} 条文档分类结果。")
+        with span("catalog_write", records=len(classification_records)):
+            # 检查CSV文件是否存在，如果存在则追加，否则创建新文件
+            if os.path.exists(csv_path):
+                # 读取现有数据
+                existing_df = pd.read_csv(csv_path, encoding='utf-8-sig')
+                # 合并数据
+                combined_df = pd.concat([existing_df, df_results], ignore_index=True)
+                # 重新编号序号列
+                combined_df['序号'] = range(1, len(combined_df) + 1)
+                # 保存合并后的数据
+                combined_df.to_csv(csv_path, index=False, encoding='utf-8-sig')
+                print(f"成功！追加记录 {len(classification_records)} 条文档分类结果。")
+            else:
+                # 文件不存在，直接保存
+                df_results.to_csv(csv_path, index=False, encoding='utf-8-sig')
+                print(f"成功！新建记录 {len(classification_records)} 条文档分类结果。")
         
         print(f"分类结果已保存至: {csv_path}")
         
+        # 同时追加到按大类和月份分区的Parquet副本
+        with span("catalog_parquet_write", records=len(classification_records)):
+            append_catalog_records(classification_records, current_output_folder)
+        
         # 显示分类统计
         print("\n本批次分类统计:")
         for category in VALID_CATEGORIES:
@@ -454,16 +850,16 @@ def classify_wechat_articles(articles, source_directory, account_nickname, class
         print(f"错误：源目录 '{source_directory}' 不存在。")
         return
 
-    md_files = [f for f in os.listdir(source_directory) if f.endswith('.md')]
-    if not md_files:
+    md_paths = list_article_files(source_directory)
+    if not md_paths:
         print("源目录中没有找到Markdown文件。")
         return
 
-    total_files = len(md_files)
+    total_files = len(md_paths)
     print(f"开始处理 {total_files} 个文件...")
     
-    for index, filename in enumerate(md_files, 1):
-        file_path = os.path.join(source_directory, filename)
+    for index, file_path in enumerate(md_paths, 1):
+        filename = os.path.basename(file_path)
         total_files_processed += 1
         
         progress_percent = (index / total_files) * 100
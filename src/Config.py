@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+import os
+import json
+
+# --- 共享配置 ---
+# app.py、Classification.py、命令行工具等共用的默认配置和配置文件读取。
+# 本模块只依赖标准库，导入它不会加载 Flask/Socket.IO 或 pandas 等重量级依赖。
+
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config')
+
+
+def get_default_prompt_config():
+    """获取系统提示词默认配置"""
+    return {
+        'role_definition': '你是一名专注于线下快消品零售行业文章分类的专家，负责为大卖场/超市/便利店企业筛选和归类具有实操价值的案例或经营规范类内容，严格按照以下规则执行：',
+        'irrelevant_rules': [
+            "文字主旨非线下快消品零售业强相关",
+            "未包含具体企业实操案例/规范",
+            "不属于大卖场/超市/便利店之一的零售企业",
+            "存在：培训班/公示/广告/课程/会议/邀约/评奖/招聘/招募/推广/论坛/年会任一性质的内容",
+            "涉及电商/直播等线上渠道",
+            "所述是供应商/品牌方/餐饮业",
+            "纯新闻/报道/数据/主观内容/时效信息",
+            "含大量图片url链接"
+        ],
+        'categories': [
+            {'name': '合规风控类', 'desc': '风险事件处理/监管合规案例'},
+            {'name': '经营决策类', 'desc': '战略规划/商业模式/市场分析'},
+            {'name': '运营操作类', 'desc': '日常运营/流程优化/执行标准'},
+            {'name': '创新实践类', 'desc': '新技术应用/创新服务/差异化实践'}
+        ],
+        'examples': [
+            {
+                "text": "胖东来\"红内裤\"事件，一场信任危机下的企业合规警示录",
+                "category": "合规风控类"
+            },
+            {
+                "text": "沃尔玛推出自助结账系统，提升顾客购物体验",
+                "category": "创新实践类"
+            },
+            {
+                "text": "胖东来运营考核标准",
+                "category": "运营操作类"
+            },
+            {
+                "text": "创业型便利店该怎样才能做出成绩",
+                "category": "经营决策类"
+            }
+        ]
+    }
+
+
+def get_default_app_config():
+    """获取应用基础默认配置"""
+    return {
+        'api_token': '',
+        'output_folder': 'D:\\智能分类\\原文章',
+        'classification_folder': 'D:\\智能分类',
+        'category_name': '核心案例库',
+        'enable_classification': True,
+        'enable_trace': False,
+        'trace_format': 'chrome',
+        'enable_profile': False,
+        'enable_process_pool': True,
+        'convert_processes': 0,
+        'convert_max_tasks_per_child': 200,
+        # 等待转换进程池结果的最长秒数，超时后在当前进程中转换（0 为不限）
+        'convert_timeout': 60,
+        'async_download': True,
+        'download_concurrency': 4,
+        'download_rate_count': 20,
+        'download_rate_window': 20,
+        'enable_raw_store': True,
+        'raw_store_reuse': True,
+        'raw_store_folder': '',
+        'placement_mode': 'hardlink',
+        'exporter_connect_timeout': 5,
+        'exporter_read_timeout': 20,
+        'exporter_max_retries': 3,
+        'breaker_failure_threshold': 5,
+        'breaker_reset_seconds': 30,
+        'search_cache_ttl': 600,
+        'enable_article_index': True,
+        'article_index_ttl': 21600,
+        'article_index_path': '',
+        'list_concurrency': 4,
+        'use_work_queue': False,
+        'work_queue_path': '',
+        'work_queue_local_workers': 2,
+        'work_queue_visibility_timeout': 900,
+        'work_queue_max_attempts': 3,
+        # 处理进程所在电脑的路径换算：{"生产者电脑上的路径前缀": "本机路径前缀"}，用于无法按队列文件夹相对保存的路径
+        'work_queue_path_map': {},
+        'exporter_min_interval': 1.0,
+        'enable_parquet_catalog': True,
+        'enable_search_index': True,
+        'directory_layout': 'flat',
+        'enable_manifest': True,
+        'socketio_async_mode': 'threading',
+        # Web服务监听的地址：默认只允许本机访问，需要局域网访问时设为 0.0.0.0
+        'web_host': '127.0.0.1',
+        'web_port': 5000,
+        # Werkzeug 调试模式（交互式调试器可执行任意代码），只在监听本机地址时生效
+        'web_debug': False
+    }
+
+
+def get_default_ollama_config():
+    """获取Ollama默认配置"""
+    return {
+        'ollama_url': 'http://localhost:11434',
+        'model_id': 'qwen3:8b',
+        'temperature': 0.3,
+        'timeout': 80,
+        'connect_timeout': 5,
+        'max_retries': 3,
+        'max_summary_length': 600,
+        'num_ctx': 5120,
+        'min_text_length': 150,
+        'stream_response': True,
+        'auto_num_ctx': True,
+        'max_summary_tokens': 400,
+        'response_token_reserve': 512,
+        'clean_summary': True,
+        # 标题初筛使用的小模型，留空时不启用两级分类
+        'title_model_id': '',
+        'title_irrelevant_threshold': 90,
+        # 多台推理服务器: [{"url": "http://host:11434", "weight": 1}, ...]，为空时只使用 ollama_url
+        'backends': [],
+    }
+
+
+def get_config_path(filename):
+    """获取配置文件的完整路径"""
+    return os.path.join(CONFIG_DIR, filename)
+
+
+def load_json_config(filename, default_config=None):
+    """
+    读取配置文件，并用默认配置补全缺失的字段。
+    文件不存在或读取失败时返回默认配置的副本（无默认配置时返回None）。
+    """
+    config_path = get_config_path(filename)
+    if not os.path.exists(config_path):
+        return dict(default_config) if default_config is not None else None
+
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except Exception as e:
+        print(f"加载配置文件 {filename} 失败: {e}")
+        return dict(default_config) if default_config is not None else None
+
+    if default_config:
+        for key, value in default_config.items():
+            if key not in config:
+                config[key] = value
+    return config
+
+
+def load_app_config():
+    """加载应用基础配置"""
+    return load_json_config('app_config.json', get_default_app_config())
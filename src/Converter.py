@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+import os
+import atexit
+import threading
+import multiprocessing
+
+from Config import load_app_config
+
+# --- HTML→Markdown 转换进程池 ---
+# html2text 是纯Python实现，转换大篇文章时会长时间占用GIL。
+# 这里把转换（以及Markdown→纯文本提取）交给进程池执行，调用线程在等待结果时释放GIL，
+# 下载线程和Web请求不再被单个CPU核心卡住。
+# 进程池中的工作进程每处理 max_tasks_per_child 个任务后重建，避免内存持续增长。
+# Web服务是多线程进程，在其中fork可能复制其他线程持有的锁导致子进程死锁，
+# 因此进程池以 forkserver（Windows上为 spawn）方式启动工作进程；子进程会重新导入入口模块，
+# 入口模块的副作用（如 app.py 重定向标准输出）需放在 __main__ 判断中。
+# 等待结果超过 convert_timeout 秒时放弃进程池的结果，改为在当前进程中转换。
+
+# 小于该长度的内容直接在当前进程处理，进程间传输的开销比转换本身还大
+INLINE_THRESHOLD = 20000
+
+_pool = None
+_pool_lock = threading.Lock()
+_pool_failed = False
+_pool_timeout = None
+
+
+# --- 在工作进程中执行的函数（必须是模块级函数才能被pickle） ---
+
+def html_to_markdown(html_content):
+    """将HTML转换为Markdown"""
+    import html2text
+    h = html2text.HTML2Text()
+    # 可以根据需要忽略图片和链接
+    # h.ignore_links = True
+    # h.ignore_images = True
+    return h.handle(html_content)
+
+
+def markdown_to_text(md_content):
+    """从Markdown内容中提取纯文本"""
+    import markdown
+    from bs4 import BeautifulSoup
+    html = markdown.markdown(md_content)
+    soup = BeautifulSoup(html, 'html.parser')
+    return soup.get_text(separator=' ', strip=True)
+
+
+# --- 进程池管理 ---
+
+def get_pool_settings():
+    """读取进程池配置：(是否启用, 进程数, 每个进程最多处理的任务数)"""
+    app_config = load_app_config()
+    enabled = bool(app_config.get('enable_process_pool', True))
+    processes = int(app_config.get('convert_processes', 0) or 0)
+    if processes <= 0:
+        processes = os.cpu_count() or 1
+    max_tasks = int(app_config.get('convert_max_tasks_per_child', 200) or 0) or None
+    return enabled, processes, max_tasks
+
+
+def get_pool_context():
+    """不使用fork：有 forkserver 时用 forkserver，否则（Windows）用 spawn"""
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+
+def get_pool():
+    """获取（必要时创建）转换进程池；不可用时返回None，调用方改为在当前进程中转换"""
+    global _pool, _pool_failed, _pool_timeout
+    if _pool is not None or _pool_failed:
+        return _pool
+
+    with _pool_lock:
+        if _pool is not None or _pool_failed:
+            return _pool
+        enabled, processes, max_tasks = get_pool_settings()
+        if not enabled or processes < 2:
+            _pool_failed = True
+            return None
+        try:
+            _pool_timeout = float(load_app_config().get('convert_timeout', 60) or 0) or None
+            _pool = get_pool_context().Pool(processes=processes, maxtasksperchild=max_tasks)
+            print(f"转换进程池已启动: {processes} 个进程，每个进程最多处理 {max_tasks or '不限'} 个任务")
+        except Exception as e:
+            print(f"创建转换进程池失败，改为在当前进程中转换: {e}")
+            _pool_failed = True
+    return _pool
+
+
+def shutdown_pool():
+    """关闭转换进程池"""
+    global _pool, _pool_failed
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool.join()
+            _pool = None
+        _pool_failed = False
+
+
+atexit.register(shutdown_pool)
+
+
+def _run(func, content):
+    """按内容大小决定在进程池中还是在当前进程中执行"""
+    if len(content) < INLINE_THRESHOLD:
+        return func(content)
+    pool = get_pool()
+    if pool is None:
+        return func(content)
+    try:
+        return pool.apply_async(func, (content,)).get(timeout=_pool_timeout)
+    except multiprocessing.TimeoutError:
+        print(f"转换进程池超过 {_pool_timeout} 秒未返回，改为在当前进程中转换")
+        return func(content)
+
+
+def convert_html(html_content):
+    """将HTML转换为Markdown（大文章在进程池中执行）"""
+    return _run(html_to_markdown, html_content)
+
+
+def extract_text(md_content):
+    """从Markdown中提取纯文本（大文章在进程池中执行）"""
+    return _run(markdown_to_text, md_content)
+
@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+"""
+文章文件夹的分片布局与文件清单。
+
+示例:
+    # 由文件夹的实际内容重建清单（手动增删过文件后）
+    python src/Layout.py --rebuild D:\\智能分类\\原文章\\某公众号 --rebuild D:\\智能分类\\核心案例库\\经营决策类
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+from datetime import datetime
+
+sys.path.append(os.path.dirname(__file__))
+
+from Config import load_app_config
+
+# --- 分片目录布局与文件清单 ---
+# 公众号下载文件夹和各小类文件夹默认是平铺的，单个文件夹中有数万个文件时，
+# 列目录和判断文件是否存在都很慢（网络盘上尤其明显）。
+# app_config.json 中 directory_layout 可选：
+#   flat  : 平铺（默认，与原来相同）
+#   month : 按发布月份分子文件夹，<文件夹>/2024-05/<标题>.md
+#   hash  : 按文件名哈希前2位分子文件夹（最多256个），<文件夹>/3f/<标题>.md
+# 每个文件夹（公众号文件夹、小类文件夹）另有一个清单 _manifest.jsonl，记录其中的全部文章，
+# 每行一次增加或删除，写入文章、删除无关文章、放入分类文件夹、重新分类移动时同步追加。
+# 分类、去重、重新分类、建立检索索引时读取清单，不再列出整个文件夹。
+# 清单按文章相对于该文件夹的路径登记，按月份分片时不同月份的同名文章各占一条。
+# 清单第一次创建时会完整扫描一次文件夹，之后只追加；手动增删文件后用本文件的命令行重建。
+# 登记、删除文章时由调用方传入文章所属的文件夹；没有传入时才按当前布局从路径推断，
+# 推断只认当前布局的分片名（hash 布局还要与文件名的哈希一致），平铺布局时不推断。
+
+LAYOUTS = ('flat', 'month', 'hash')
+MANIFEST_FILENAME = '_manifest.jsonl'
+UNKNOWN_MONTH = '未知月份'
+
+_SHARD_PATTERN = re.compile(r'^(\d{4}-\d{2}|[0-9a-f]{2}|' + UNKNOWN_MONTH + r')$')
+_MONTH_SHARD_PATTERN = re.compile(r'^(\d{4}-\d{2}|' + UNKNOWN_MONTH + r')$')
+
+_manifests = {}
+_manifests_lock = threading.Lock()
+
+# 新建文件的默认权限（0o666 去掉 umask）；tempfile.mkstemp 创建的文件只有所有者可读写，替换后需恢复
+_umask = os.umask(0)
+os.umask(_umask)
+FILE_MODE = 0o666 & ~_umask
+
+
+def get_layout():
+    """当前的目录布局"""
+    layout = load_app_config().get('directory_layout', 'flat')
+    return layout if layout in LAYOUTS else 'flat'
+
+
+def manifest_enabled():
+    """只在分片布局下使用清单；平铺布局直接判断文件是否存在即可"""
+    app_config = load_app_config()
+    return app_config.get('enable_manifest', True) and get_layout() != 'flat'
+
+
+def replace_with_temp(path, write, encoding='utf-8'):
+    """
+    在同一文件夹中创建唯一的临时文件，write(f) 写入内容后替换 path，
+    多个进程同时写同一路径时不会互相覆盖临时文件；替换后恢复默认权限
+    """
+    folder = os.path.dirname(os.path.abspath(path))
+    os.makedirs(folder, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=folder, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding=encoding) as f:
+            write(f)
+        os.chmod(temp_path, FILE_MODE)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def shard_name(filename, publish_time=None, layout=None):
+    """文件所在的分片子文件夹名，平铺布局时为空字符串"""
+    layout = layout or get_layout()
+    if layout == 'month':
+        try:
+            return datetime.fromtimestamp(int(publish_time)).strftime('%Y-%m') if publish_time else UNKNOWN_MONTH
+        except (TypeError, ValueError, OSError):
+            return UNKNOWN_MONTH
+    if layout == 'hash':
+        return hashlib.md5(filename.encode('utf-8')).hexdigest()[:2]
+    return ''
+
+
+def article_path(folder, filename, publish_time=None):
+    """按当前布局确定文章在文件夹中的保存路径"""
+    return os.path.join(folder, shard_name(filename, publish_time), filename)
+
+
+def folder_root(path, layout=None):
+    """按当前布局推断文章文件所属的文件夹（分片子文件夹的上一级），调用方知道所属文件夹时不必使用"""
+    layout = layout or get_layout()
+    parent = os.path.dirname(os.path.abspath(path))
+    shard = os.path.basename(parent)
+    if layout == 'hash' and shard == shard_name(os.path.basename(path), layout='hash'):
+        return os.path.dirname(parent)
+    if layout == 'month' and _MONTH_SHARD_PATTERN.match(shard):
+        return os.path.dirname(parent)
+    return parent
+
+
+def _walk(folder, suffix='.md'):
+    """扫描文件夹及其分片子文件夹，返回文件的绝对路径列表"""
+    paths = []
+    if not os.path.isdir(folder):
+        return paths
+    for entry in os.scandir(folder):
+        if entry.is_file() and entry.name.endswith(suffix):
+            paths.append(os.path.abspath(entry.path))
+        elif entry.is_dir() and _SHARD_PATTERN.match(entry.name):
+            paths.extend(os.path.abspath(sub.path) for sub in os.scandir(entry.path)
+                         if sub.is_file() and sub.name.endswith(suffix))
+    return paths
+
+
+class FolderManifest:
+    """单个文件夹的文章清单（追加写入的JSON Lines）"""
+
+    def __init__(self, folder):
+        self.folder = os.path.abspath(folder)
+        self.path = os.path.join(self.folder, MANIFEST_FILENAME)
+        self.lock = threading.Lock()
+        # 相对路径 -> 文件名
+        self.entries = {}
+        # 文件名 -> 相对路径列表（按月份分片时可能有多篇同名文章）
+        self.names = {}
+        self.offset = 0
+        self.inode = None
+
+    def _add_entry(self, relative, name):
+        if relative not in self.entries:
+            self.entries[relative] = name
+            self.names.setdefault(name, []).append(relative)
+
+    def _remove_entry(self, relative):
+        name = self.entries.pop(relative, None)
+        if name is None:
+            return
+        paths = self.names.get(name, [])
+        if relative in paths:
+            paths.remove(relative)
+        if not paths:
+            self.names.pop(name, None)
+
+    def _refresh_locked(self):
+        """读取其他进程追加的内容；清单被重建（替换为新文件）时重新读取"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            self.entries, self.names, self.offset, self.inode = {}, {}, 0, None
+            return False
+        size = stat.st_size
+        if stat.st_ino != self.inode or size < self.offset:
+            self.entries, self.names, self.offset, self.inode = {}, {}, 0, stat.st_ino
+        if size > self.offset:
+            with open(self.path, 'rb') as f:
+                f.seek(self.offset)
+                data = f.read()
+            # 只处理完整的行，最后一行可能正在被其他进程写入
+            end = data.rfind(b'\n') + 1
+            for line in data[:end].decode('utf-8').splitlines():
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                relative = entry.get('path')
+                if entry.get('op') == 'remove':
+                    if relative:
+                        self._remove_entry(relative)
+                    else:
+                        # 旧格式的删除记录只有文件名
+                        for path in list(self.names.get(entry.get('name'), [])):
+                            self._remove_entry(path)
+                elif relative:
+                    self._add_entry(relative, entry.get('name') or os.path.basename(relative))
+            self.offset += end
+        return True
+
+    def _append_locked(self, entry):
+        if not os.path.exists(self.path):
+            # 第一次创建时完整扫描，保证清单包含文件夹中已有的文章
+            self._rebuild_locked()
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    def _rebuild_locked(self):
+        paths = _walk(self.folder)
+
+        def write(f):
+            for path in paths:
+                f.write(json.dumps({'op': 'add', 'name': os.path.basename(path),
+                                    'path': os.path.relpath(path, self.folder)}, ensure_ascii=False) + '\n')
+        replace_with_temp(self.path, write)
+        self._refresh_locked()
+        return len(paths)
+
+    def add(self, path):
+        name = os.path.basename(path)
+        relative = os.path.relpath(os.path.abspath(path), self.folder)
+        with self.lock:
+            self._refresh_locked()
+            if relative in self.entries:
+                return
+            self._append_locked({'op': 'add', 'name': name, 'path': relative})
+            self._add_entry(relative, name)
+
+    def remove(self, path):
+        relative = os.path.relpath(os.path.abspath(path), self.folder)
+        with self.lock:
+            self._refresh_locked()
+            if relative not in self.entries:
+                return
+            self._append_locked({'op': 'remove', 'name': os.path.basename(path), 'path': relative})
+            self._remove_entry(relative)
+
+    def get(self, name):
+        """
+        清单中该文件名、且文件仍然存在的绝对路径（有多篇同名文章时返回最早登记的一篇），不存在时返回None；
+        手动删除的文件从清单中去掉
+        """
+        with self.lock:
+            self._refresh_locked()
+            paths = list(self.names.get(name, []))
+        for relative in paths:
+            path = os.path.join(self.folder, relative)
+            if os.path.exists(path):
+                return path
+            self.remove(path)
+        return None
+
+    def files(self):
+        with self.lock:
+            self._refresh_locked()
+            return [os.path.join(self.folder, relative) for relative in self.entries]
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def rebuild(self):
+        """按文件夹的实际内容重建清单，返回文章数"""
+        with self.lock:
+            return self._rebuild_locked()
+
+
+def get_manifest(folder):
+    """获取文件夹的清单，同一文件夹共用一个实例"""
+    folder = os.path.abspath(folder)
+    with _manifests_lock:
+        if folder not in _manifests:
+            _manifests[folder] = FolderManifest(folder)
+        return _manifests[folder]
+
+
+def record_file(path, folder=None):
+    """文章写入或放入文件夹后登记到清单，folder 为文章所属的文件夹（未传入时按布局推断）"""
+    if manifest_enabled():
+        try:
+            get_manifest(folder or folder_root(path)).add(path)
+        except OSError as e:
+            print(f"更新文件清单失败: {e}")
+
+
+def forget_file(path, folder=None):
+    """文章删除或移走后从清单中去掉，folder 同 record_file"""
+    if manifest_enabled():
+        try:
+            get_manifest(folder or folder_root(path)).remove(path)
+        except OSError as e:
+            print(f"更新文件清单失败: {e}")
+
+
+def remove_article_file(path, folder=None):
+    """删除文章文件并更新清单，folder 同 record_file"""
+    os.remove(path)
+    forget_file(path, folder)
+
+
+def find_article(folder, filename):
+    """文件夹中（任意分片下）是否已有该文件名的文章，返回路径或None"""
+    if manifest_enabled():
+        manifest = get_manifest(folder)
+        if manifest.exists():
+            path = manifest.get(filename)
+            if path:
+                return path
+    for shard in {'', shard_name(filename)}:
+        path = os.path.join(folder, shard, filename)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def list_article_files(folder, suffix='.md'):
+    """文件夹中全部文章的路径：有清单时读取清单，否则扫描文件夹（含分片子文件夹）"""
+    if manifest_enabled():
+        manifest = get_manifest(folder)
+        if manifest.exists():
+            paths = []
+            for path in manifest.files():
+                if not path.endswith(suffix):
+                    continue
+                if os.path.exists(path):
+                    paths.append(path)
+                else:
+                    # 手动删除的文件从清单中去掉
+                    manifest.remove(path)
+            return paths
+    return _walk(folder, suffix)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="由文件夹的实际内容重建文章清单")
+    parser.add_argument("--rebuild", action="append", default=[], help="要重建清单的文件夹，可重复指定")
+    args = parser.parse_args(argv)
+    if not args.rebuild:
+        parser.print_help()
+        return 2
+    for folder in args.rebuild:
+        count = get_manifest(folder).rebuild()
+        print(f"清单已重建: {folder}（{count} 篇文章）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
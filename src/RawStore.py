@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+
+import os
+import gzip
+import hashlib
+import sqlite3
+import threading
+from datetime import datetime
+
+from Config import load_app_config
+
+# --- 原始HTML存储 ---
+# 下载接口返回的原始HTML按内容哈希(sha256)压缩保存一次，并按文章链接建立索引：
+#   <store>/objects/<哈希前2位>/<哈希>.html.zst (或 .html.gz)
+#   <store>/index.sqlite
+# 之后修改转换参数或提示词时，可以直接从这里读取HTML，不必再通过限速的下载接口重新下载。
+# 安装了 zstandard 时使用zstd压缩，否则使用gzip。
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+STORE_FOLDER_NAME = '_raw_store'
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class RawStore:
+    """按内容寻址的压缩原始HTML存储"""
+
+    def __init__(self, root):
+        self.root = root
+        self.objects_dir = os.path.join(root, 'objects')
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(root, 'index.sqlite'), check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS articles (
+                link TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                title TEXT,
+                stored_at TEXT
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS objects (
+                content_hash TEXT PRIMARY KEY,
+                codec TEXT NOT NULL,
+                raw_size INTEGER,
+                stored_size INTEGER
+            )
+        """)
+        self.conn.commit()
+
+    # --- 压缩 ---
+
+    @staticmethod
+    def _compress(data):
+        if zstandard is not None:
+            return 'zst', zstandard.ZstdCompressor(level=10).compress(data)
+        return 'gz', gzip.compress(data, compresslevel=6)
+
+    @staticmethod
+    def _decompress(codec, data):
+        if codec == 'zst':
+            if zstandard is None:
+                raise RuntimeError("读取zstd压缩的内容需要安装 zstandard")
+            return zstandard.ZstdDecompressor().decompress(data)
+        return gzip.decompress(data)
+
+    def _object_path(self, content_hash, codec):
+        return os.path.join(self.objects_dir, content_hash[:2], f"{content_hash}.html.{codec}")
+
+    # --- 读写接口 ---
+
+    def put(self, link, html_content, title=None):
+        """保存一篇文章的原始HTML，返回内容哈希；相同内容只保存一份"""
+        data = html_content.encode('utf-8')
+        content_hash = hashlib.sha256(data).hexdigest()
+
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT codec FROM objects WHERE content_hash = ?", (content_hash,)
+            ).fetchone()
+            if row is None:
+                codec, compressed = self._compress(data)
+                object_path = self._object_path(content_hash, codec)
+                os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                # 先写临时文件再改名，避免中断时留下不完整的对象
+                tmp_path = object_path + '.tmp'
+                with open(tmp_path, 'wb') as f:
+                    f.write(compressed)
+                os.replace(tmp_path, object_path)
+                self.conn.execute(
+                    "INSERT INTO objects (content_hash, codec, raw_size, stored_size) VALUES (?, ?, ?, ?)",
+                    (content_hash, codec, len(data), len(compressed))
+                )
+
+            if link:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO articles (link, content_hash, title, stored_at) VALUES (?, ?, ?, ?)",
+                    (link, content_hash, title, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+                )
+            self.conn.commit()
+
+        return content_hash
+
+    def get_hash(self, link):
+        """根据文章链接查询内容哈希，不存在时返回None"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT content_hash FROM articles WHERE link = ?", (link,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def has(self, link):
+        """是否已保存该链接的原始HTML"""
+        return self.get_hash(link) is not None
+
+    def get_by_hash(self, content_hash):
+        """根据内容哈希读取原始HTML，不存在时返回None"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT codec FROM objects WHERE content_hash = ?", (content_hash,)
+            ).fetchone()
+        if row is None:
+            return None
+        object_path = self._object_path(content_hash, row[0])
+        try:
+            with open(object_path, 'rb') as f:
+                return self._decompress(row[0], f.read()).decode('utf-8')
+        except OSError:
+            return None
+
+    def get_html(self, link):
+        """根据文章链接读取原始HTML，不存在时返回None"""
+        content_hash = self.get_hash(link)
+        return self.get_by_hash(content_hash) if content_hash else None
+
+    def links(self):
+        """返回已保存的全部 (链接, 标题)"""
+        with self.lock:
+            return self.conn.execute("SELECT link, title FROM articles").fetchall()
+
+    def stats(self):
+        """存储统计：文章数、对象数、原始字节数、压缩后字节数"""
+        with self.lock:
+            article_count = self.conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+            object_count, raw_bytes, stored_bytes = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(raw_size), 0), COALESCE(SUM(stored_size), 0) FROM objects"
+            ).fetchone()
+        return {
+            'articles': article_count,
+            'objects': object_count,
+            'raw_bytes': raw_bytes,
+            'stored_bytes': stored_bytes,
+            'compression_ratio': round(stored_bytes / raw_bytes, 3) if raw_bytes else 0,
+        }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def get_store_root(output_dir):
+    """
+    获取原始HTML存储目录：优先使用 app_config.json 中的 raw_store_folder，
+    否则放在下载文件夹（公众号目录的上一级）下的 _raw_store 目录
+    """
+    app_config = load_app_config()
+    if app_config.get('raw_store_folder'):
+        return app_config['raw_store_folder']
+    return os.path.join(os.path.dirname(os.path.abspath(output_dir)), STORE_FOLDER_NAME)
+
+
+def get_raw_store(root):
+    """获取（必要时打开）指定目录的存储，同一目录共用一个实例"""
+    root = os.path.abspath(root)
+    with _stores_lock:
+        if root not in _stores:
+            _stores[root] = RawStore(root)
+        return _stores[root]
+
+
+def get_raw_store_for(output_dir):
+    """获取下载目录对应的存储；app_config.json 中关闭了 enable_raw_store 时返回None"""
+    if not load_app_config().get('enable_raw_store', True):
+        return None
+    return get_raw_store(get_store_root(output_dir))
+
+
+def load_raw_html(link, output_dir=None, store_root=None):
+    """不访问网络，从本地存储读取文章的原始HTML，不存在时返回None"""
+    root = store_root if store_root else get_store_root(output_dir or '.')
+    if not os.path.isdir(root):
+        return None
+    return get_raw_store(root).get_html(link)
@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+import Classification
+from Config import load_app_config
+from Classification import classify_text, read_markdown_file, extract_title_from_filename, _import_pandas
+from Converter import extract_text
+from CatalogParquet import rebuild_catalog_parquet
+from SearchIndex import get_search_index, index_article
+from Layout import list_article_files, record_file, forget_file, remove_article_file
+
+# --- 离线重新分类 ---
+# 修改 prompt_config.json（新增分类、收紧无关规则）后，不必重新下载文章：
+# 直接读取分类结果文件夹中已保存的文章（<分类结果文件夹>/<大类>/<小类>/*.md），并行重新分类，
+# 只有分类结果改变的文章才会被移动（新结果为"无关"时删除），同时就地更新"资料汇总.csv"，
+# 并输出分类变化的对比报告。
+# 可选地把原始HTML存储中此前被判为"无关"的文章也重新分类一遍，新的规则下相关的文章会被补充进来。
+
+CATALOG_FILENAME = "资料汇总.csv"
+
+
+def collect_corpus(category_folder):
+    """
+    收集大类文件夹下所有小类文件夹中的文章
+    返回 [(小类, 文件路径), ...]
+    """
+    items = []
+    if not os.path.isdir(category_folder):
+        return items
+    for label in sorted(os.listdir(category_folder)):
+        label_folder = os.path.join(category_folder, label)
+        if not os.path.isdir(label_folder) or label.startswith('_'):
+            continue
+        # 有文件清单时读取清单，否则扫描（含分片子文件夹）
+        for file_path in list_article_files(label_folder):
+            items.append((label, file_path))
+    return items
+
+
+def _classify_file(file_path):
+    """对已保存的文章重新分类，返回新的分类名称或"[错误]..."字符串"""
+    try:
+        markdown_content = read_markdown_file(file_path)
+        text_content = extract_text(markdown_content)
+    except Exception as e:
+        return f"[错误] 读取文件失败: {e}"
+    if not text_content.strip():
+        return "[错误] 空文件"
+    return classify_text(text_content, os.path.basename(file_path), markdown_content)
+
+
+def _apply_change(file_path, old_label, new_label, category_folder, search_index=None):
+    """
+    按新的分类移动（或删除）文件，同时更新全文检索索引，返回 (是否成功, 说明)
+    """
+    source_folder = os.path.join(category_folder, old_label)
+    if new_label == "无关":
+        remove_article_file(file_path, source_folder)
+        _update_index(search_index, 'remove', file_path)
+        return True, "已删除"
+
+    # 保持原来的分片子文件夹
+    target_folder = os.path.join(category_folder, new_label)
+    target_path = os.path.join(target_folder, os.path.relpath(file_path, source_folder))
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    if os.path.exists(target_path):
+        return False, "目标分类中已存在同名文件"
+    os.replace(file_path, target_path)
+    forget_file(file_path, source_folder)
+    record_file(target_path, target_folder)
+    _update_index(search_index, 'move', file_path, target_path, new_label)
+    return True, "已移动"
+
+
+def _update_index(search_index, method, *args):
+    """文件已经移动/删除后再更新全文检索索引，索引出错不影响这篇文章的结果"""
+    if search_index is None:
+        return
+    try:
+        getattr(search_index, method)(*args)
+    except Exception as e:
+        print(f"更新全文检索索引失败: {e}")
+
+
+def update_catalog(category_folder, changes):
+    """
+    就地更新资料汇总表：改变分类的文章修改"小类"，变为"无关"的文章删除记录
+    changes: [(文档名称, 原小类, 新小类), ...]
+    """
+    csv_path = os.path.join(category_folder, CATALOG_FILENAME)
+    if not changes or not os.path.exists(csv_path):
+        return 0
+
+    pd = _import_pandas()
+    df = pd.read_csv(csv_path, encoding='utf-8-sig')
+    updated = 0
+    drop_index = []
+    for title, old_label, new_label in changes:
+        mask = (df['文档名称'].astype(str) == title) & (df['小类'] == old_label)
+        if not mask.any():
+            continue
+        updated += int(mask.sum())
+        if new_label == "无关":
+            drop_index.extend(df.index[mask].tolist())
+        else:
+            df.loc[mask, '小类'] = new_label
+
+    if drop_index:
+        df = df.drop(index=drop_index)
+    df['序号'] = range(1, len(df) + 1)
+    df.to_csv(csv_path, index=False, encoding='utf-8-sig')
+    # 修改了已有记录，Parquet副本整体重建
+    rebuild_catalog_parquet(category_folder)
+    return updated
+
+
+def _reclassify_raw_store(category_folder, category_name, store_root, concurrency, dry_run, task_status,
+                          classification_folder=None, errors=None):
+    """
+    把原始HTML存储中尚未入库的文章重新分类，新规则下相关的文章补充到对应分类文件夹和资料汇总表
+    返回新增的 [(文档名称, "无关", 新小类), ...]；单篇文章出错时记入 errors 并继续
+    """
+    errors = errors if errors is not None else []
+    from RawStore import get_raw_store
+    from ArticleIndex import get_article_index, get_index_path
+    from Converter import convert_html
+    from WeChat import get_article_file_path
+
+    if not store_root or not os.path.isdir(store_root):
+        print(f"原始HTML存储不存在，跳过: {store_root}")
+        return []
+
+    store = get_raw_store(store_root)
+    # 发布日期从文章列表缓存中查询（与原始HTML存储位于同一下载文件夹下）
+    index_path = get_index_path(os.path.dirname(os.path.abspath(store_root)))
+    article_index = get_article_index(index_path) if os.path.exists(index_path) else None
+    csv_path = os.path.join(category_folder, CATALOG_FILENAME)
+    known_links = set()
+    if os.path.exists(csv_path):
+        pd = _import_pandas()
+        known_links = set(pd.read_csv(csv_path, encoding='utf-8-sig')['来源'].dropna().astype(str))
+
+    candidates = [(link, title) for link, title in store.links() if link not in known_links and title]
+    print(f"原始HTML存储中有 {len(candidates)} 篇未入库的文章需要重新分类")
+
+    def classify_candidate(link, title):
+        html_content = store.get_html(link)
+        if not html_content:
+            return link, title, None, "[错误] 原始HTML缺失"
+        markdown_content = convert_html(html_content)
+        return link, title, markdown_content, classify_text(extract_text(markdown_content), title, markdown_content)
+
+    added = []
+    records = []
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = {executor.submit(classify_candidate, link, title): title for link, title in candidates}
+            for future in as_completed(futures):
+                if task_status is not None and not task_status.get('running', True):
+                    for pending in futures:
+                        pending.cancel()
+                    break
+                try:
+                    link, title, markdown_content, label = future.result()
+                except Exception as e:
+                    # 转换或分类接口异常只影响这一篇文章
+                    errors.append({"file": futures[future], "label": "无关", "error": f"[错误] {e}"})
+                    print(f"❌ {futures[future]}: {e}")
+                    continue
+                if label.startswith("[错误]"):
+                    errors.append({"file": title, "label": "无关", "error": label})
+                    continue
+                if label == "无关":
+                    continue
+                metadata = article_index.lookup(link) if article_index is not None else None
+                label_folder = os.path.join(category_folder, label)
+                file_path = get_article_file_path(label_folder, title,
+                                                  metadata.get("create_time") if metadata else None)
+                if os.path.exists(file_path):
+                    continue
+                if dry_run:
+                    added.append((os.path.splitext(os.path.basename(file_path))[0], "无关", label))
+                    continue
+                try:
+                    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                    with open(file_path, "w", encoding="utf-8-sig") as f:
+                        f.write(markdown_content)
+                    record_file(file_path, label_folder)
+                except OSError as e:
+                    errors.append({"file": title, "label": "无关", "new_label": label, "error": str(e)})
+                    continue
+                added.append((os.path.splitext(os.path.basename(file_path))[0], "无关", label))
+                record = {
+                    "序号": 0,
+                    "大类": category_name,
+                    "小类": label,
+                    "文档名称": extract_title_from_filename(os.path.basename(file_path)),
+                    "入库日期": datetime.now().strftime("%Y-%m-%d"),
+                    "来源": link,
+                    "发布日期": datetime.fromtimestamp(metadata["create_time"]).strftime("%Y-%m-%d")
+                                if metadata and metadata.get("create_time") else ""
+                }
+                records.append(record)
+                index_article(classification_folder or os.path.dirname(category_folder), file_path, record["文档名称"],
+                              category_name, label, extract_text(markdown_content), record["发布日期"], link)
+    finally:
+        # 已写入分类文件夹的文章必须登记到资料汇总表，即使后续出错中断
+        if records:
+            # category_folder 已包含大类，这里不再传入大类名称
+            Classification.save_classification_results(records, category_folder)
+    return added
+
+
+def reclassify_corpus(classification_folder, category_name, concurrency=4, dry_run=False,
+                      include_raw_store=False, raw_store_root=None, task_status=None):
+    """
+    对大类文件夹下已保存的全部文章重新分类，返回变化报告（字典）
+    category_name 必须指定：分类结果文件夹下是各个大类文件夹，直接当作小类处理会把文章移到错误的位置
+    dry_run 为True时只报告变化，不移动文件、不修改资料汇总表
+    """
+    if not category_name:
+        raise ValueError("重新分类需要指定大类名称")
+    # 使用最新的提示词和分类配置
+    Classification.reload_config()
+
+    category_folder = os.path.join(classification_folder, category_name)
+    items = collect_corpus(category_folder)
+    total = len(items)
+    print(f"--- 开始重新分类: {category_folder}，共 {total} 篇文章，并发数 {concurrency} ---")
+
+    search_index = None
+    if not dry_run and load_app_config().get('enable_search_index', True):
+        search_index = get_search_index(classification_folder)
+    changes = []
+    errors = []
+    added = []
+    catalog_updated = 0
+    unchanged = 0
+    done = 0
+    lock = threading.Lock()
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            futures = {executor.submit(_classify_file, file_path): (old_label, file_path)
+                       for old_label, file_path in items}
+            for future in as_completed(futures):
+                old_label, file_path = futures[future]
+                if task_status is not None and not task_status.get('running', True):
+                    print("检测到停止信号，终止重新分类")
+                    for pending in futures:
+                        pending.cancel()
+                    break
+
+                filename = os.path.basename(file_path)
+                try:
+                    new_label = future.result()
+                except Exception as e:
+                    # 分类接口返回异常数据等只影响这一篇文章
+                    new_label = f"[错误] {e}"
+                with lock:
+                    done += 1
+                    if task_status is not None:
+                        task_status['progress'] = int(done / total * 100) if total else 100
+                        task_status['processed_articles'] = done
+
+                if new_label.startswith("[错误]"):
+                    errors.append({"file": filename, "label": old_label, "error": new_label})
+                    print(f"❌ [{done}/{total}] {filename}: {new_label}")
+                    continue
+                if new_label == old_label:
+                    unchanged += 1
+                    continue
+
+                print(f"🔄 [{done}/{total}] {filename}: {old_label} -> {new_label}")
+                if dry_run:
+                    changes.append((extract_title_from_filename(filename), old_label, new_label))
+                    continue
+                try:
+                    ok, message = _apply_change(file_path, old_label, new_label, category_folder, search_index)
+                except Exception as e:
+                    ok, message = False, str(e)
+                if ok:
+                    changes.append((extract_title_from_filename(filename), old_label, new_label))
+                else:
+                    errors.append({"file": filename, "label": old_label, "new_label": new_label, "error": message})
+
+        if include_raw_store:
+            added = _reclassify_raw_store(category_folder, category_name, raw_store_root,
+                                          max(1, concurrency), dry_run, task_status, classification_folder, errors)
+    finally:
+        # 已移动的文件必须反映到资料汇总表，即使中途出错中断
+        if not dry_run:
+            catalog_updated = update_catalog(category_folder, changes)
+
+    transitions = Counter(f"{old} -> {new}" for _, old, new in changes + added)
+    report = {
+        "category_folder": category_folder,
+        "dry_run": dry_run,
+        "finished_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "total": total,
+        "unchanged": unchanged,
+        "changed": len(changes),
+        "added": len(added),
+        "errors": errors,
+        "catalog_rows_updated": catalog_updated,
+        "transitions": dict(transitions),
+        "changes": [{"title": t, "from": old, "to": new} for t, old, new in changes + added],
+    }
+
+    report_path = os.path.join(category_folder, f"重新分类报告_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    try:
+        os.makedirs(category_folder, exist_ok=True)
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        report["report_path"] = report_path
+    except OSError as e:
+        print(f"保存重新分类报告失败: {e}")
+
+    print("\n--- 重新分类完成 ---")
+    print(f"共 {total} 篇，未变化 {unchanged} 篇，变化 {len(changes)} 篇，新增 {len(added)} 篇，失败 {len(errors)} 篇")
+    for transition, count in transitions.most_common():
+        print(f"   - {transition}: {count} 篇")
+    return report
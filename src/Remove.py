@@ -1,7 +1,10 @@
 import os
 import re
+import numpy as np
 import pandas as pd
 
+from Layout import list_article_files, remove_article_file
+
 def deduplicate_files_and_clean_excel(base_folder, subfolders, excel_file):
     """
     主函数，用于执行文件去重和Excel记录清理。
@@ -22,8 +25,9 @@ def deduplicate_files_and_clean_excel(base_folder, subfolders, excel_file):
 
         print(f"\n正在处理文件夹: {folder}")
         
-        files = os.listdir(folder_path)
-        md_files = [f for f in files if f.endswith('.md')]
+        # 有文件清单时读取清单，不列出整个文件夹（支持分片子文件夹）
+        md_paths = {os.path.basename(path): path for path in list_article_files(folder_path)}
+        md_files = sorted(md_paths)
         
         # 使用正则表达式查找重复文件，例如 "文件名 (2).md"
         duplicate_pattern = re.compile(r'(.+?)\s*\(\d+\)\.md$')
@@ -52,8 +56,7 @@ def deduplicate_files_and_clean_excel(base_folder, subfolders, excel_file):
                 files_to_delete = versions[1:]
                 for file_to_delete in files_to_delete:
                     try:
-                        file_path_to_delete = os.path.join(folder_path, file_to_delete)
-                        os.remove(file_path_to_delete)
+                        remove_article_file(md_paths[file_to_delete], folder_path)
                         print(f"  已删除文件: {file_to_delete}")
                         deleted_files_in_folder.append(file_to_delete)
                     except OSError as e:
@@ -68,48 +71,193 @@ def deduplicate_files_and_clean_excel(base_folder, subfolders, excel_file):
     print("--- Excel文件记录清理完成 ---")
 
 
-def clean_excel_records(base_folder, excel_file):
+# --- 分块清理资料汇总 ---
+# 原来的清理把整个工作簿读入内存，逐行用 apply(lambda) 和正则生成标准化名称，再整体排序后写出xlsx，
+# 大表又慢又占内存。现在分块读取（CSV、Parquet、xlsx均可），用向量化的字符串操作生成标准化名称，
+# 按 (小类, 标准化名称) 的64位哈希去重，保留入库日期最早的一行（日期相同时保留靠前的一行）：
+#   第一遍只记录每个哈希的最早入库日期和行号（每个不同的文档约24字节）
+#   第二遍再分块读取，只写出保留的行
+# 内存占用只与分块大小和不同文档数有关，与表的总大小无关。输出保持原表的行顺序，可写为xlsx、CSV或Parquet。
+# 各种输入格式的空单元格都读为空字符串；只有表头没有记录时也会写出只有表头的结果文件。
+
+CHUNK_SIZE = 50000
+OUTPUT_FORMATS = ('xlsx', 'csv', 'parquet')
+_DUPLICATE_SUFFIX_PATTERN = r'\s*\(\d+\)$'
+# 没有入库日期的行排在最后
+_MISSING_DATE = np.iinfo(np.int64).max
+
+
+def normalize_document_names(names):
+    """向量化生成标准化名称：去掉.md、末尾的"(数字)"和首尾空格"""
+    return (names.astype(str)
+            .str.replace('.md', '', regex=False)
+            .str.replace(_DUPLICATE_SUFFIX_PATTERN, '', regex=True)
+            .str.strip())
+
+
+def _iter_chunks(path, chunksize=CHUNK_SIZE):
+    """
+    分块读取资料汇总（.csv / .parquet或Parquet文件夹 / .xlsx），每块为全部列为字符串的DataFrame，空单元格为空字符串
+    没有记录时产生一个只有表头的空块；连表头都没有时抛出 ValueError
+    """
+    if os.path.isdir(path) or path.endswith('.parquet'):
+        import pyarrow.dataset as ds
+        dataset = ds.dataset(path, format='parquet', partitioning='hive')
+        empty = True
+        for batch in dataset.to_batches(batch_size=chunksize):
+            empty = False
+            yield batch.to_pandas().fillna('').astype(str)
+        if empty:
+            yield dataset.schema.empty_table().to_pandas().astype(str)
+    elif path.endswith('.csv'):
+        try:
+            for chunk in pd.read_csv(path, encoding='utf-8-sig', dtype=str, chunksize=chunksize):
+                yield chunk.fillna('')
+        except pd.errors.EmptyDataError:
+            raise ValueError(f"资料汇总为空（没有表头）: {path}")
+    else:
+        from openpyxl import load_workbook
+        workbook = load_workbook(path, read_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            first_row = next(rows, None)
+            if first_row is None:
+                raise ValueError(f"资料汇总为空（没有表头）: {path}")
+            header = [str(h) for h in first_row]
+            chunk = []
+            empty = True
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) >= chunksize:
+                    empty = False
+                    yield pd.DataFrame(chunk, columns=header, dtype=object).fillna('').astype(str)
+                    chunk = []
+            if chunk or empty:
+                yield pd.DataFrame(chunk, columns=header, dtype=object).fillna('').astype(str)
+        finally:
+            workbook.close()
+
+
+def _chunk_keys(chunk, offset):
+    """计算一块的 (键哈希, 入库日期, 行号)"""
+    keys = pd.util.hash_pandas_object(
+        pd.DataFrame({'小类': chunk['小类'].astype(str), 'name': normalize_document_names(chunk['文档名称'])}),
+        index=False
+    ).to_numpy()
+    dates = pd.to_datetime(chunk['入库日期'], errors='coerce')
+    date_values = np.where(dates.isna(), _MISSING_DATE, dates.to_numpy(dtype='datetime64[ns]').astype(np.int64))
+    rows = np.arange(offset, offset + len(chunk), dtype=np.int64)
+    return pd.DataFrame({'key': keys, 'date': date_values, 'row': rows})
+
+
+def _select_rows(path, chunksize):
+    """第一遍：每个 (小类, 标准化名称) 保留入库日期最早的一行，返回 (保留的行号数组, 总行数)"""
+    best = pd.DataFrame({'key': pd.Series(dtype=np.uint64), 'date': pd.Series(dtype=np.int64),
+                         'row': pd.Series(dtype=np.int64)})
+    total = 0
+    for chunk in _iter_chunks(path, chunksize):
+        candidates = pd.concat([best, _chunk_keys(chunk, total)], ignore_index=True)
+        best = candidates.sort_values(['date', 'row'], kind='stable').drop_duplicates('key', keep='first')
+        total += len(chunk)
+    return np.sort(best['row'].to_numpy()), total
+
+
+class _ChunkWriter:
+    """分块写出：CSV直接追加，Parquet使用ParquetWriter，xlsx使用openpyxl的只写模式"""
+
+    def __init__(self, path, output_format):
+        self.path = path
+        self.format = output_format
+        self.handle = None
+        self.rows = 0
+
+    def write(self, chunk):
+        if self.format == 'csv':
+            if self.handle is None:
+                self.handle = open(self.path, 'w', encoding='utf-8-sig', newline='')
+                chunk.to_csv(self.handle, index=False)
+            else:
+                chunk.to_csv(self.handle, index=False, header=False)
+        elif self.format == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if self.handle is None:
+                self.handle = pq.ParquetWriter(self.path, table.schema, compression='zstd')
+            self.handle.write_table(table.cast(self.handle.schema))
+        else:
+            from openpyxl import Workbook
+            if self.handle is None:
+                self.handle = Workbook(write_only=True)
+                self.sheet = self.handle.create_sheet()
+                self.sheet.append(list(chunk.columns))
+            for row in chunk.itertuples(index=False):
+                self.sheet.append(list(row))
+        self.rows += len(chunk)
+
+    def close(self):
+        if self.handle is None:
+            return
+        if self.format == 'xlsx':
+            self.handle.save(self.path)
+        else:
+            self.handle.close()
+
+
+def clean_catalog_records(input_path, output_path, output_format=None, chunksize=CHUNK_SIZE):
     """
-    清理Excel文件中的重复记录。
+    分块清理资料汇总中的重复记录，返回 (原始记录数, 清理后记录数)
+
+    参数:
+    input_path (str): 资料汇总文件（.xlsx / .csv / .parquet 或Parquet数据集文件夹）。
+    output_path (str): 清理结果的保存路径。
+    output_format (str): xlsx / csv / parquet，默认按 output_path 的扩展名确定。
+    chunksize (int): 每块读取的行数。
+    """
+    output_format = output_format or os.path.splitext(output_path)[1].lstrip('.').lower()
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"不支持的输出格式: {output_format}（可选 {', '.join(OUTPUT_FORMATS)}）")
+
+    keep_rows, total = _select_rows(input_path, chunksize)
+    writer = _ChunkWriter(output_path, output_format)
+    offset = 0
+    try:
+        for chunk in _iter_chunks(input_path, chunksize):
+            rows = np.arange(offset, offset + len(chunk))
+            writer.write(chunk[np.isin(rows, keep_rows, assume_unique=True)])
+            offset += len(chunk)
+    finally:
+        writer.close()
+    return total, writer.rows
+
+
+def clean_excel_records(base_folder, excel_file, output_format='xlsx', chunksize=CHUNK_SIZE):
+    """
+    清理Excel文件（或CSV、Parquet）中的重复记录。
 
     参数:
     base_folder (str): Excel文件所在的文件夹路径。
     excel_file (str): Excel文件的名称。
+    output_format (str): 清理结果的格式，xlsx / csv / parquet。
+    chunksize (int): 每块读取的行数。
     """
     excel_path = os.path.join(base_folder, excel_file)
-    try:
-        df = pd.read_excel(excel_path)
-    except FileNotFoundError:
+    if not os.path.exists(excel_path):
         print(f"错误：找不到Excel文件 {excel_path}。请确保文件名和路径正确。")
         return
 
-    # 创建一个标准化的文档名称列，用于匹配
-    # 逻辑是：移除末尾的.md（如果有），然后移除括号和其中的数字，最后去除首尾空格
-    df['normalized_name'] = df['文档名称'].astype(str).apply(
-        lambda x: re.sub(r'\s*\(\d+\)$', '', x.replace('.md', '')).strip()
-    )
-
-    # 将'入库日期'转换为datetime对象，方便排序
-    df['入库日期'] = pd.to_datetime(df['入库日期'], errors='coerce')
-    
-    # 按'小类'和'normalized_name'分组，并保留每组中'入库日期'最早的一行
-    # 这将同时处理文件名重复和内容重复（但文件名有细微差别）的情况
-    df_cleaned = df.sort_values('入库日期').drop_duplicates(
-        subset=['小类', 'normalized_name'],
-        keep='first'
-    )
-
-    # 删除辅助列
-    df_cleaned = df_cleaned.drop(columns=['normalized_name'])
-    
     # 保存清理后的数据到新文件
-    output_filename = os.path.join(base_folder, '资料汇总1_cleaned.xlsx')
+    output_filename = os.path.join(base_folder, f'资料汇总1_cleaned.{output_format}')
     try:
-        df_cleaned.to_excel(output_filename, index=False)
-        print(f"\n清理完成！结果已保存到：{output_filename}")
-        print(f"原始记录数: {len(df)}, 清理后记录数: {len(df_cleaned)}")
+        total, kept = clean_catalog_records(excel_path, output_filename, output_format, chunksize)
     except Exception as e:
-        print(f"保存文件失败：{e}")
+        print(f"清理失败：{e}")
+        return
+    if total == 0:
+        print(f"\n{excel_path} 中没有记录，已写出只有表头的文件：{output_filename}")
+        return
+    print(f"\n清理完成！结果已保存到：{output_filename}")
+    print(f"原始记录数: {total}, 清理后记录数: {kept}")
 
 
 if __name__ == '__main__':
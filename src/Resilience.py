@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+
+import time
+import random
+import threading
+
+import requests
+
+from Config import load_app_config
+
+# --- 重试与熔断 ---
+# 所有上游（下载接口 exporter、Ollama、标题初筛模型）共用的容错策略：
+#   1. 失败后按带随机抖动的指数退避等待再重试，而不是固定间隔
+#   2. 连接超时和读取超时分开设置，服务器不可达时几秒内就失败，而不是等满整个读取超时
+#   3. 每个上游一个熔断器：连续失败达到阈值后熔断，熔断期间请求立即失败，
+#      批量任务在熔断期间暂停，等到可以重试时再放行一个试探请求，成功后恢复
+# 熔断时间在连续熔断时加倍，最长 MAX_RESET_SECONDS。
+
+BASE_DELAY = 1.0
+MAX_DELAY = 30.0
+MAX_RESET_SECONDS = 600
+# 这些HTTP状态码视为上游暂时不可用，会重试并计入熔断
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """上游处于熔断状态，请求未发出"""
+
+
+def backoff_delay(attempt, base=BASE_DELAY, cap=MAX_DELAY):
+    """第 attempt 次（从0开始）重试前的等待时间：指数退避，在 [base/2, 上限] 内随机抖动"""
+    return random.uniform(base / 2, min(cap, base * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """单个上游的熔断器"""
+
+    def __init__(self, name, failure_threshold=5, reset_seconds=30):
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_seconds = float(reset_seconds)
+        self.lock = threading.Lock()
+        self.state = 'closed'
+        self.consecutive_failures = 0
+        self.trips = 0
+        # 上次成功以来连续熔断的次数，用于加倍熔断时间
+        self.open_streak = 0
+        self.open_until = 0.0
+        self.rejected = 0
+
+    def allow(self):
+        """是否允许发出请求；熔断时间已过时放行一个试探请求"""
+        with self.lock:
+            if self.state == 'closed':
+                return True
+            now = time.monotonic()
+            if now >= self.open_until:
+                # 试探期间其他请求继续等待，试探请求没有结果时下一个周期再放行一个
+                self.state = 'half_open'
+                self.open_until = now + self.reset_seconds
+                return True
+            self.rejected += 1
+            return False
+
+    def is_open(self):
+        """是否处于熔断中（尚未到可以试探的时间）"""
+        with self.lock:
+            return self.state != 'closed' and time.monotonic() < self.open_until
+
+    def retry_in(self):
+        """距离可以试探还有多少秒"""
+        with self.lock:
+            return max(0.0, self.open_until - time.monotonic()) if self.state != 'closed' else 0.0
+
+    def record_success(self):
+        with self.lock:
+            if self.state != 'closed':
+                print(f"上游 {self.name} 已恢复，熔断解除")
+            self.state = 'closed'
+            self.consecutive_failures = 0
+            self.open_streak = 0
+
+    def record_failure(self):
+        with self.lock:
+            self.consecutive_failures += 1
+            if self.state == 'half_open' or self.consecutive_failures >= self.failure_threshold:
+                delay = min(self.reset_seconds * (2 ** self.open_streak), MAX_RESET_SECONDS)
+                if self.state == 'closed':
+                    print(f"上游 {self.name} 连续失败 {self.consecutive_failures} 次，熔断 {delay:.0f} 秒")
+                self.state = 'open'
+                self.trips += 1
+                self.open_streak += 1
+                self.open_until = time.monotonic() + delay
+
+    def stats(self):
+        with self.lock:
+            return {
+                'name': self.name,
+                'state': 'open' if self.state != 'closed' and time.monotonic() < self.open_until else self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'trips': self.trips,
+                'rejected': self.rejected,
+                'retry_in': round(max(0.0, self.open_until - time.monotonic()), 1) if self.state != 'closed' else 0,
+            }
+
+
+def get_breaker(name):
+    """获取（必要时创建）上游的熔断器，阈值和熔断时间读取 app_config.json"""
+    with _breakers_lock:
+        if name not in _breakers:
+            app_config = load_app_config()
+            _breakers[name] = CircuitBreaker(
+                name,
+                failure_threshold=app_config.get('breaker_failure_threshold', 5),
+                reset_seconds=app_config.get('breaker_reset_seconds', 30),
+            )
+        return _breakers[name]
+
+
+def get_breaker_stats():
+    """全部熔断器的状态"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return [breaker.stats() for breaker in breakers]
+
+
+def get_exporter_timeout():
+    """下载接口的 (连接超时, 读取超时)"""
+    app_config = load_app_config()
+    return (app_config.get('exporter_connect_timeout', 5), app_config.get('exporter_read_timeout', 20))
+
+
+def request_with_retry(method, url, upstream, max_retries=None, **kwargs):
+    """
+    带重试、退避和熔断的 requests 调用，返回最后一次的响应
+    网络错误和 RETRY_STATUS_CODES 中的状态码会重试；熔断时抛出 CircuitOpenError，
+    重试用尽时抛出最后一次的网络错误（或返回最后一次的响应）
+    """
+    breaker = get_breaker(upstream)
+    if max_retries is None:
+        max_retries = load_app_config().get('exporter_max_retries', 3)
+    attempts = max(1, int(max_retries))
+
+    for attempt in range(attempts):
+        if not breaker.allow():
+            raise CircuitOpenError(f"{upstream} 处于熔断状态，{breaker.retry_in():.0f} 秒后重试")
+        try:
+            response = requests.request(method, url, **kwargs)
+        except requests.exceptions.RequestException:
+            breaker.record_failure()
+            if attempt == attempts - 1:
+                raise
+        else:
+            if response.status_code not in RETRY_STATUS_CODES:
+                breaker.record_success()
+                return response
+            breaker.record_failure()
+            if attempt == attempts - 1:
+                return response
+        time.sleep(backoff_delay(attempt))
+
+
+def wait_for_upstreams(names, task_status=None):
+    """
+    有上游处于熔断状态时暂停当前任务，直到可以试探；收到停止信号时返回False
+    """
+    announced = False
+    while True:
+        blocked = [breaker for breaker in (get_breaker(name) for name in names) if breaker.is_open()]
+        if not blocked:
+            return True
+        if not announced:
+            waits = "，".join(f"{b.name} {b.retry_in():.0f} 秒" for b in blocked)
+            print(f"⏸️ 上游熔断中，任务暂停（{waits}后重试）")
+            announced = True
+        if task_status is not None and not task_status.get('running', True):
+            return False
+        time.sleep(1)
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+import time
+import threading
+from collections import OrderedDict
+
+from Config import load_app_config
+
+# --- 公众号搜索缓存 ---
+# 界面上输入和重试时会反复搜索同一个关键词，每次都消耗下载接口的额度。
+# 这里按 (token, 关键词, 起始位置, 每页数量) 缓存搜索结果 ttl 秒；
+# 多个请求同时搜索同一关键词时只向上游发一次请求，其余请求等待并共享结果。
+# 搜索失败（返回None）不缓存；token 变化时清空缓存。
+
+DEFAULT_TTL = 600
+MAX_ENTRIES = 256
+
+
+class _Pending:
+    """进行中的上游请求，等待者共享其结果"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+
+
+class SearchCache:
+    """带过期时间和请求合并的搜索结果缓存"""
+
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=MAX_ENTRIES):
+        self.ttl = float(ttl)
+        self.max_entries = max(1, int(max_entries))
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.pending = {}
+        self.token = None
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'upstream_calls': 0, 'errors': 0, 'invalidations': 0}
+
+    def _check_token(self, token):
+        """token 变化时清空缓存（调用方持有锁）"""
+        if token != self.token:
+            if self.entries:
+                self.stats['invalidations'] += 1
+            self.entries.clear()
+            self.token = token
+
+    def invalidate(self):
+        """清空缓存"""
+        with self.lock:
+            if self.entries:
+                self.stats['invalidations'] += 1
+            self.entries.clear()
+
+    def get_or_fetch(self, keyword, token, begin, size, fetch):
+        """
+        返回 (结果, 来源)，来源为 'cache'、'coalesced' 或 'upstream'
+        fetch() 为实际的上游请求，返回None表示失败
+        """
+        key = (token, keyword.strip().lower(), begin, size)
+        owner = False
+        with self.lock:
+            self._check_token(token)
+            entry = self.entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self.entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return entry[1], 'cache'
+            pending = self.pending.get(key)
+            if pending is not None:
+                self.stats['coalesced'] += 1
+            else:
+                pending = _Pending()
+                self.pending[key] = pending
+                self.stats['misses'] += 1
+                self.stats['upstream_calls'] += 1
+                owner = True
+        if not owner:
+            pending.event.wait()
+            return pending.result, 'coalesced'
+
+        try:
+            pending.result = fetch()
+        finally:
+            with self.lock:
+                self.pending.pop(key, None)
+                if pending.result is None:
+                    self.stats['errors'] += 1
+                elif self.token == token:
+                    self.entries[key] = (time.monotonic() + self.ttl, pending.result)
+                    self.entries.move_to_end(key)
+                    while len(self.entries) > self.max_entries:
+                        self.entries.popitem(last=False)
+            pending.event.set()
+        return pending.result, 'upstream'
+
+    def get_stats(self):
+        """缓存统计"""
+        with self.lock:
+            now = time.monotonic()
+            stats = dict(self.stats)
+            stats['entries'] = sum(1 for expires, _ in self.entries.values() if expires > now)
+            stats['in_flight'] = len(self.pending)
+            stats['ttl'] = self.ttl
+        lookups = stats['hits'] + stats['misses'] + stats['coalesced']
+        stats['hit_ratio'] = round((stats['hits'] + stats['coalesced']) / lookups, 3) if lookups else 0
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_search_cache():
+    """获取全局搜索缓存，过期时间读取 app_config.json 中的 search_cache_ttl"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SearchCache(ttl=load_app_config().get('search_cache_ttl', DEFAULT_TTL))
+        return _cache
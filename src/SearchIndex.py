@@ -0,0 +1,349 @@
+# -*- coding: utf-8 -*-
+"""
+分类结果文件夹的全文检索索引。
+
+示例:
+    # 为已有的分类结果建立（或补齐）索引
+    python src/SearchIndex.py --classification-folder D:\\智能分类
+
+之后每篇文章放入分类文件夹时自动加入索引，通过 /api/search_articles 检索。
+"""
+
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(__file__))
+
+from Config import load_app_config
+
+# --- 全文检索索引 ---
+# 文章保存为 <分类结果文件夹>/<大类>/<小类>/*.md 后，只能浏览文件夹或逐个文件搜索。
+# 这里用SQLite FTS5的trigram分词（按连续3个字切分，适合不分词的中文）维护全文索引：
+#   <分类结果文件夹>/_search_index.sqlite
+# 文章放入分类文件夹、重新分类移动或删除时同步更新；已有的分类结果可用本文件的命令行一次性补齐。
+# 检索词按空格分隔，全部命中才返回。trigram索引无法匹配不足3个字的检索词，
+# 另用一张只建索引、不保存原文的表（contentless FTS5）按连续2个字切分，1～2个字的检索词在这张表中查找：
+# 2个字的词精确匹配，1个字的词按前缀匹配；含标点、下划线等的短检索词仍退回逐篇比较（较慢）。
+# 需要SQLite 3.34以上（Python 3.10自带的版本一般满足）。
+
+INDEX_FILENAME = '_search_index.sqlite'
+# 索引中保存的正文最大长度（字符），超长文章只索引开头部分
+MAX_BODY_CHARS = 50000
+TRIGRAM_MIN_CHARS = 3
+# 2字切分只处理连续的文字和数字（与FTS5 unicode61分词器的词字符一致）
+_WORD_RUN_PATTERN = re.compile(r'[^\W_]+')
+# 命中数超过该值时不再按相关度（bm25需要给全部命中打分）排序，改为按加入索引的先后倒序，保证常见词也能毫秒级返回
+RANK_MAX_HITS = 5000
+# 命中数最多精确统计到该值
+COUNT_MAX_HITS = 10000
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+class SearchIndex:
+    """分类结果文件夹的全文检索索引"""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.lock = threading.Lock()
+        # 工作队列的多个处理进程可能同时写入
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA busy_timeout = 30000")
+        self.conn.create_function('bigram_text', 1, bigram_text, deterministic=True)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS docs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                path TEXT NOT NULL UNIQUE,
+                title TEXT,
+                category TEXT,
+                label TEXT,
+                publish_date TEXT,
+                link TEXT,
+                mtime REAL,
+                indexed_at REAL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_docs_filter ON docs (category, label, publish_date)")
+        self.conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(title, body, tokenize='trigram')"
+        )
+        has_bigram = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'docs_bigram'"
+        ).fetchone() is not None
+        self.conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS docs_bigram "
+            "USING fts5(title, body, content='', tokenize='unicode61', prefix='1')"
+        )
+        if not has_bigram:
+            # 旧版本建立的索引：按已索引的正文补齐2字切分
+            self.conn.execute(
+                "INSERT INTO docs_bigram (rowid, title, body) "
+                "SELECT rowid, bigram_text(title), bigram_text(body) FROM docs_fts"
+            )
+        self.conn.commit()
+
+    # --- 写入 ---
+
+    def _delete_locked(self, path):
+        row = self.conn.execute("SELECT id FROM docs WHERE path = ?", (path,)).fetchone()
+        if row is not None:
+            # 不保存原文的表需要用写入时的内容删除，由trigram表中保存的原文重新切分
+            self.conn.execute(
+                "INSERT INTO docs_bigram (docs_bigram, rowid, title, body) "
+                "SELECT 'delete', rowid, bigram_text(title), bigram_text(body) FROM docs_fts WHERE rowid = ?",
+                (row[0],)
+            )
+            self.conn.execute("DELETE FROM docs_fts WHERE rowid = ?", (row[0],))
+            self.conn.execute("DELETE FROM docs WHERE id = ?", (row[0],))
+
+    def add(self, path, title, category, label, body, publish_date='', link=''):
+        """加入（或更新）一篇文章"""
+        path = os.path.abspath(path)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            mtime = None
+        with self.lock:
+            self._delete_locked(path)
+            cursor = self.conn.execute(
+                "INSERT INTO docs (path, title, category, label, publish_date, link, mtime, indexed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, title, category, label, publish_date or '', link or '', mtime, time.time())
+            )
+            body = (body or '')[:MAX_BODY_CHARS]
+            self.conn.execute(
+                "INSERT INTO docs_fts (rowid, title, body) VALUES (?, ?, ?)",
+                (cursor.lastrowid, title, body)
+            )
+            self.conn.execute(
+                "INSERT INTO docs_bigram (rowid, title, body) VALUES (?, ?, ?)",
+                (cursor.lastrowid, bigram_text(title), bigram_text(body))
+            )
+            self.conn.commit()
+
+    def remove(self, path):
+        with self.lock:
+            self._delete_locked(os.path.abspath(path))
+            self.conn.commit()
+
+    def move(self, old_path, new_path, label):
+        """文章移动到其他小类文件夹时只更新路径和小类，不重新索引正文"""
+        with self.lock:
+            self.conn.execute(
+                "UPDATE docs SET path = ?, label = ? WHERE path = ?",
+                (os.path.abspath(new_path), label, os.path.abspath(old_path))
+            )
+            self.conn.commit()
+
+    # --- 检索 ---
+
+    @staticmethod
+    def _build_query(query):
+        """
+        把检索词拆分为 (trigram表的MATCH表达式或None, 2字切分表的MATCH表达式或None, 需要逐篇比较的短检索词列表)
+        每个检索词加双引号按短语匹配，避免用户输入被当作FTS5语法
+        """
+        terms = [term for term in re.split(r'\s+', query.strip()) if term]
+        long_terms = [term for term in terms if len(term) >= TRIGRAM_MIN_CHARS]
+        short_terms = [term for term in terms if len(term) < TRIGRAM_MIN_CHARS]
+        bigram_terms = [term for term in short_terms if _WORD_RUN_PATTERN.fullmatch(term)]
+        scan_terms = [term for term in short_terms if not _WORD_RUN_PATTERN.fullmatch(term)]
+        match = " AND ".join('"' + term.replace('"', '""') + '"' for term in long_terms) or None
+        # 1个字的词出现在某个2字词的开头，或是一段文字的最后一个字
+        bigram_match = " AND ".join(f'"{term}"' + ('*' if len(term) == 1 else '') for term in bigram_terms) or None
+        return match, bigram_match, scan_terms
+
+    def search(self, query, category=None, label=None, date_from=None, date_to=None, limit=20, offset=0):
+        """
+        检索文章，返回 {'total': 命中数, 'total_capped': 命中数是否超过统计上限, 'ranked': 是否按相关度排序, 'results': [...]}
+        按相关度排序（命中过多时按加入索引的先后倒序，没有3个字以上的检索词时按发布日期倒序）
+        date_from / date_to: 发布日期范围（YYYY-MM-DD，含两端）
+        """
+        match, bigram_match, scan_terms = self._build_query(query or '')
+        conditions, params = [], []
+        if match:
+            conditions.append("docs_fts MATCH ?")
+            params.append(match)
+        if bigram_match:
+            conditions.append("docs_fts.rowid IN (SELECT rowid FROM docs_bigram WHERE docs_bigram MATCH ?)")
+            params.append(bigram_match)
+        for term in scan_terms:
+            conditions.append("(instr(docs_fts.title, ?) > 0 OR instr(docs_fts.body, ?) > 0)")
+            params.extend([term, term])
+        if category:
+            conditions.append("docs.category = ?")
+            params.append(category)
+        if label:
+            conditions.append("docs.label = ?")
+            params.append(label)
+        if date_from:
+            conditions.append("docs.publish_date >= ?")
+            params.append(date_from)
+        if date_to:
+            conditions.append("docs.publish_date <= ?")
+            params.append(date_to)
+        where = ("WHERE " + " AND ".join(conditions)) if conditions else ""
+        snippet = "snippet(docs_fts, 1, '<mark>', '</mark>', '…', 24)" if match else "substr(docs_fts.body, 1, 80)"
+
+        with self.lock:
+            total = self.conn.execute(
+                f"SELECT COUNT(*) FROM (SELECT 1 FROM docs_fts JOIN docs ON docs.id = docs_fts.rowid {where} LIMIT ?)",
+                params + [COUNT_MAX_HITS + 1]
+            ).fetchone()[0]
+            ranked = bool(match) and total <= RANK_MAX_HITS
+            if ranked:
+                order = "ORDER BY bm25(docs_fts, 5.0, 1.0)"
+            elif match:
+                order = "ORDER BY docs_fts.rowid DESC"
+            else:
+                order = "ORDER BY docs.publish_date DESC, docs.id DESC"
+            rows = self.conn.execute(
+                f"SELECT docs.path, docs.title, docs.category, docs.label, docs.publish_date, docs.link, {snippet} "
+                f"FROM docs_fts JOIN docs ON docs.id = docs_fts.rowid {where} {order} LIMIT ? OFFSET ?",
+                params + [int(limit), int(offset)]
+            ).fetchall()
+        return {
+            'total': min(total, COUNT_MAX_HITS),
+            'total_capped': total > COUNT_MAX_HITS,
+            'ranked': ranked,
+            'results': [
+                {'path': path, 'title': title, 'category': category, 'label': label,
+                 'publish_date': publish_date, 'link': link, 'snippet': snippet_text}
+                for path, title, category, label, publish_date, link, snippet_text in rows
+            ]
+        }
+
+    def stats(self):
+        with self.lock:
+            count = self.conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+        return {'path': self.path, 'documents': count}
+
+    # --- 与文件夹同步 ---
+
+    def sync_folder(self, classification_folder):
+        """
+        使索引与 <分类结果文件夹>/<大类>/<小类>/*.md 一致：新增或修改过的文件重新索引，已删除的文件移出索引
+        发布日期和来源从各大类的资料汇总.csv中查找。返回 (新增或更新数, 删除数)
+        """
+        from Converter import extract_text
+        from Classification import read_markdown_file, extract_title_from_filename
+        from Layout import list_article_files
+
+        with self.lock:
+            known = dict(self.conn.execute("SELECT path, mtime FROM docs").fetchall())
+        seen = set()
+        updated = 0
+        for category in sorted(os.listdir(classification_folder)):
+            category_folder = os.path.join(classification_folder, category)
+            if not os.path.isdir(category_folder) or category.startswith('_'):
+                continue
+            catalog = _load_catalog_metadata(category_folder)
+            for label in sorted(os.listdir(category_folder)):
+                label_folder = os.path.join(category_folder, label)
+                if not os.path.isdir(label_folder) or label.startswith('_'):
+                    continue
+                for path in list_article_files(label_folder):
+                    filename = os.path.basename(path)
+                    path = os.path.abspath(path)
+                    try:
+                        mtime = os.path.getmtime(path)
+                    except OSError:
+                        # 清单中有但文件已被手动删除
+                        continue
+                    seen.add(path)
+                    if path in known and known[path] == mtime:
+                        continue
+                    title = extract_title_from_filename(filename)
+                    publish_date, link = catalog.get((label, title), ('', ''))
+                    try:
+                        body = extract_text(read_markdown_file(path))
+                    except Exception as e:
+                        print(f"读取文件失败，跳过: {path}: {e}")
+                        continue
+                    self.add(path, title, category, label, body, publish_date, link)
+                    updated += 1
+                    if updated % 500 == 0:
+                        print(f"已索引 {updated} 篇文章...")
+
+        removed = [path for path in known if path not in seen]
+        for path in removed:
+            self.remove(path)
+        return updated, len(removed)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def bigram_text(text):
+    """按连续2个字切分，每段文字的最后一个字单独保留，供1个字的检索词按前缀匹配"""
+    tokens = []
+    for run in _WORD_RUN_PATTERN.findall(text or ''):
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        tokens.append(run[-1])
+    return ' '.join(tokens)
+
+
+def _load_catalog_metadata(category_folder):
+    """从资料汇总.csv读取 {(小类, 文档名称): (发布日期, 来源)}"""
+    csv_path = os.path.join(category_folder, '资料汇总.csv')
+    if not os.path.exists(csv_path):
+        return {}
+    try:
+        import pandas as pd
+        df = pd.read_csv(csv_path, encoding='utf-8-sig', dtype=str).fillna('')
+    except Exception as e:
+        print(f"读取资料汇总表失败: {csv_path}: {e}")
+        return {}
+    return {
+        (label, title): (publish_date, link)
+        for label, title, publish_date, link in zip(df.get('小类', []), df.get('文档名称', []),
+                                                    df.get('发布日期', []), df.get('来源', []))
+    }
+
+
+def get_search_index(classification_folder):
+    """获取分类结果文件夹对应的索引，同一文件夹共用一个实例"""
+    path = os.path.abspath(os.path.join(classification_folder, INDEX_FILENAME))
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = SearchIndex(path)
+        return _indexes[path]
+
+
+def index_article(classification_folder, path, title, category, label, body, publish_date='', link=''):
+    """文章放入分类文件夹后加入索引；app_config.json 中关闭了 enable_search_index 时跳过，失败不影响分类"""
+    if not load_app_config().get('enable_search_index', True):
+        return
+    try:
+        get_search_index(classification_folder).add(path, title, category, label, body, publish_date, link)
+    except Exception as e:
+        print(f"更新全文检索索引失败: {e}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="为分类结果文件夹建立或补齐全文检索索引")
+    parser.add_argument("--classification-folder", default=load_app_config().get("classification_folder"),
+                        help="分类结果文件夹")
+    args = parser.parse_args(argv)
+    if not args.classification_folder or not os.path.isdir(args.classification_folder):
+        print(f"错误: 分类结果文件夹不存在: {args.classification_folder}", file=sys.stderr)
+        return 2
+
+    started = time.perf_counter()
+    index = get_search_index(args.classification_folder)
+    updated, removed = index.sync_folder(args.classification_folder)
+    print(f"索引完成：新增或更新 {updated} 篇，移除 {removed} 篇，共 {index.stats()['documents']} 篇，"
+          f"耗时 {time.perf_counter() - started:.1f} 秒")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
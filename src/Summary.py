@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+import re
+
+# --- 分类摘要构建 ---
+# html2text 转换的公众号文章开头往往是"点击上方蓝字关注"、作者署名、图片和链接地址，
+# 结尾是"往期推荐"、二维码和页面按钮文字，直接截取开头若干字发给模型既浪费token又稀释了有效信息。
+# 这里先去掉这些固定格式的内容和图片/链接标记，再按 标题 → 开头几段 → 小标题 → 其余段落 的顺序拼接，
+# 由调用方按预算截取开头部分，每次调用发送更少但更有用的内容。
+
+# 开头的正文段落数，放在小标题之前
+LEAD_PARAGRAPHS = 3
+# 最多收录的小标题数
+MAX_HEADINGS = 12
+# 超过该长度的行不按固定格式删除，避免误删以这些字样开头的正文
+BOILERPLATE_MAX_LINE = 40
+
+_IMAGE_PATTERN = re.compile(r'!\[[^\]]*\]\([^)]*\)')
+_LINK_PATTERN = re.compile(r'\[([^\]]*)\]\([^)]*\)')
+_URL_PATTERN = re.compile(r'(https?://|www\.)\S+')
+_MARKUP_PATTERN = re.compile(r'[*_`|]+|^\s*(>+|[-+]\s|\d+\.\s)')
+_SPACE_PATTERN = re.compile(r'[\s\u200b\u200c\u200d\ufeff]+')
+_HEADING_PATTERN = re.compile(r'^\s*#{1,6}\s*(.+?)\s*#*\s*$')
+_BOLD_LINE_PATTERN = re.compile(r'^\s*\*\*([^*]+)\*\*\s*$')
+_NON_WORD_PATTERN = re.compile(r'[^\w\u4e00-\u9fa5]')
+
+# 以这些字样开头的短行为页眉页脚（只在行首匹配，正文中提到"转载""投稿""来源"等不受影响）
+BOILERPLATE_PREFIXES = (
+    '点击上方', '点击下方', '点击蓝字', '关注我们', '关注公众号', '设为星标', '星标公众号', '置顶公众号',
+    '长按识别', '长按二维码', '长按扫码', '扫码关注', '扫描二维码', '识别二维码', '微信扫一扫',
+    '编辑：', '编辑:', '责任编辑', '来源：', '来源:', '排版：', '排版:', '校对：', '审核：',
+    '图片来源', '图源', '封面图', '免责声明', '版权声明', '版权归', '如有侵权', '转载请', '本文转载自',
+    '投稿邮箱', '投稿请', '商务合作', '微信号：', '微信号:',
+)
+# "点击"在看""、"点个在看"等引导语
+_BUTTON_PROMPT_PATTERN = re.compile(r'^(点击|点个|点亮|点一下)\s*["“”「」\']?\s*(在看|赞|分享|转发)')
+# 整行只由页面按钮文字组成时删除，如"点赞 在看 转发"、"阅读原文"
+BUTTON_WORDS = (
+    '点赞', '在看', '转发', '分享', '收藏', '留言', '赞赏', '喜欢作者', '阅读原文', '轻触阅读原文', '知道了', '取消',
+    '预览时标签不可点', '继续滑动看下一个', '向上滑动看下一个', '轻点两下取消赞', '轻点两下取消在看',
+    '微信扫一扫关注该公众号', '微信扫一扫可打开此内容使用完整服务', '视频', '小程序',
+)
+_BUTTON_LINE_PATTERN = re.compile('(' + '|'.join(sorted(BUTTON_WORDS, key=len, reverse=True)) + ')+')
+
+# 以这些字样开头的短行为署名
+BYLINE_PREFIXES = ('原创', '撰文', '文/', '文 /', '作者')
+
+# 出现这些行时，其后的内容都视为页脚
+FOOTER_MARKERS = ('往期推荐', '往期回顾', '往期精选', '推荐阅读', '精彩推荐', '相关阅读', '延伸阅读')
+# 只有整行恰好是这些字样时才视为页脚开始（"endpoint"、"ending" 等不算）
+EXACT_FOOTER_MARKERS = ('end',)
+
+
+def _clean_inline(text):
+    """去掉图片、链接地址、Markdown标记和多余空白"""
+    text = _IMAGE_PATTERN.sub(' ', text)
+    text = _LINK_PATTERN.sub(r'\1', text)
+    text = _URL_PATTERN.sub(' ', text)
+    text = _MARKUP_PATTERN.sub(' ', text)
+    return _SPACE_PATTERN.sub(' ', text).strip()
+
+
+def is_boilerplate(line):
+    """是否为公众号页眉页脚等固定格式的行"""
+    if len(line) > BOILERPLATE_MAX_LINE:
+        return False
+    if line.startswith(BOILERPLATE_PREFIXES + BYLINE_PREFIXES) or _BUTTON_PROMPT_PATTERN.match(line):
+        return True
+    return bool(_BUTTON_LINE_PATTERN.fullmatch(_NON_WORD_PATTERN.sub('', line)))
+
+
+def _is_footer_marker(line):
+    normalized = _NON_WORD_PATTERN.sub('', line).lower()
+    if normalized in EXACT_FOOTER_MARKERS:
+        return True
+    return any(normalized == marker or (len(normalized) <= 8 and normalized.startswith(marker))
+               for marker in FOOTER_MARKERS)
+
+
+def split_markdown(md_content):
+    """
+    把Markdown拆分为小标题和正文段落，去掉固定格式的行和页脚
+    返回 (小标题列表, 段落列表)
+    """
+    headings, paragraphs = [], []
+    # 图片和链接可能跨行，先整体去掉
+    md_content = _IMAGE_PATTERN.sub(' ', md_content)
+    md_content = _LINK_PATTERN.sub(r'\1', md_content)
+
+    for block in re.split(r'\n\s*\n', md_content):
+        lines = []
+        heading = None
+        for raw_line in block.splitlines():
+            match = _HEADING_PATTERN.match(raw_line) or _BOLD_LINE_PATTERN.match(raw_line)
+            line = _clean_inline(match.group(1) if match else raw_line)
+            if not line or is_boilerplate(line):
+                continue
+            if _is_footer_marker(line):
+                if headings or paragraphs or lines:
+                    if lines:
+                        paragraphs.append(' '.join(lines))
+                    return headings, paragraphs
+                continue
+            if match and len(line) <= BOILERPLATE_MAX_LINE:
+                heading = line
+            else:
+                lines.append(line)
+        if heading:
+            headings.append(heading)
+        if lines:
+            paragraphs.append(' '.join(lines))
+    return headings, paragraphs
+
+
+def build_summary_text(md_content, title=""):
+    """
+    按 标题 → 开头几段 → 小标题 → 其余段落 的顺序拼接摘要正文，
+    调用方按token（或字符）预算截取开头部分
+    """
+    headings, paragraphs = split_markdown(md_content)
+    pieces = []
+    title = _clean_inline(title or "")
+    if title:
+        pieces.append(f"标题：{title}")
+    pieces.extend(paragraphs[:LEAD_PARAGRAPHS])
+    headings = [h for h in headings if h != title][:MAX_HEADINGS]
+    if headings:
+        pieces.append("小标题：" + "；".join(headings))
+    pieces.extend(paragraphs[LEAD_PARAGRAPHS:])
+    return "\n".join(pieces)
@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+"""
+任务的吞吐量、剩余时间估算，以及正式运行前的抽样试运行。
+
+示例:
+    # 抽取30篇文章走完整流程（不放入分类文件夹、不写资料汇总表），估算全部处理完所需的时间和无关比例
+    python src/cli.py --account 零售案例 --sample 30
+
+Web服务中 /api/start_download、/api/start_download_only 传入 sample_size 即为抽样试运行。
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(__file__))
+
+from Config import load_app_config
+from Tracing import article_scope, get_stage_stats, reset_stage_stats
+
+# --- 吞吐量与剩余时间估算 ---
+# 开始处理一个几千篇文章的公众号时，无法知道要两小时还是二十小时。这里按实测速度估算：
+#   总篇数：文章列表已完整同步到本地（ArticleIndex）时取本地篇数；否则取目前已获取的篇数，作为下限
+#   速度：最近 RATE_WINDOW_SECONDS 秒内已处理篇数的增量（含批次间暂停、限流和熔断等待），篇/分钟；
+#         还没有实测数据时按限速估算（逐篇模式每批20篇暂停20秒；工作队列模式为 exporter_min_interval）
+#   各阶段（下载、转换、标题初筛、大模型……）的次数和平均耗时来自 Tracing 中 span 的累计统计
+# 结果在 /api/status 和 stats_update 事件的 throughput 中返回，每批次结束时也打印到日志。
+#
+# 抽样试运行：在消耗下载接口额度之前，从文章列表中均匀抽取 N 篇（覆盖新旧文章）走完整流程
+# （初筛、下载、转换、大模型分类，但不放入分类文件夹、不写资料汇总表），
+# 按抽样的平均耗时和无关比例推算全部文章的处理时间、相关文章数和需要下载的篇数。
+# 抽样下载的原始HTML保存在原始HTML存储中，正式运行时直接复用，不重复消耗额度。
+
+RATE_WINDOW_SECONDS = 300
+# 实测速度至少需要的时间跨度（秒），不足时按限速估算
+MIN_RATE_SPAN_SECONDS = 10
+# 逐篇模式下每批的篇数和批次之间的暂停（与 download_task_worker 一致）
+BATCH_SIZE = 20
+BATCH_PAUSE_SECONDS = 20
+DEFAULT_SAMPLE_SIZE = 20
+OUTCOMES = ('classified', 'irrelevant', 'screened_out', 'downloaded', 'failed')
+
+
+def record_outcome(task_status, outcome):
+    """记录单篇文章的处理结果（OUTCOMES 之一），累计在 task_status['outcomes'] 中"""
+    if task_status is None:
+        return
+    outcomes = task_status.setdefault('outcomes', {})
+    outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+
+def irrelevant_ratio(outcomes):
+    """已完成分类的文章中判为无关（含标题初筛拦下）的比例，没有分类结果时返回None"""
+    outcomes = outcomes or {}
+    irrelevant = outcomes.get('irrelevant', 0) + outcomes.get('screened_out', 0)
+    judged = irrelevant + outcomes.get('classified', 0)
+    return round(irrelevant / judged, 3) if judged else None
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return '未知'
+    if seconds < 60:
+        return f"{seconds:.0f} 秒"
+    if seconds < 3600:
+        return f"{seconds / 60:.1f} 分钟"
+    return f"{seconds / 3600:.1f} 小时"
+
+
+def _finish_time(seconds):
+    return (datetime.now() + timedelta(seconds=seconds)).strftime('%Y-%m-%d %H:%M') if seconds is not None else None
+
+
+def direct_seconds_per_article():
+    """逐篇模式下批次暂停平摊到每篇文章的时间"""
+    return BATCH_PAUSE_SECONDS / BATCH_SIZE
+
+
+def queue_seconds_per_article():
+    """工作队列模式下所有处理进程共用的下载接口调用间隔"""
+    return float(load_app_config().get('exporter_min_interval', 1.0))
+
+
+class ThroughputEstimator:
+    """按已处理篇数随时间的变化估算速度和剩余时间"""
+
+    def __init__(self, seconds_per_article=None):
+        self.started = time.time()
+        # (时间, 已处理篇数)，只在篇数变化时追加
+        self.samples = deque([(self.started, 0)])
+        self.total = None
+        # 限速下每篇文章至少需要的时间，没有实测数据时用于估算
+        self.seconds_per_article = seconds_per_article
+        self.lock = threading.Lock()
+
+    def set_total(self, total):
+        """设置总篇数（文章列表完整时），未知时保持None"""
+        if total is not None:
+            self.total = total
+
+    def observe(self, processed):
+        now = time.time()
+        with self.lock:
+            if processed != self.samples[-1][1]:
+                self.samples.append((now, processed))
+            # 窗口之前的样本只保留最近的一个，作为计算速度的起点
+            while len(self.samples) > 2 and self.samples[1][0] < now - RATE_WINDOW_SECONDS:
+                self.samples.popleft()
+
+    def _measured_rate(self, processed, now):
+        """最近窗口内的实测速度（篇/分钟），数据不足时返回None"""
+        with self.lock:
+            start_time, start_count = self.samples[0]
+        span_seconds = now - start_time
+        if processed <= start_count or span_seconds < MIN_RATE_SPAN_SECONDS:
+            return None
+        return (processed - start_count) / span_seconds * 60
+
+    def snapshot(self, processed, listed=0, outcomes=None):
+        """
+        当前的吞吐量和剩余时间估算
+        processed: 已处理篇数；listed: 目前已获取到的文章数（总篇数未知时作为下限）
+        """
+        self.observe(processed)
+        now = time.time()
+        total_exact = self.total is not None
+        total = self.total if total_exact else max(listed or 0, processed)
+        remaining = max(0, total - processed)
+
+        rate = self._measured_rate(processed, now)
+        rate_source = 'measured'
+        if rate is None:
+            rate = 60 / self.seconds_per_article if self.seconds_per_article else None
+            rate_source = 'rate_limit' if rate else None
+        eta_seconds = remaining / rate * 60 if rate else None
+        return {
+            'processed': processed,
+            'total': total,
+            'total_exact': total_exact,
+            'remaining': remaining,
+            'elapsed_seconds': round(now - self.started, 1),
+            'articles_per_minute': round(rate, 2) if rate else None,
+            'rate_source': rate_source,
+            'eta_seconds': round(eta_seconds) if eta_seconds is not None else None,
+            'estimated_finish': _finish_time(eta_seconds),
+            'irrelevant_ratio': irrelevant_ratio(outcomes),
+            'stages': get_stage_stats()
+        }
+
+
+def format_throughput(snapshot):
+    """吞吐量估算的一行说明，用于日志"""
+    total = f"{snapshot['total']}" if snapshot['total_exact'] else f"至少 {snapshot['total']}"
+    rate = snapshot['articles_per_minute']
+    line = f"已处理 {snapshot['processed']}/{total} 篇，速度 {rate if rate else '未知'} 篇/分钟"
+    if snapshot['eta_seconds'] is not None:
+        line += f"，预计剩余 {format_duration(snapshot['eta_seconds'])}（约 {snapshot['estimated_finish']} 完成）"
+    if snapshot['irrelevant_ratio'] is not None:
+        line += f"，无关比例 {snapshot['irrelevant_ratio']:.0%}"
+    return line
+
+
+# --- 抽样试运行 ---
+
+def _pick_sample(source, first_page, total, sample_size, window):
+    """
+    总篇数已知（本地列表已覆盖任务范围）时在范围内的全部文章中均匀抽样，覆盖新旧文章；
+    否则取范围内最新的 sample_size 篇
+    """
+    candidates = []
+    page = first_page
+    begin = 0
+    while page:
+        inside, past_window = window.split(page)
+        candidates.extend(inside)
+        begin += len(page)
+        if past_window or len(page) < BATCH_SIZE or (not total and len(candidates) >= sample_size):
+            break
+        page = source.get_page(begin, BATCH_SIZE)
+
+    if len(candidates) <= sample_size:
+        return candidates
+    if not total:
+        return candidates[:sample_size]
+    return [candidates[int(i * len(candidates) / sample_size)] for i in range(sample_size)]
+
+
+def _sample_article(article, output_dir, token, classify, labels):
+    """对单篇文章走完整流程但不保存分类结果，返回处理结果（OUTCOMES 之一）；出错时记为失败，继续抽样其余文章"""
+    try:
+        return _process_sample_article(article, output_dir, token, classify, labels)
+    except Exception as e:
+        print(f"试运行处理失败: {article.get('title')}: {e}")
+        return 'failed'
+
+
+def _process_sample_article(article, output_dir, token, classify, labels):
+    from WeChat import download_article, get_article_file_path
+    from Layout import remove_article_file
+
+    if classify:
+        from Classification import screen_article_title
+        if screen_article_title(article["title"], article.get("digest", "")) == "无关":
+            return 'screened_out'
+
+    existed = os.path.exists(get_article_file_path(output_dir, article["title"], article.get("create_time")))
+    file_path = download_article(article["link"], output_dir, article["title"], token, article.get("create_time"))
+    if not file_path:
+        return 'failed'
+    try:
+        if not classify:
+            return 'downloaded'
+        from Classification import classify_text, read_markdown_file
+        from Converter import extract_text
+        markdown_content = read_markdown_file(file_path)
+        result = classify_text(extract_text(markdown_content), os.path.basename(file_path), markdown_content)
+        if result.startswith("[错误]"):
+            return 'failed'
+        if result == "无关":
+            return 'irrelevant'
+        labels[result] = labels.get(result, 0) + 1
+        return 'classified'
+    finally:
+        # 试运行不保留新下载的文章文件；原始HTML仍在原始HTML存储中，正式运行时复用
+        if not existed:
+            try:
+                remove_article_file(file_path, output_dir)
+            except OSError:
+                pass
+
+
+def sample_pipeline(account, token, output_dir, sample_size=DEFAULT_SAMPLE_SIZE, mode='classify', task_status=None,
+                    window=None):
+    """
+    抽样试运行：抽取 sample_size 篇文章走完整流程，推算全部文章的处理时间和无关比例，返回估算结果
+    mode: classify（下载并分类）或 download（只下载）
+    window: 发布时间范围（PublishWindow），只在范围内抽样和推算
+    """
+    from ArticleIndex import create_article_source, PublishWindow
+
+    window = window or PublishWindow()
+
+    classify = mode == 'classify'
+    os.makedirs(output_dir, exist_ok=True)
+    reset_stage_stats()
+
+    list_started = time.perf_counter()
+    source = create_article_source(account["fakeid"], token, output_dir, task_status, window)
+    first_page = source.get_page(0, BATCH_SIZE)
+    if not first_page:
+        raise RuntimeError("未获取到文章列表")
+    total = source.known_total()
+    articles = _pick_sample(source, first_page, total, sample_size, window)
+    list_seconds = time.perf_counter() - list_started
+    print(f"文章列表{'共 ' + str(total) + ' 篇' if total else '未完整同步，总篇数未知'}，"
+          f"抽取 {len(articles)} 篇试运行（获取列表耗时 {list_seconds:.1f} 秒）")
+
+    outcomes = {}
+    labels = {}
+    article_seconds = 0.0
+    for i, article in enumerate(articles):
+        if task_status is not None and not task_status.get('running', True):
+            print("\n检测到停止信号，结束试运行")
+            break
+        print(f"\n试运行第 {i + 1}/{len(articles)} 篇: {article['title']}")
+        started = time.perf_counter()
+        with article_scope(article["title"]):
+            outcome = _sample_article(article, output_dir, token, classify, labels)
+        article_seconds += time.perf_counter() - started
+        record_outcome(task_status, outcome)
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        if task_status is not None:
+            task_status['processed_articles'] = i + 1
+            task_status['progress'] = int((i + 1) / len(articles) * 100)
+
+    sampled = sum(outcomes.values())
+    avg_seconds = article_seconds / sampled if sampled else None
+    # 需要调用下载接口的比例（标题初筛拦下的文章不下载）
+    download_ratio = (sampled - outcomes.get('screened_out', 0)) / sampled if sampled else 0.0
+    app_config = load_app_config()
+    if avg_seconds is None:
+        seconds_per_article = None
+    elif app_config.get('use_work_queue', False):
+        workers = max(1, int(app_config.get('work_queue_local_workers', 2)))
+        seconds_per_article = max(avg_seconds / workers, queue_seconds_per_article() * download_ratio)
+    else:
+        seconds_per_article = avg_seconds + direct_seconds_per_article()
+    estimated_seconds = total * seconds_per_article if total and seconds_per_article else None
+    ratio = irrelevant_ratio(outcomes)
+
+    return {
+        'account': account.get('nickname', ''),
+        'mode': mode,
+        'sample_size': sampled,
+        'total_articles': total,
+        'total_exact': total is not None,
+        'list_seconds': round(list_seconds, 1),
+        'outcomes': outcomes,
+        'labels': labels,
+        'avg_seconds_per_article': round(avg_seconds, 2) if avg_seconds is not None else None,
+        'seconds_per_article': round(seconds_per_article, 2) if seconds_per_article is not None else None,
+        'articles_per_minute': round(60 / seconds_per_article, 2) if seconds_per_article else None,
+        'estimated_seconds': round(estimated_seconds) if estimated_seconds is not None else None,
+        'estimated_finish': _finish_time(estimated_seconds),
+        'irrelevant_ratio': ratio,
+        'estimated_relevant_articles': round(total * (1 - ratio)) if total and ratio is not None else None,
+        'estimated_downloads': round(total * download_ratio) if total else None,
+        'stages': get_stage_stats()
+    }
+
+
+def format_estimate(estimate):
+    """抽样试运行结果的说明，用于日志"""
+    lines = [f"试运行 {estimate['sample_size']} 篇，平均每篇 {estimate['avg_seconds_per_article']} 秒"
+             f"（含批次暂停或并行后 {estimate['seconds_per_article']} 秒，约 {estimate['articles_per_minute']} 篇/分钟）"]
+    if estimate['irrelevant_ratio'] is not None:
+        lines.append(f"无关比例 {estimate['irrelevant_ratio']:.0%}，各小类: "
+                     + ("，".join(f"{label} {count} 篇" for label, count in estimate['labels'].items()) or "无"))
+    if estimate['total_exact']:
+        lines.append(f"全部 {estimate['total_articles']} 篇预计耗时 {format_duration(estimate['estimated_seconds'])}"
+                     f"（约 {estimate['estimated_finish']} 完成），需下载约 {estimate['estimated_downloads']} 篇"
+                     + (f"，预计相关文章约 {estimate['estimated_relevant_articles']} 篇"
+                        if estimate['estimated_relevant_articles'] is not None else ""))
+    else:
+        lines.append("文章列表未完整同步（未启用文章列表缓存或获取中断），无法推算总耗时")
+    return "\n".join(lines)
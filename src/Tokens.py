@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+import re
+import threading
+
+# --- Token估算与上下文长度分档 ---
+# 不依赖分词器，按字符类别估算token数：中日韩字符约1个token，其他字符约 CHARS_PER_TOKEN 个字符1个token。
+# 每次Ollama返回 prompt_eval_count（实际的提示词token数）后，用它校准估算系数，
+# 因此估算会逐渐贴近当前模型分词器的真实结果。
+# 命中Ollama提示词缓存时 prompt_eval_count 只包含未缓存的部分，远小于实际长度，这类结果不参与校准。
+
+CHARS_PER_TOKEN = 3.5
+# num_ctx 可选的档位；每次调用选择能容纳提示词的最小档位
+NUM_CTX_BUCKETS = (1024, 2048, 3072, 4096, 5120, 6144, 8192, 12288, 16384, 32768)
+# 对话模板（角色标记等）额外占用的token
+CHAT_TEMPLATE_OVERHEAD = 32
+# 校准系数的取值范围
+MIN_RATIO = 0.5
+MAX_RATIO = 2.0
+# prompt_eval_count 低于估算值的该比例时视为命中了提示词缓存
+CACHE_HIT_FRACTION = 0.6
+# 当前档位能容纳提示词且不超过所需档位的该倍数时沿用当前档位，避免模型被反复加载
+CTX_REUSE_FACTOR = 2
+
+_CJK_PATTERN = re.compile(r'[\u2e80-\u9fff\uf900-\ufaff\uff00-\uffef\u3000-\u303f]')
+
+
+class TokenEstimator:
+    """按字符估算token数，并根据Ollama返回的实际值校准"""
+
+    def __init__(self):
+        self.ratio = 1.0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _raw_estimate(text):
+        if not text:
+            return 0.0
+        cjk = len(_CJK_PATTERN.findall(text))
+        return cjk + (len(text) - cjk) / CHARS_PER_TOKEN
+
+    def estimate(self, text):
+        """估算文本的token数"""
+        return int(self._raw_estimate(text) * self.ratio) + 1
+
+    def observe(self, texts, actual_tokens):
+        """
+        用实际的提示词token数校准估算系数（指数滑动平均），返回是否参与了校准；
+        actual_tokens 明显小于估算值时是命中了提示词缓存，不参与校准
+        """
+        raw = sum(self._raw_estimate(text) for text in texts) + CHAT_TEMPLATE_OVERHEAD
+        if raw <= 0 or not actual_tokens:
+            return False
+        with self.lock:
+            if actual_tokens < raw * self.ratio * CACHE_HIT_FRACTION:
+                return False
+            observed = min(max(actual_tokens / raw, MIN_RATIO), MAX_RATIO)
+            self.ratio = min(max(0.8 * self.ratio + 0.2 * observed, MIN_RATIO), MAX_RATIO)
+        return True
+
+    def trim_to_tokens(self, text, max_tokens):
+        """截取文本开头，使估算的token数不超过 max_tokens"""
+        if max_tokens <= 0:
+            return ""
+        budget = max_tokens / self.ratio
+        used = 0.0
+        for index, char in enumerate(text):
+            used += 1.0 if _CJK_PATTERN.match(char) else 1.0 / CHARS_PER_TOKEN
+            if used > budget:
+                return text[:index]
+        return text
+
+
+class ContextSizer:
+    """
+    为每次调用选择 num_ctx 档位。
+    Ollama 在 num_ctx 变化时会重新加载模型，因此当前档位能容纳提示词、
+    且不超过所需档位的 CTX_REUSE_FACTOR 倍时沿用当前档位；否则换到所需的最小档位（可升可降）。
+    """
+
+    def __init__(self, max_ctx):
+        self.max_ctx = int(max_ctx)
+        self.current = 0
+        self.lock = threading.Lock()
+
+    def reset(self, max_ctx=None):
+        with self.lock:
+            if max_ctx is not None:
+                self.max_ctx = int(max_ctx)
+            self.current = 0
+
+    def choose(self, needed_tokens):
+        """返回本次调用使用的档位（不超过配置的最大值）"""
+        bucket = min(next((b for b in NUM_CTX_BUCKETS if b >= needed_tokens), NUM_CTX_BUCKETS[-1]), self.max_ctx)
+        with self.lock:
+            if not (bucket <= self.current <= bucket * CTX_REUSE_FACTOR):
+                self.current = bucket
+            return self.current
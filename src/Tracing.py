@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import time
+import threading
+import cProfile
+import pstats
+from contextlib import contextmanager
+from datetime import datetime
+
+# --- 任务追踪 ---
+# 每个任务（一次下载/分类运行）对应一个JobTrace，记录每篇文章在各阶段的耗时，
+# 任务结束时导出为 Chrome trace-event JSON（可在 chrome://tracing 或 Perfetto 中打开）或 JSONL。
+# 未开启追踪时 span() 只累计各阶段的次数和耗时（供吞吐量估算使用），不记录单条span。
+
+TRACE_FORMATS = ("chrome", "jsonl")
+
+_current_trace = None
+_trace_lock = threading.Lock()
+_local = threading.local()
+
+# 阶段名 -> [次数, 累计秒数]
+_stage_stats = {}
+_stage_lock = threading.Lock()
+
+
+class JobTrace:
+    """单个任务的追踪记录"""
+
+    def __init__(self, job_name, trace_folder, trace_format="chrome", enable_profile=False):
+        if trace_format not in TRACE_FORMATS:
+            trace_format = "chrome"
+        self.job_name = job_name
+        self.trace_folder = trace_folder
+        self.trace_format = trace_format
+        self.events = []
+        self.pid = os.getpid()
+        self.origin = time.perf_counter()
+        self.started_at = datetime.now()
+        self.profiler = cProfile.Profile() if enable_profile else None
+
+    def add_span(self, name, start, duration, args):
+        """追加一条完整span（时间单位：秒，相对perf_counter）"""
+        event = {
+            "name": name,
+            "ts": (start - self.origin) * 1e6,
+            "dur": duration * 1e6,
+            "tid": threading.get_ident(),
+            "args": args,
+        }
+        with _trace_lock:
+            self.events.append(event)
+
+    def _base_path(self):
+        safe_name = "".join(c for c in self.job_name if c not in r'\/:*?"<>|').strip() or "job"
+        timestamp = self.started_at.strftime("%Y%m%d_%H%M%S")
+        return os.path.join(self.trace_folder, f"{safe_name}_{timestamp}")
+
+    def save(self):
+        """写出追踪文件，返回文件路径"""
+        os.makedirs(self.trace_folder, exist_ok=True)
+        base_path = self._base_path()
+
+        with _trace_lock:
+            events = list(self.events)
+
+        if self.trace_format == "jsonl":
+            trace_path = base_path + ".trace.jsonl"
+            with open(trace_path, "w", encoding="utf-8") as f:
+                for event in events:
+                    record = {
+                        "name": event["name"],
+                        "start_ms": round(event["ts"] / 1000, 3),
+                        "duration_ms": round(event["dur"] / 1000, 3),
+                        "thread": event["tid"],
+                    }
+                    record.update(event["args"])
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        else:
+            trace_path = base_path + ".trace.json"
+            chrome_events = [
+                {
+                    "name": event["name"],
+                    "cat": "wechat",
+                    "ph": "X",
+                    "ts": round(event["ts"], 1),
+                    "dur": round(event["dur"], 1),
+                    "pid": self.pid,
+                    "tid": event["tid"],
+                    "args": event["args"],
+                }
+                for event in events
+            ]
+            with open(trace_path, "w", encoding="utf-8") as f:
+                json.dump({"traceEvents": chrome_events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+
+        return trace_path
+
+    def save_profile(self):
+        """写出cProfile结果（.prof 可用 snakeviz 等工具查看），返回文件路径"""
+        if not self.profiler:
+            return None
+        os.makedirs(self.trace_folder, exist_ok=True)
+        base_path = self._base_path()
+        profile_path = base_path + ".prof"
+        self.profiler.dump_stats(profile_path)
+
+        # 同时输出一份按累计耗时排序的文本摘要
+        summary_path = base_path + ".prof.txt"
+        with open(summary_path, "w", encoding="utf-8") as f:
+            stats = pstats.Stats(self.profiler, stream=f)
+            stats.sort_stats("cumulative").print_stats(40)
+        return profile_path
+
+
+def start_job_trace(job_name, trace_folder, trace_format="chrome", enable_profile=False):
+    """
+    开始一个任务的追踪；须在执行任务的线程中调用（cProfile只统计当前线程）
+    """
+    global _current_trace
+    trace = JobTrace(job_name, trace_folder, trace_format, enable_profile)
+    _current_trace = trace
+    if trace.profiler:
+        trace.profiler.enable()
+    print(f"已开启任务追踪: {job_name}（格式: {trace.trace_format}，cProfile: {'开启' if enable_profile else '关闭'}）")
+    return trace
+
+
+def finish_job_trace():
+    """结束当前任务的追踪并写出文件"""
+    global _current_trace
+    trace = _current_trace
+    _current_trace = None
+    if trace is None:
+        return None
+
+    if trace.profiler:
+        trace.profiler.disable()
+
+    try:
+        trace_path = trace.save()
+        print(f"任务追踪已保存: {trace_path}（共 {len(trace.events)} 个span）")
+        profile_path = trace.save_profile()
+        if profile_path:
+            print(f"cProfile结果已保存: {profile_path}")
+        return trace_path
+    except Exception as e:
+        print(f"保存任务追踪失败: {e}")
+        return None
+
+
+def reset_stage_stats():
+    """清空各阶段的累计耗时"""
+    with _stage_lock:
+        _stage_stats.clear()
+
+
+def get_stage_stats():
+    """各阶段的次数、累计耗时、平均耗时和按平均耗时折算的每分钟处理能力"""
+    with _stage_lock:
+        stats = {name: list(values) for name, values in _stage_stats.items()}
+    result = {}
+    for name, (count, seconds) in stats.items():
+        avg = seconds / count if count else 0.0
+        result[name] = {
+            "count": count,
+            "seconds": round(seconds, 2),
+            "avg_seconds": round(avg, 3),
+            "per_minute": round(60 / avg, 1) if avg else None
+        }
+    return result
+
+
+def _record_stage(name, duration):
+    with _stage_lock:
+        values = _stage_stats.setdefault(name, [0, 0.0])
+        values[0] += 1
+        values[1] += duration
+
+
+@contextmanager
+def article_scope(article_title):
+    """
+    标记当前线程正在处理的文章，范围内的所有span都会带上文章标题；
+    同时本身记录为一个"article"span，覆盖该文章的全部处理过程
+    """
+    previous = getattr(_local, "article", None)
+    _local.article = article_title
+    try:
+        with span("article"):
+            yield
+    finally:
+        _local.article = previous
+
+
+@contextmanager
+def span(name, **args):
+    """
+    记录一个阶段的耗时，例如:
+        with span("download", url=link):
+            ...
+    """
+    trace = _current_trace
+    start = time.perf_counter()
+    if trace is None:
+        try:
+            yield
+        finally:
+            _record_stage(name, time.perf_counter() - start)
+        return
+
+    article = getattr(_local, "article", None)
+    if article is not None and "article" not in args:
+        args["article"] = article
+
+    try:
+        yield
+    except BaseException as e:
+        args["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        _record_stage(name, duration)
+        trace.add_span(name, start, duration, args)
@@ -4,10 +4,13 @@ import requests
 import os
 import json
 import time
-import pandas as pd
-from datetime import datetime
-from urllib.parse import urlencode
-import html2text # 导入新添加的HTML转Markdown库
+from Tracing import span, article_scope
+from Converter import convert_html
+from Config import load_app_config
+from RawStore import get_raw_store_for
+from Resilience import request_with_retry, get_exporter_timeout, wait_for_upstreams
+from Layout import article_path, record_file, remove_article_file, replace_with_temp
+from Throughput import record_outcome
 
 # --- 配置区 ---
 
@@ -31,12 +34,20 @@ def search_accounts(keyword, token=None):
     """
     根据关键字搜索公众号。
     """
-    print(f"正在搜索公众号: {keyword}...")
+    result = search_accounts_page(keyword, token)
+    return result["list"] if result else None
+
+
+def search_accounts_page(keyword, token=None, begin=0, size=5):
+    """
+    分页搜索公众号，返回 {"list": [...], "total": 总数}，失败时返回None
+    """
+    print(f"正在搜索公众号: {keyword}（从第 {begin + 1} 个开始）...")
     api_url = f"{BASE_URL}/api/v1/account"
     params = {
         "keyword": keyword,
-        "begin": 0,
-        "size": 5
+        "begin": begin,
+        "size": size
     }
     
     # 使用传入的token或默认token
@@ -47,12 +58,13 @@ def search_accounts(keyword, token=None):
     }
 
     try:
-        response = requests.get(api_url, headers=headers, params=params, timeout=10)
+        response = request_with_retry("GET", api_url, "exporter", headers=headers, params=params,
+                                      timeout=get_exporter_timeout())
         if response.status_code == 200:
             data = response.json()
             if data.get("base_resp", {}).get("ret") == 0 and "list" in data:
                 print(f"成功找到 {data.get('total', 0)} 个相关公众号。")
-                return data["list"]
+                return {"list": data["list"], "total": data.get("total", len(data["list"]))}
             else:
                 print(f"API返回错误: {data.get('base_resp', {}).get('err_msg', '未知错误')}")
                 return None
@@ -76,7 +88,7 @@ def download_and_classify_batch(articles, output_dir, batch_size=20, task_status
     对于分类为无关的文章，删除对应文档
     支持停止检查和实时进度更新
     """
-    from Classification import initialize_classification, classify_single_article
+    from Classification import initialize_classification, classify_single_article, screen_article_title
     
     # 初始化分类环境
     initialize_classification(classification_folder, category_name)
@@ -89,28 +101,41 @@ def download_and_classify_batch(articles, output_dir, batch_size=20, task_status
         if task_status and not task_status.get('running', True):
             print("\n检测到停止信号，终止下载任务")
             break
+        # 下载接口或Ollama熔断时暂停，而不是让每篇文章依次超时失败
+        if not wait_for_upstreams(("exporter", "ollama"), task_status):
+            print("\n熔断暂停期间检测到停止信号，终止下载任务")
+            break
             
         print(f"\n正在下载第 {i+1}/{len(articles)} 篇文章...")
         
-        # 下载文章
-        file_path = download_article(article["link"], output_dir, article["title"], token)
-        
-        if file_path:  # 下载成功
-            # 立即进行分类
-            record = classify_single_article(file_path, sequence_number, article, classification_folder, category_name)
+        with article_scope(article["title"]):
+            # 标题初筛：明显无关的文章不再下载和调用主模型
+            screened_out = screen_article_title(article["title"], article.get("digest", "")) == "无关"
+            # 下载文章
+            file_path = None if screened_out else download_article(article["link"], output_dir, article["title"], token,
+                                                                    article.get("create_time"))
             
-            if record:  # 分类成功且不是无关
-                classification_records.append(record)
-                sequence_number += 1
-                print(f"文章已分类并保存: {article['title']}")
-            else:  # 分类为无关，删除文档
-                try:
-                    os.remove(file_path)
-                    print(f"已删除无关文档: {os.path.basename(file_path)}")
-                except Exception as e:
-                    print(f"删除文档失败: {e}")
-        else:
-            print(f"文章下载失败，跳过: {article['title']}")
+            if screened_out:  # 初筛已判为无关，没有需要删除的文档
+                record_outcome(task_status, 'screened_out')
+            elif file_path:  # 下载成功
+                # 立即进行分类
+                record = classify_single_article(file_path, sequence_number, article, classification_folder, category_name)
+                
+                if record:  # 分类成功且不是无关
+                    classification_records.append(record)
+                    sequence_number += 1
+                    record_outcome(task_status, 'classified')
+                    print(f"文章已分类并保存: {article['title']}")
+                else:  # 分类为无关，删除文档
+                    record_outcome(task_status, 'irrelevant')
+                    try:
+                        remove_article_file(file_path, output_dir)
+                        print(f"已删除无关文档: {os.path.basename(file_path)}")
+                    except Exception as e:
+                        print(f"删除文档失败: {e}")
+            else:
+                record_outcome(task_status, 'failed')
+                print(f"文章下载失败，跳过: {article['title']}")
         
         # 更新实时进度（如果提供了task_status）
         if task_status:
@@ -145,15 +170,21 @@ def download_articles_only(articles, output_dir, batch_size=20, task_status=None
         if task_status and not task_status.get('running', True):
             print("\n检测到停止信号，终止下载任务")
             break
+        if not wait_for_upstreams(("exporter",), task_status):
+            print("\n熔断暂停期间检测到停止信号，终止下载任务")
+            break
             
         print(f"\n正在下载第 {i+1}/{len(articles)} 篇文章...")
         
         # 下载文章
-        file_path = download_article(article["link"], output_dir, article["title"], token)
+        with article_scope(article["title"]):
+            file_path = download_article(article["link"], output_dir, article["title"], token, article.get("create_time"))
         
         if file_path:  # 下载成功
+            record_outcome(task_status, 'downloaded')
             print(f"文章已下载: {article['title']}")
         else:
+            record_outcome(task_status, 'failed')
             print(f"文章下载失败，跳过: {article['title']}")
         
         # 更新实时进度（如果提供了task_status）
@@ -197,7 +228,9 @@ def get_articles_with_begin(fakeid, begin=0, count=20, token=None):
     }
 
     try:
-        response = requests.get(api_url, headers=headers, params=params, timeout=10)
+        with span("list_fetch", fakeid=fakeid, begin=begin, size=count):
+            response = request_with_retry("GET", api_url, "exporter", headers=headers, params=params,
+                                          timeout=get_exporter_timeout())
         if response.status_code == 200:
             data = response.json()
             if data.get("base_resp", {}).get("ret") == 0 and "articles" in data:
@@ -221,7 +254,101 @@ def get_articles_with_begin(fakeid, begin=0, count=20, token=None):
 
 
 
-def download_article(article_url, output_dir, article_title, token=None):
+def get_article_file_path(output_dir, article_title, publish_time=None):
+    """根据文章标题生成保存路径（去除文件名中的非法字符），按 directory_layout 放入分片子文件夹"""
+    safe_title = "".join(c for c in article_title if c not in r'\/:*?"<>|').strip()
+    return article_path(output_dir, f"{safe_title}.md", publish_time)
+
+
+def write_article_file(file_path, content):
+    """
+    先写入同目录的临时文件再替换目标文件。
+    分类目录中的文章可能是下载文件的硬链接，直接覆盖写入会同时改掉已分类的文章；
+    替换后目标路径指向新文件，硬链接的另一端保持原内容。
+    临时文件由 mkstemp 以 0600 创建，替换前恢复为按 umask 的默认权限，其他用户和共享文件夹仍可读取。
+    """
+    replace_with_temp(file_path, lambda f: f.write(content), encoding="utf-8-sig")
+
+
+def save_article_html(html_content, output_dir, article_title, publish_time=None):
+    """
+    将文章HTML转换为Markdown并保存。
+    返回保存的文件路径，如果失败返回None。
+    """
+    file_path = get_article_file_path(output_dir, article_title, publish_time)
+    try:
+        # --- 核心转换逻辑 ---
+        # 1. 执行转换（大文章交给转换进程池，避免长时间占用GIL）
+        with span("convert", html_chars=len(html_content)):
+            markdown_content = convert_html(html_content)
+        
+        # 2. 将转换后的Markdown内容写入文件
+        with span("file_write"):
+            write_article_file(file_path, markdown_content)
+            record_file(file_path, output_dir)
+        print(f"文章已成功转换为Markdown并保存到: {file_path}")
+        return file_path
+    except IOError as e:
+        print(f"保存文件时发生IO错误: {e}")
+        return None
+
+
+def save_article_content(response_text, output_dir, article_title, article_url=None, publish_time=None):
+    """
+    解析下载接口返回的内容，将HTML转换为Markdown并保存；
+    提供 article_url 时同时把原始HTML存入本地压缩存储。
+    返回保存的文件路径，如果失败返回None。
+    """
+    try:
+        data = json.loads(response_text)
+    except json.JSONDecodeError:
+        print(f"警告: 文章 '{article_title}' 的返回内容不是预期的JSON格式。将直接保存原始文本。")
+        file_path = get_article_file_path(output_dir, article_title, publish_time)
+        try:
+            write_article_file(file_path, response_text)
+            record_file(file_path, output_dir)
+            return file_path
+        except IOError as e:
+            print(f"保存文件时发生IO错误: {e}")
+            return None
+
+    html_content = data.get("html", "")
+    if not html_content:
+        print(f"警告: 文章 '{article_title}' 的返回内容中不包含HTML，无法转换。")
+        return None
+
+    if article_url:
+        try:
+            store = get_raw_store_for(output_dir)
+            if store is not None:
+                with span("raw_store_write"):
+                    store.put(article_url, html_content, article_title)
+        except Exception as e:
+            print(f"保存原始HTML失败: {e}")
+
+    return save_article_html(html_content, output_dir, article_title, publish_time)
+
+
+def load_stored_article(article_url, output_dir, article_title, publish_time=None):
+    """
+    如果本地存储中已有该文章的原始HTML（且 app_config.json 中 raw_store_reuse 未关闭），
+    直接转换保存，不访问下载接口。返回保存的文件路径，本地没有时返回None。
+    """
+    try:
+        if not load_app_config().get('raw_store_reuse', True):
+            return None
+        store = get_raw_store_for(output_dir)
+        html_content = store.get_html(article_url) if store is not None else None
+    except Exception as e:
+        print(f"读取本地原始HTML失败: {e}")
+        return None
+    if not html_content:
+        return None
+    print(f"使用本地保存的原始HTML: {article_title}")
+    return save_article_html(html_content, output_dir, article_title, publish_time)
+
+
+def download_article(article_url, output_dir, article_title, token=None, publish_time=None):
     """
     下载单篇文章，将其从HTML转换为Markdown并保存。
     返回保存的文件路径，如果失败返回None。
@@ -240,44 +367,17 @@ def download_article(article_url, output_dir, article_title, token=None):
         "Content-Type": "application/json"
     }
 
+    # 本地已保存原始HTML时不再访问下载接口
+    file_path = load_stored_article(article_url, output_dir, article_title, publish_time)
+    if file_path:
+        return file_path
+
     try:
-        response = requests.get(api_url, headers=headers, params=params, timeout=20)
+        with span("download", url=article_url):
+            response = request_with_retry("GET", api_url, "exporter", headers=headers, params=params,
+                                          timeout=get_exporter_timeout())
         if response.status_code == 200:
-            safe_title = "".join(c for c in article_title if c not in r'\/:*?"<>|').strip()
-            file_path = os.path.join(output_dir, f"{safe_title}.md")
-
-            try:
-                data = response.json()
-                html_content = data.get("html", "")
-
-                if html_content:
-                    # --- 核心转换逻辑 ---
-                    # 1. 创建一个转换器实例
-                    h = html2text.HTML2Text()
-                    # 2. 告诉转换器忽略图片和链接，可以根据需要调整
-                    # h.ignore_links = True
-                    # h.ignore_images = True
-                    # 3. 执行转换
-                    markdown_content = h.handle(html_content)
-                    
-                    # 4. 将转换后的Markdown内容写入文件
-                    with open(file_path, "w", encoding="utf-8-sig") as f:
-                        f.write(markdown_content)
-                    print(f"文章已成功转换为Markdown并保存到: {file_path}")
-                    return file_path
-                else:
-                    print(f"警告: 文章 '{article_title}' 的返回内容中不包含HTML，无法转换。")
-                    return None
-
-            except json.JSONDecodeError:
-                print(f"警告: 文章 '{article_title}' 的返回内容不是预期的JSON格式。将直接保存原始文本。")
-                with open(file_path, "w", encoding="utf-8-sig") as f:
-                    f.write(response.text)
-                return file_path
-            except IOError as e:
-                print(f"保存文件时发生IO错误: {e}")
-                return None
-
+            return save_article_content(response.text, output_dir, article_title, article_url, publish_time)
         else:
             print(f"下载文章 '{article_title}' 失败! HTTP 状态码: {response.status_code}")
             print("--- 服务器返回的原始内容 ---\n" + response.text + "\n--------------------------")
@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+
+from Config import load_app_config
+
+# --- 持久化工作队列 ---
+# 原来每篇文章的下载、转换、分类、放置都在Flask进程的线程中完成，受限于一个进程和GIL。
+# 启用 use_work_queue 后，Web界面只负责获取文章列表、把每篇文章作为一个工作项写入队列（生产者），
+# 并汇总结果、写入资料汇总表（监控者）；实际处理由任意数量的 Worker.py 进程完成，
+# 这些进程可以在本机，也可以在共享同一文件夹的其他电脑上。
+#   <下载文件夹>/_work_queue.sqlite
+# 工作项以租约方式领取：领取后 visibility_timeout 秒内其他进程看不到它，处理中的进程定期续租；
+# 进程崩溃或断开时租约到期，工作项自动重新可见并由其他进程处理。
+# 失败的工作项重新排队，累计 max_attempts 次后标记为失败；租约到期（处理进程崩溃）也计入次数，
+# 反复导致处理进程崩溃的工作项同样在 max_attempts 次后标记为失败，不会被无限次重新领取。
+# 任务参数中的文件夹路径按相对于队列文件所在文件夹的路径保存（portable_path），
+# 其他电脑上的处理进程按自己访问队列文件的路径还原（resolve_path）；
+# 无法表示为相对路径（不同盘符）时保存绝对路径，可在处理进程所在电脑的 app_config.json 中
+# 用 work_queue_path_map（{"生产者电脑上的路径前缀": "本机路径前缀"}）换算。
+# 多台电脑共用时使用SQLite默认的回滚日志（WAL依赖共享内存，不能跨机器），
+# 租约时间基于各机器的系统时间，需保持时间同步。
+
+QUEUE_FILENAME = '_work_queue.sqlite'
+DEFAULT_VISIBILITY_TIMEOUT = 900
+DEFAULT_MAX_ATTEMPTS = 3
+
+# 任务状态：producing 仍在写入工作项；running 已全部写入；finished 已完成；cancelled 已停止
+ACTIVE_JOB_STATES = ('producing', 'running')
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+class WorkQueue:
+    """SQLite实现的多进程共享工作队列"""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.lock = threading.Lock()
+        # 自行管理事务，领取工作项时用 BEGIN IMMEDIATE 保证多进程间不会重复领取
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA busy_timeout = 30000")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                mode TEXT NOT NULL,
+                params TEXT,
+                state TEXT NOT NULL,
+                created_at REAL,
+                finished_at REAL
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS items (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id TEXT NOT NULL,
+                item_key TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                state TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                lease_owner TEXT,
+                lease_until REAL,
+                result TEXT,
+                error TEXT,
+                collected INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL,
+                UNIQUE (job_id, item_key)
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_items_state ON items (job_id, state)")
+        # 跨进程共享的接口调用间隔
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS pacing (
+                name TEXT PRIMARY KEY,
+                next_at REAL NOT NULL
+            )
+        """)
+
+    def _write(self, sql_statements):
+        """在一个 BEGIN IMMEDIATE 事务中依次执行，返回最后一条语句的游标"""
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = None
+                for sql, params in sql_statements:
+                    cursor = self.conn.execute(sql, params)
+                self.conn.execute("COMMIT")
+                return cursor
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    # --- 生产者 ---
+
+    def create_job(self, mode, params):
+        """创建任务，返回 job_id"""
+        job_id = _new_job_id()
+        self._write([(
+            "INSERT INTO jobs (job_id, mode, params, state, created_at) VALUES (?, ?, ?, 'producing', ?)",
+            (job_id, mode, json.dumps(params, ensure_ascii=False), time.time())
+        )])
+        return job_id
+
+    def enqueue(self, job_id, articles):
+        """把一批文章写入队列（同一任务中同一链接只写入一次），返回新写入的数量"""
+        now = time.time()
+        added = 0
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                for article in articles:
+                    cursor = self.conn.execute(
+                        "INSERT OR IGNORE INTO items (job_id, item_key, payload, updated_at) VALUES (?, ?, ?, ?)",
+                        (job_id, article.get('link') or article.get('title', ''),
+                         json.dumps(article, ensure_ascii=False), now)
+                    )
+                    added += cursor.rowcount
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return added
+
+    def set_job_state(self, job_id, state):
+        finished_at = time.time() if state not in ACTIVE_JOB_STATES else None
+        self._write([("UPDATE jobs SET state = ?, finished_at = ? WHERE job_id = ?", (state, finished_at, job_id))])
+
+    def get_job(self, job_id):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT job_id, mode, params, state FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {'job_id': row[0], 'mode': row[1], 'params': json.loads(row[2] or '{}'), 'state': row[3]}
+
+    # --- 工作进程 ---
+
+    def portable_path(self, path):
+        """任务参数中保存的路径：相对于队列文件所在文件夹，无法表示为相对路径时保持绝对路径"""
+        if not path:
+            return path
+        try:
+            return os.path.relpath(os.path.abspath(path), os.path.dirname(os.path.abspath(self.path)))
+        except ValueError:
+            # Windows上不同盘符
+            return os.path.abspath(path)
+
+    def resolve_path(self, path, path_map=None):
+        """把任务参数中的路径还原为本机路径：相对路径以本机访问的队列文件夹为基准，绝对路径按 path_map 换算前缀"""
+        if not path:
+            return path
+        if not os.path.isabs(path):
+            return os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(self.path)), path))
+        for prefix, local_prefix in sorted((path_map or {}).items(), key=lambda item: -len(item[0])):
+            if path.startswith(prefix) and path[len(prefix):len(prefix) + 1] in ('', '/', '\\'):
+                return local_prefix + path[len(prefix):]
+        return path
+
+    def lease(self, owner, visibility_timeout=DEFAULT_VISIBILITY_TIMEOUT, job_id=None,
+              max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """
+        领取一个工作项，返回 {'id', 'job_id', 'article', 'attempts'}，没有可领取的工作项时返回None
+        租约已过期的工作项（处理它的进程已退出）也会被重新领取；已领取 max_attempts 次的则标记为失败
+        """
+        now = time.time()
+        job_filter = "AND i.job_id = ?" if job_id else ""
+        params = [now] + ([job_id] if job_id else [])
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute(
+                    "UPDATE items SET state = 'failed', error = ?, lease_owner = NULL, lease_until = NULL, updated_at = ? "
+                    "WHERE state = 'leased' AND lease_until < ? AND attempts >= ?",
+                    (f"租约到期 {max_attempts} 次（处理进程可能已崩溃）", now, now, max_attempts)
+                )
+                row = self.conn.execute(
+                    "SELECT i.id, i.job_id, i.payload, i.attempts FROM items i JOIN jobs j ON i.job_id = j.job_id "
+                    "WHERE j.state IN ('producing', 'running') "
+                    "AND (i.state = 'queued' OR (i.state = 'leased' AND i.lease_until < ?)) "
+                    f"{job_filter} ORDER BY i.id LIMIT 1",
+                    params
+                ).fetchone()
+                if row is not None:
+                    self.conn.execute(
+                        "UPDATE items SET state = 'leased', lease_owner = ?, lease_until = ?, "
+                        "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                        (owner, now + visibility_timeout, now, row[0])
+                    )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return {'id': row[0], 'job_id': row[1], 'article': json.loads(row[2]), 'attempts': row[3] + 1}
+
+    def extend(self, item_id, owner, visibility_timeout=DEFAULT_VISIBILITY_TIMEOUT):
+        """续租，返回租约是否仍属于 owner"""
+        cursor = self._write([(
+            "UPDATE items SET lease_until = ?, updated_at = ? WHERE id = ? AND state = 'leased' AND lease_owner = ?",
+            (time.time() + visibility_timeout, time.time(), item_id, owner)
+        )])
+        return cursor.rowcount == 1
+
+    def complete(self, item_id, owner, result):
+        """标记完成；租约已过期并被其他进程领取时返回False，结果丢弃"""
+        cursor = self._write([(
+            "UPDATE items SET state = 'done', result = ?, lease_owner = NULL, lease_until = NULL, updated_at = ? "
+            "WHERE id = ? AND state = 'leased' AND lease_owner = ?",
+            (json.dumps(result, ensure_ascii=False), time.time(), item_id, owner)
+        )])
+        return cursor.rowcount == 1
+
+    def fail(self, item_id, owner, error, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """处理失败：未达到最大次数时重新排队，否则标记为失败"""
+        cursor = self._write([(
+            "UPDATE items SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+            "error = ?, lease_owner = NULL, lease_until = NULL, updated_at = ? "
+            "WHERE id = ? AND state = 'leased' AND lease_owner = ?",
+            (max_attempts, str(error), time.time(), item_id, owner)
+        )])
+        return cursor.rowcount == 1
+
+    def reserve_slot(self, name, interval):
+        """
+        所有进程共用的调用间隔：预约下一次调用的时间，返回需要等待的秒数
+        例如下载接口每 interval 秒最多调用一次，无论有多少个工作进程
+        """
+        if interval <= 0:
+            return 0.0
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = self.conn.execute("SELECT next_at FROM pacing WHERE name = ?", (name,)).fetchone()
+                slot = max(now, row[0]) if row else now
+                self.conn.execute(
+                    "INSERT INTO pacing (name, next_at) VALUES (?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET next_at = excluded.next_at",
+                    (name, slot + interval)
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return slot - now
+
+    def has_pending(self, job_id=None):
+        """是否还有未处理完的工作项（或仍在写入工作项的任务）"""
+        job_filter = "AND j.job_id = ?" if job_id else ""
+        params = [job_id] if job_id else []
+        with self.lock:
+            producing = self.conn.execute(
+                f"SELECT COUNT(*) FROM jobs j WHERE j.state = 'producing' {job_filter}", params
+            ).fetchone()[0]
+            pending = self.conn.execute(
+                "SELECT COUNT(*) FROM items i JOIN jobs j ON i.job_id = j.job_id "
+                f"WHERE j.state IN ('producing', 'running') AND i.state IN ('queued', 'leased') {job_filter}",
+                params
+            ).fetchone()[0]
+        return producing > 0 or pending > 0
+
+    # --- 监控者 ---
+
+    def collect_results(self, job_id):
+        """取出已完成但尚未汇总的工作项结果，并标记为已汇总"""
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self.conn.execute(
+                    "SELECT id, result FROM items WHERE job_id = ? AND state = 'done' AND collected = 0 ORDER BY id",
+                    (job_id,)
+                ).fetchall()
+                self.conn.executemany("UPDATE items SET collected = 1 WHERE id = ?", [(row[0],) for row in rows])
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return [json.loads(row[1] or '{}') for row in rows]
+
+    def job_stats(self, job_id):
+        """任务中各状态的工作项数量及处理中的工作进程"""
+        now = time.time()
+        with self.lock:
+            counts = dict(self.conn.execute(
+                "SELECT state, COUNT(*) FROM items WHERE job_id = ? GROUP BY state", (job_id,)
+            ).fetchall())
+            workers = [row[0] for row in self.conn.execute(
+                "SELECT DISTINCT lease_owner FROM items WHERE job_id = ? AND state = 'leased' AND lease_until >= ?",
+                (job_id, now)
+            ).fetchall()]
+            state = self.conn.execute("SELECT state FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return {
+            'job_id': job_id,
+            'state': state[0] if state else None,
+            'queued': counts.get('queued', 0),
+            'leased': counts.get('leased', 0),
+            'done': counts.get('done', 0),
+            'failed': counts.get('failed', 0),
+            'total': sum(counts.values()),
+            'active_workers': workers,
+        }
+
+    def recent_jobs(self, limit=10):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT job_id FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [self.job_stats(row[0]) for row in rows]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def _new_job_id():
+    """按时间排序的任务ID"""
+    return time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:6]
+
+
+def get_queue_path(download_folder=None):
+    """队列文件位置：优先使用 app_config.json 中的 work_queue_path，否则放在下载文件夹下"""
+    app_config = load_app_config()
+    if app_config.get('work_queue_path'):
+        return app_config['work_queue_path']
+    return os.path.join(download_folder or app_config.get('output_folder', ''), QUEUE_FILENAME)
+
+
+def get_work_queue(path):
+    """获取（必要时打开）指定路径的队列，同一路径共用一个实例"""
+    path = os.path.abspath(path)
+    with _queues_lock:
+        if path not in _queues:
+            _queues[path] = WorkQueue(path)
+        return _queues[path]
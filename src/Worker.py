@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+工作队列的处理进程：从 _work_queue.sqlite 领取文章，下载、转换、分类并放入分类结果文件夹。
+
+示例:
+    # 本机启动4个处理进程，处理队列中的所有任务，Ctrl+C 停止
+    python src/Worker.py --queue D:\\智能分类\\原文章\\_work_queue.sqlite --processes 4
+
+    # 其他电脑上通过共享文件夹加入（路径指向同一个队列文件），Token 从环境变量或本机配置读取
+    set WECHAT_EXPORTER_TOKEN=你的Token
+    python src/Worker.py --queue \\\\server\\智能分类\\原文章\\_work_queue.sqlite
+
+Web界面启用 use_work_queue 后会自动启动 work_queue_local_workers 个处理进程（--job ... --exit-when-idle），
+任务处理完后自动退出。
+"""
+
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(__file__))
+
+from Config import load_app_config
+from WorkQueue import get_work_queue, get_queue_path, DEFAULT_VISIBILITY_TIMEOUT, DEFAULT_MAX_ATTEMPTS
+from Layout import remove_article_file
+
+# 没有可领取的工作项时的轮询间隔（秒）
+POLL_INTERVAL = 2.0
+# 下载接口的Token不写入共享的队列文件：本机处理进程由Web服务通过该环境变量传入，
+# 其他电脑上的处理进程读取该环境变量或本机 app_config.json 中的 api_token
+TOKEN_ENV_VAR = 'WECHAT_EXPORTER_TOKEN'
+
+
+def get_worker_token():
+    """处理进程使用的下载接口Token，未配置时返回None（使用 WeChat.py 中的默认值）"""
+    return os.environ.get(TOKEN_ENV_VAR) or load_app_config().get('api_token') or None
+
+
+class ItemFailed(Exception):
+    """工作项处理失败，需要重新排队"""
+
+
+class _StopStatus:
+    """供 wait_for_upstreams 判断是否停止，与原来的 task_status 用法相同"""
+
+    def __init__(self, stop_event):
+        self.stop_event = stop_event
+
+    def get(self, key, default=None):
+        return not self.stop_event.is_set() if key == 'running' else default
+
+
+def process_article(queue, job, article, stop_status):
+    """
+    处理单篇文章，返回写入队列的结果：
+    {'status': 'downloaded' | 'classified' | 'irrelevant' | 'screened_out', 'record': 分类记录或None}
+    下载失败时抛出 ItemFailed
+    """
+    from WeChat import download_article
+    from Resilience import wait_for_upstreams
+
+    params = job['params']
+    output_dir = params['output_dir']
+    classify = job['mode'] == 'classify'
+    os.makedirs(output_dir, exist_ok=True)
+
+    if not wait_for_upstreams(("exporter", "ollama") if classify else ("exporter",), stop_status):
+        raise ItemFailed("处理进程已停止")
+
+    if classify:
+        from Classification import screen_article_title
+        if screen_article_title(article["title"], article.get("digest", "")) == "无关":
+            return {'status': 'screened_out', 'record': None}
+
+    # 所有处理进程共用下载接口的调用间隔
+    wait = queue.reserve_slot('exporter', float(load_app_config().get('exporter_min_interval', 1.0)))
+    if wait > 0:
+        time.sleep(wait)
+    file_path = download_article(article["link"], output_dir, article["title"], get_worker_token(),
+                                 article.get("create_time"))
+    if not file_path:
+        raise ItemFailed(f"文章下载失败: {article['title']}")
+    if not classify:
+        return {'status': 'downloaded', 'record': None}
+
+    from Classification import classify_single_article
+    # 序号在写入资料汇总表时重新编号
+    record = classify_single_article(file_path, 1, article, params.get('classification_folder'),
+                                     params.get('category_name'))
+    if record:
+        return {'status': 'classified', 'record': record}
+    try:
+        remove_article_file(file_path, output_dir)
+        print(f"已删除无关文档: {os.path.basename(file_path)}")
+    except Exception as e:
+        print(f"删除文档失败: {e}")
+    return {'status': 'irrelevant', 'record': None}
+
+
+def resolve_job_paths(queue, job, path_map=None):
+    """把任务参数中的文件夹路径换算为本机路径（生产者保存的是相对于队列文件夹的路径）"""
+    params = dict(job['params'])
+    for key in ('output_dir', 'classification_folder'):
+        if params.get(key):
+            params[key] = queue.resolve_path(params[key], path_map)
+    return dict(job, params=params)
+
+
+def _keep_lease(queue, item_id, owner, visibility_timeout, done):
+    """处理期间定期续租，避免耗时较长的文章被其他进程重复领取"""
+    while not done.wait(visibility_timeout / 3):
+        if not queue.extend(item_id, owner, visibility_timeout):
+            print(f"工作项 {item_id} 的租约已失效")
+            return
+
+
+def run_worker(queue_path, job_id=None, exit_when_idle=False, stop_event=None):
+    """处理进程主循环：领取 → 处理 → 完成/失败，直到收到停止信号（或队列处理完）"""
+    app_config = load_app_config()
+    visibility_timeout = float(app_config.get('work_queue_visibility_timeout', DEFAULT_VISIBILITY_TIMEOUT))
+    max_attempts = int(app_config.get('work_queue_max_attempts', DEFAULT_MAX_ATTEMPTS))
+    path_map = app_config.get('work_queue_path_map') or {}
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    stop_event = stop_event or threading.Event()
+    stop_status = _StopStatus(stop_event)
+
+    queue = get_work_queue(queue_path)
+    initialized = set()
+    processed = 0
+    print(f"处理进程 {owner} 已启动，队列: {queue_path}")
+
+    while not stop_event.is_set():
+        item = queue.lease(owner, visibility_timeout, job_id, max_attempts)
+        if item is None:
+            if exit_when_idle and not queue.has_pending(job_id):
+                break
+            stop_event.wait(POLL_INTERVAL)
+            continue
+
+        job = resolve_job_paths(queue, queue.get_job(item['job_id']), path_map)
+        article = item['article']
+        if job['mode'] == 'classify' and job['job_id'] not in initialized:
+            from Classification import initialize_classification
+            initialize_classification(job['params'].get('classification_folder'), job['params'].get('category_name'))
+            initialized.add(job['job_id'])
+
+        done = threading.Event()
+        heartbeat = threading.Thread(target=_keep_lease,
+                                     args=(queue, item['id'], owner, visibility_timeout, done), daemon=True)
+        heartbeat.start()
+        try:
+            result = process_article(queue, job, article, stop_status)
+        except Exception as e:
+            print(f"处理失败（第 {item['attempts']} 次）: {article.get('title')}: {e}")
+            queue.fail(item['id'], owner, e, max_attempts)
+        else:
+            if queue.complete(item['id'], owner, result):
+                processed += 1
+        finally:
+            done.set()
+
+    print(f"处理进程 {owner} 退出，共处理 {processed} 篇文章")
+    return processed
+
+
+def _worker_main(queue_path, job_id, exit_when_idle):
+    """子进程入口：Ctrl+C / SIGTERM 时处理完当前文章再退出"""
+    stop_event = threading.Event()
+    signal.signal(signal.SIGINT, lambda signum, frame: stop_event.set())
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+    run_worker(queue_path, job_id, exit_when_idle, stop_event)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="工作队列处理进程")
+    parser.add_argument("--queue", default=None,
+                        help="队列文件路径，默认为 app_config.json 中的 work_queue_path 或 <下载文件夹>/_work_queue.sqlite")
+    parser.add_argument("--processes", type=int, default=1, help="启动的处理进程数")
+    parser.add_argument("--job", default=None, help="只处理指定任务")
+    parser.add_argument("--exit-when-idle", action="store_true", help="队列中没有待处理的文章时退出")
+    args = parser.parse_args(argv)
+
+    queue_path = args.queue or get_queue_path()
+    if args.processes <= 1:
+        _worker_main(queue_path, args.job, args.exit_when_idle)
+        return 0
+
+    processes = [
+        multiprocessing.Process(target=_worker_main, args=(queue_path, args.job, args.exit_when_idle))
+        for _ in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        # 子进程各自收到信号，等待其处理完当前文章
+        for process in processes:
+            process.join()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
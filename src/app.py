@@ -1,87 +1,55 @@
+import os
+import sys
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(__file__))
+
+from Config import load_app_config
+
+# --- Socket.IO 异步模式 ---
+# 以前未指定 async_mode，安装了 eventlet 时 Flask-SocketIO 会自动选用 eventlet，但没有 monkey_patch：
+# 任务工作线程是普通线程，其中阻塞的 requests 调用、time.sleep 以及从这些线程发出的 emit
+# 都会拖慢事件循环，任务运行期间 /api/status 和 Socket.IO 心跳明显延迟。
+# 现在由 app_config.json 中 socketio_async_mode 明确指定：
+#   threading : 默认。每个请求一个线程，任务中的阻塞调用不影响请求处理（WebSocket 需要 simple-websocket，未安装时使用长轮询）
+#   eventlet  : 启动时先 monkey_patch，使 requests、time.sleep 等变为协作式；CPU 密集的转换和分类仍会占用事件循环
+# 任务通过 socketio.start_background_task 启动，等待使用 socketio.sleep，两种模式下都不会阻塞请求处理。
+SOCKETIO_ASYNC_MODES = ('threading', 'eventlet')
+SOCKETIO_ASYNC_MODE = load_app_config().get('socketio_async_mode', 'threading')
+if SOCKETIO_ASYNC_MODE not in SOCKETIO_ASYNC_MODES:
+    SOCKETIO_ASYNC_MODE = 'threading'
+if SOCKETIO_ASYNC_MODE == 'eventlet':
+    # 必须在导入 requests、threading 等模块之前执行
+    import eventlet
+    eventlet.monkey_patch()
+
 from flask import Flask, request, jsonify, render_template
 from flask_socketio import SocketIO, emit
 import threading
 import queue
+import subprocess
 import time
-import os
-import sys
+from collections import deque
 from datetime import datetime
 import json
 
-# 添加当前目录到Python路径
-sys.path.append(os.path.dirname(__file__))
-
 # 导入WeChat.py的功能
-from WeChat import search_accounts, get_articles_with_begin, download_and_classify_batch
-from Classification import save_classification_results
+from WeChat import search_accounts_page, download_and_classify_batch
+from Classification import save_classification_results, reset_placement_stats, get_placement_stats, reset_llm_stats, get_llm_stats
+from Tracing import start_job_trace, finish_job_trace, reset_stage_stats
+from Resilience import get_breaker_stats
+from SearchCache import get_search_cache
+from ArticleIndex import create_article_source, get_article_index, get_index_path, PublishWindow
+from WorkQueue import get_work_queue, get_queue_path
+from SearchIndex import get_search_index
+from Throughput import (ThroughputEstimator, format_throughput, format_estimate, sample_pipeline,
+                        direct_seconds_per_article, queue_seconds_per_article)
+from Config import get_default_prompt_config, get_default_app_config, get_default_ollama_config
 
 app = Flask(__name__)
 
-# 默认配置函数
-def get_default_prompt_config():
-    """获取系统提示词默认配置"""
-    return {
-        'role_definition': '你是一名专注于线下快消品零售行业文章分类的专家，负责为大卖场/超市/便利店企业筛选和归类具有实操价值的案例或经营规范类内容，严格按照以下规则执行：',
-        'irrelevant_rules': [
-            "文字主旨非线下快消品零售业强相关",
-            "未包含具体企业实操案例/规范",
-            "不属于大卖场/超市/便利店之一的零售企业",
-            "存在：培训班/公示/广告/课程/会议/邀约/评奖/招聘/招募/推广/论坛/年会任一性质的内容",
-            "涉及电商/直播等线上渠道",
-            "所述是供应商/品牌方/餐饮业",
-            "纯新闻/报道/数据/主观内容/时效信息",
-            "含大量图片url链接"
-        ],
-        'categories': [
-            {'name': '合规风控类', 'desc': '风险事件处理/监管合规案例'},
-            {'name': '经营决策类', 'desc': '战略规划/商业模式/市场分析'},
-            {'name': '运营操作类', 'desc': '日常运营/流程优化/执行标准'},
-            {'name': '创新实践类', 'desc': '新技术应用/创新服务/差异化实践'}
-        ],
-        'examples': [
-            {
-                "text": "胖东来\"红内裤\"事件，一场信任危机下的企业合规警示录",
-                "category": "合规风控类"
-            },
-            {
-                "text": "沃尔玛推出自助结账系统，提升顾客购物体验",
-                "category": "创新实践类"
-            },
-            {
-                "text": "胖东来运营考核标准",
-                "category": "运营操作类"
-            },
-            {
-                "text": "创业型便利店该怎样才能做出成绩",
-                "category": "经营决策类"
-            }
-        ]
-    }
-
-def get_default_app_config():
-    """获取应用基础默认配置"""
-    return {
-        'api_token': '',
-        'output_folder': 'D:\\智能分类\\原文章',
-        'classification_folder': 'D:\\智能分类',
-        'category_name': '核心案例库',
-        'enable_classification': True
-    }
-
-def get_default_ollama_config():
-    """获取Ollama默认配置"""
-    return {
-        'ollama_url': 'http://localhost:11434',
-        'model_id': 'qwen3:8b',
-        'temperature': 0.3,
-        'timeout': 80,
-        'max_retries': 3,
-        'max_summary_length': 600,
-        'num_ctx': 5120,
-        'min_text_length': 150,
-    }
 app.config['SECRET_KEY'] = 'wechat_scraper_secret_key'
-socketio = SocketIO(app, cors_allowed_origins="*")
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode=SOCKETIO_ASYNC_MODE)
 
 # 全局变量
 task_status = {
@@ -102,6 +70,12 @@ log_queue = queue.Queue()
 # 当前下载线程引用
 current_download_thread = None
 
+# 当前异步下载器引用（只下载模式），停止任务时用于立即取消进行中的下载
+current_async_downloader = None
+
+# 当前任务的吞吐量估算器，/api/status 据此实时计算速度和剩余时间
+current_estimator = None
+
 class WebLogger:
     """自定义日志类，将print输出重定向到日志存储"""
     def __init__(self):
@@ -121,9 +95,55 @@ class WebLogger:
     def flush(self):
         self.terminal.flush()
 
-# 重定向print输出
-web_logger = WebLogger()
-sys.stdout = web_logger
+# print输出在启动Web服务时（__main__）才重定向：转换进程池以 spawn/forkserver 方式启动子进程时
+# 会重新导入本模块，子进程中不应再把输出写入Web日志
+web_logger = None
+
+def parse_flag(value):
+    """解析开关参数：JSON中的布尔值，或查询字符串/表单中的 "1"、"true"、"yes"、"on"（不区分大小写）"""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return bool(value)
+
+def get_trace_options(data):
+    """从请求参数中读取任务追踪选项，未提供时使用应用配置中的值"""
+    app_config = load_app_config()
+    return {
+        'enable_trace': parse_flag(data.get('enable_trace', app_config['enable_trace'])),
+        'trace_format': data.get('trace_format', app_config['trace_format']),
+        'enable_profile': parse_flag(data.get('enable_profile', app_config['enable_profile']))
+    }
+
+def start_throughput_estimate(seconds_per_article):
+    """任务开始时创建吞吐量估算器，并清空各阶段的耗时统计"""
+    global current_estimator
+    reset_stage_stats()
+    current_estimator = ThroughputEstimator(seconds_per_article)
+    return current_estimator
+
+def update_throughput(article_source=None):
+    """更新当前任务的吞吐量估算并写入 task_status['throughput']，文章列表完整时以其篇数为总数"""
+    estimator = current_estimator
+    if estimator is None:
+        return None
+    if article_source is not None:
+        estimator.set_total(article_source.known_total())
+    snapshot = estimator.snapshot(task_status['processed_articles'], task_status['total_articles'],
+                                  task_status.get('outcomes'))
+    task_status['throughput'] = snapshot
+    return snapshot
+
+def start_task_trace(account, output_folder, trace_options):
+    """按追踪选项开启任务追踪，追踪文件保存在下载文件夹的 _traces 目录下"""
+    if trace_options and (trace_options.get('enable_trace') or trace_options.get('enable_profile')):
+        start_job_trace(
+            account['nickname'].strip(),
+            os.path.join(output_folder, '_traces'),
+            trace_options.get('trace_format', 'chrome'),
+            trace_options.get('enable_profile', False)
+        )
 
 @app.route('/')
 def index():
@@ -137,6 +157,8 @@ def api_search_accounts():
         data = request.get_json()
         keyword = data.get('keyword', '').strip()
         token = data.get('token', '').strip()
+        begin = max(0, int(data.get('begin', 0) or 0))
+        size = min(max(1, int(data.get('size', 5) or 5)), 20)
         
         if not keyword:
             return jsonify({'success': False, 'error': '请输入公众号名称'})
@@ -146,13 +168,21 @@ def api_search_accounts():
         
         print(f"开始搜索公众号: {keyword}")
         print(f"使用Token: {token[:20]}...")
-        accounts = search_accounts(keyword, token)
+        # 相同的搜索在缓存有效期内直接返回，同时进行的相同搜索只请求一次接口
+        result, source = get_search_cache().get_or_fetch(
+            keyword, token, begin, size, lambda: search_accounts_page(keyword, token, begin, size)
+        )
+        accounts = result['list'] if result else None
         
         if accounts:
-            print(f"找到 {len(accounts)} 个匹配的公众号")
+            print(f"找到 {len(accounts)} 个匹配的公众号（{'缓存' if source != 'upstream' else '接口'}）")
             return jsonify({
                 'success': True, 
-                'accounts': accounts
+                'accounts': accounts,
+                'total': result['total'],
+                'begin': begin,
+                'has_more': begin + len(accounts) < result['total'],
+                'cached': source != 'upstream'
             })
         else:
             print("未找到匹配的公众号")
@@ -168,6 +198,77 @@ def api_search_accounts():
             'error': f'搜索失败: {str(e)}'
         })
 
+@app.route('/api/search_cache')
+def api_get_search_cache():
+    """获取公众号搜索缓存统计API"""
+    return jsonify({
+        'success': True,
+        'stats': get_search_cache().get_stats()
+    })
+
+@app.route('/api/articles')
+def api_get_cached_articles():
+    """读取本地缓存的公众号文章列表API（不访问下载接口）"""
+    try:
+        fakeid = request.args.get('fakeid', '').strip()
+        if not fakeid:
+            return jsonify({'success': False, 'error': '缺少fakeid'})
+        begin = max(0, int(request.args.get('begin', 0)))
+        size = min(max(1, int(request.args.get('size', 20))), 100)
+        
+        app_config = load_app_config()
+        if not app_config.get('enable_article_index', True) or not app_config.get('output_folder'):
+            return jsonify({'success': False, 'error': '文章列表缓存未启用'})
+        index = get_article_index(get_index_path(app_config['output_folder']))
+        
+        return jsonify({
+            'success': True,
+            'articles': index.page(fakeid, begin, size),
+            'index': index.stats(fakeid)
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'读取文章列表缓存失败: {str(e)}'
+        })
+
+@app.route('/api/search_articles')
+def api_search_articles():
+    """全文检索已分类的文章API，可按大类、小类和发布日期范围筛选"""
+    try:
+        app_config = load_app_config()
+        classification_folder = request.args.get('classification_folder') or app_config.get('classification_folder')
+        if not app_config.get('enable_search_index', True) or not classification_folder:
+            return jsonify({'success': False, 'error': '全文检索索引未启用'})
+        page = max(1, int(request.args.get('page', 1)))
+        size = min(max(1, int(request.args.get('size', 20))), 100)
+        
+        started = time.perf_counter()
+        result = get_search_index(classification_folder).search(
+            request.args.get('q', ''),
+            category=request.args.get('category') or None,
+            label=request.args.get('label') or None,
+            date_from=request.args.get('date_from') or None,
+            date_to=request.args.get('date_to') or None,
+            limit=size,
+            offset=(page - 1) * size
+        )
+        return jsonify({
+            'success': True,
+            'total': result['total'],
+            'total_capped': result['total_capped'],
+            'ranked': result['ranked'],
+            'page': page,
+            'size': size,
+            'results': result['results'],
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'检索失败: {str(e)}'
+        })
+
 @app.route('/api/start_download_only', methods=['POST'])
 def api_start_download_only():
     """开始只下载不分类任务API"""
@@ -182,6 +283,16 @@ def api_start_download_only():
         account = data.get('account')
         token = data.get('token')
         output_folder = data.get('output_folder')
+        trace_options = get_trace_options(data)
+        # 大于0时为抽样试运行：只处理抽取的文章并估算总耗时
+        sample_size = int(data.get('sample_size') or 0)
+        try:
+            window = PublishWindow(data.get('start_date'), data.get('end_date'))
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            })
         
         if not account:
             return jsonify({
@@ -211,18 +322,28 @@ def api_start_download_only():
             'total_batches': 0,
             'classification_count': 0,
             'logs': [],
-            'selected_account': account
+            'selected_account': account,
+            'outcomes': {},
+            'throughput': None,
+            'estimate': None
         })
         
         # 在后台线程中执行只下载任务
         global current_download_thread
-        download_thread = threading.Thread(
-            target=download_only_task_worker, 
-            args=(account, token, output_folder)
-        )
-        download_thread.daemon = True
+        if sample_size > 0:
+            download_thread = socketio.start_background_task(
+                estimate_task_worker, 'download', account, token, output_folder, sample_size, window
+            )
+        elif load_app_config().get('use_work_queue', False):
+            # 工作队列模式：本进程只写入队列和汇总结果，文章由 Worker.py 进程处理
+            download_thread = socketio.start_background_task(
+                queue_task_worker, 'download', account, token, output_folder, None, None, trace_options, window
+            )
+        else:
+            download_thread = socketio.start_background_task(
+                download_only_task_worker, account, token, output_folder, trace_options, window
+            )
         current_download_thread = download_thread
-        download_thread.start()
         
         return jsonify({
             'success': True, 
@@ -260,6 +381,17 @@ def api_start_download():
         output_folder = data.get('output_folder')
         classification_folder = data.get('classification_folder')
         category_name = data.get('category_name')
+        trace_options = get_trace_options(data)
+        # 大于0时为抽样试运行：只处理抽取的文章并估算总耗时，不写入分类结果
+        sample_size = int(data.get('sample_size') or 0)
+        # 发布时间范围（YYYY-MM-DD，可只指定一端），范围外的文章不下载、不分类
+        try:
+            window = PublishWindow(data.get('start_date'), data.get('end_date'))
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            })
         
         if not account:
             return jsonify({
@@ -295,18 +427,27 @@ def api_start_download():
             'total_batches': 0,
             'classification_count': 0,
             'logs': [],
-            'selected_account': account
+            'selected_account': account,
+            'outcomes': {},
+            'throughput': None,
+            'estimate': None
         })
         
         # 在后台线程中执行下载任务
         global current_download_thread
-        download_thread = threading.Thread(
-            target=download_task_worker, 
-            args=(account, token, output_folder, classification_folder, category_name)
-        )
-        download_thread.daemon = True
+        if sample_size > 0:
+            download_thread = socketio.start_background_task(
+                estimate_task_worker, 'classify', account, token, output_folder, sample_size, window
+            )
+        elif load_app_config().get('use_work_queue', False):
+            download_thread = socketio.start_background_task(
+                queue_task_worker, 'classify', account, token, output_folder, classification_folder, category_name, trace_options, window
+            )
+        else:
+            download_thread = socketio.start_background_task(
+                download_task_worker, account, token, output_folder, classification_folder, category_name, trace_options, window
+            )
         current_download_thread = download_thread
-        download_thread.start()
         
         return jsonify({
             'success': True, 
@@ -321,6 +462,70 @@ def api_start_download():
             'error': f'启动失败: {str(e)}'
         })
 
+@app.route('/api/start_reclassify', methods=['POST'])
+def api_start_reclassify():
+    """开始离线重新分类任务API"""
+    try:
+        if task_status['running']:
+            return jsonify({
+                'success': False, 
+                'error': '已有任务正在运行中'
+            })
+        
+        data = request.get_json()
+        classification_folder = data.get('classification_folder')
+        category_name = data.get('category_name')
+        concurrency = int(data.get('concurrency', 4))
+        dry_run = parse_flag(data.get('dry_run', False))
+        include_raw_store = parse_flag(data.get('include_raw_store', False))
+        raw_store_root = data.get('raw_store_folder')
+        if not raw_store_root and data.get('output_folder'):
+            from RawStore import STORE_FOLDER_NAME
+            raw_store_root = os.path.join(data['output_folder'], STORE_FOLDER_NAME)
+        
+        if not classification_folder:
+            return jsonify({
+                'success': False, 
+                'error': '请提供分类结果文件夹路径'
+            })
+        if not category_name:
+            return jsonify({
+                'success': False, 
+                'error': '请提供大类名称'
+            })
+        
+        # 重置任务状态
+        task_status.update({
+            'running': True,
+            'progress': 0,
+            'total_articles': 0,
+            'processed_articles': 0,
+            'current_batch': 0,
+            'total_batches': 0,
+            'classification_count': 0,
+            'logs': [],
+            'selected_account': None
+        })
+        
+        global current_download_thread
+        reclassify_thread = socketio.start_background_task(
+            reclassify_task_worker, classification_folder, category_name, concurrency, dry_run, include_raw_store, raw_store_root
+        )
+        current_download_thread = reclassify_thread
+        
+        return jsonify({
+            'success': True, 
+            'message': '重新分类任务已开始'
+        })
+        
+    except Exception as e:
+        task_status['running'] = False
+        print(f"启动重新分类任务时发生错误: {str(e)}")
+        return jsonify({
+            'success': False, 
+            'error': f'启动失败: {str(e)}'
+        })
+
 @app.route('/api/stop_download', methods=['POST'])
 def api_stop_download():
     """停止下载任务API"""
@@ -334,6 +539,8 @@ def api_stop_download():
     
     task_status['running'] = False
     current_download_thread = None
+    if current_async_downloader is not None:
+        current_async_downloader.cancel()
     print("用户请求停止下载任务")
     
     return jsonify({
@@ -395,10 +602,37 @@ def api_save_ollama_config():
                 'error': '最小字符阈值不能小于0'
             })
         
-        # 保存配置到文件
+        # 验证多后端配置（如果存在）
+        if 'backends' in data:
+            if not isinstance(data['backends'], list):
+                return jsonify({
+                    'success': False, 
+                    'error': 'backends必须是数组格式'
+                })
+            for backend in data['backends']:
+                if not isinstance(backend, dict) or not backend.get('url'):
+                    return jsonify({
+                        'success': False, 
+                        'error': 'backends格式错误，每项必须包含url字段'
+                    })
+                if float(backend.get('weight', 1)) <= 0:
+                    return jsonify({
+                        'success': False, 
+                        'error': '后端权重必须大于0'
+                    })
+        
+        # 保存配置到文件（保留页面上没有的配置项，例如 backends）
         config_file = os.path.join(os.path.dirname(__file__), 'config', 'ollama_config.json')
+        existing_config = {}
+        if os.path.exists(config_file):
+            try:
+                with open(config_file, 'r', encoding='utf-8') as f:
+                    existing_config = json.load(f)
+            except Exception as e:
+                print(f"读取原有Ollama配置失败: {e}")
+        existing_config.update(data)
         with open(config_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+            json.dump(existing_config, f, ensure_ascii=False, indent=2)
         
         print(f"Ollama配置已保存: {config_file}")
         
@@ -657,10 +891,22 @@ def api_save_app_config():
                         'error': f'启用分类功能时缺少必需的配置项: {field}'
                     })
         
-        # 保存配置到文件
+        # token 变化时清空公众号搜索缓存
+        if data.get('api_token') != load_app_config().get('api_token'):
+            get_search_cache().invalidate()
+        
+        # 保存配置到文件（保留页面上没有的配置项，例如 placement_mode、use_work_queue、web_host）
         config_file = os.path.join(os.path.dirname(__file__), 'config', 'app_config.json')
+        existing_config = {}
+        if os.path.exists(config_file):
+            try:
+                with open(config_file, 'r', encoding='utf-8') as f:
+                    existing_config = json.load(f)
+            except Exception as e:
+                print(f"读取原有应用基础配置失败: {e}")
+        existing_config.update(data)
         with open(config_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+            json.dump(existing_config, f, ensure_ascii=False, indent=2)
         
         print(f"应用基础配置已保存: {config_file}")
         
@@ -757,7 +1003,95 @@ def api_get_default_prompt_config():
 @app.route('/api/status')
 def api_get_status():
     """获取任务状态API"""
-    return jsonify(task_status)
+    status = dict(task_status)
+    try:
+        import Classification
+        status['ollama_backends'] = Classification.BACKEND_POOL.get_stats()
+    except Exception:
+        status['ollama_backends'] = []
+    status['circuit_breakers'] = get_breaker_stats()
+    if task_status['running'] and current_estimator is not None:
+        status['throughput'] = update_throughput()
+    return jsonify(status)
+
+# --- 响应延迟探测 ---
+# 后台任务每隔固定时间休眠一次，实际醒来比预期晚的时间就是事件循环（threading 模式下为GIL和线程调度）被占用的时间。
+# /api/ping 返回服务器时间和最近一分钟的延迟，前端或脚本据此确认任务运行期间界面响应仍在100毫秒以内。
+LAG_PROBE_INTERVAL = 0.5
+loop_lag_samples = deque(maxlen=120)
+_loop_lag_lock = threading.Lock()
+_loop_lag_started = False
+
+def loop_lag_probe():
+    while True:
+        started = time.perf_counter()
+        socketio.sleep(LAG_PROBE_INTERVAL)
+        loop_lag_samples.append(max(0.0, (time.perf_counter() - started - LAG_PROBE_INTERVAL) * 1000))
+
+def ensure_loop_lag_probe():
+    """第一次调用时启动延迟探测后台任务"""
+    global _loop_lag_started
+    with _loop_lag_lock:
+        if not _loop_lag_started:
+            _loop_lag_started = True
+            socketio.start_background_task(loop_lag_probe)
+
+def get_loop_lag_stats():
+    samples = sorted(loop_lag_samples)
+    if not samples:
+        return {'samples': 0, 'last_ms': None, 'p95_ms': None, 'max_ms': None}
+    return {
+        'samples': len(samples),
+        'last_ms': round(loop_lag_samples[-1], 1),
+        'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 1),
+        'max_ms': round(samples[-1], 1)
+    }
+
+@app.route('/api/ping')
+def api_ping():
+    """响应延迟探测API：返回服务器时间和最近一分钟的事件循环延迟，客户端据此计算往返耗时"""
+    ensure_loop_lag_probe()
+    return jsonify({
+        'success': True,
+        'server_time': time.time(),
+        'client_time': request.args.get('client_time', type=float),
+        'async_mode': socketio.async_mode,
+        'task_running': task_status['running'],
+        'loop_lag': get_loop_lag_stats()
+    })
+
+@app.route('/api/work_queue')
+def api_get_work_queue():
+    """获取工作队列中最近任务的进度和处理进程API"""
+    try:
+        queue_path = get_queue_path(request.args.get('output_folder') or load_app_config().get('output_folder'))
+        if not os.path.exists(queue_path):
+            return jsonify({'success': True, 'path': queue_path, 'jobs': []})
+        return jsonify({
+            'success': True,
+            'path': queue_path,
+            'jobs': get_work_queue(queue_path).recent_jobs()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'获取工作队列状态失败: {str(e)}'
+        })
+
+@app.route('/api/ollama_backends')
+def api_get_ollama_backends():
+    """获取各Ollama后端的状态、吞吐量和延迟API"""
+    try:
+        import Classification
+        return jsonify({
+            'success': True,
+            'backends': Classification.BACKEND_POOL.get_stats()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'获取后端状态失败: {str(e)}'
+        })
 
 @app.route('/api/clear_logs', methods=['POST'])
 def api_clear_logs():
@@ -775,9 +1109,15 @@ def api_clear_logs():
             'error': f'清空日志失败: {str(e)}'
         })
 
-def download_task_worker(account, token, output_folder, classification_folder, category_name=None):
-    """下载任务工作线程"""
+def download_task_worker(account, token, output_folder, classification_folder, category_name=None, trace_options=None,
+                         window=None):
+    """下载任务工作线程，window 为发布时间范围（PublishWindow），范围外的文章不下载、不分类"""
+    window = window or PublishWindow()
     try:
+        start_task_trace(account, output_folder, trace_options)
+        reset_placement_stats()
+        reset_llm_stats()
+        start_throughput_estimate(direct_seconds_per_article())
         print(f"开始处理公众号: {account['nickname']}")
         print(f"使用Token: {token[:20]}...")
         print(f"下载文件路径: {output_folder}")
@@ -794,14 +1134,29 @@ def download_task_worker(account, token, output_folder, classification_folder, c
         all_classification_records = []
         begin = 0
         batch_size = 20
+        # 文章列表优先读取本地缓存，只向接口获取新发布的文章
+        article_source = create_article_source(account["fakeid"], token, output_directory, task_status, window)
+        if window:
+            print(f"只处理发布时间在 {window} 的文章")
         
         while task_status['running']:
             # 获取当前批次的文章列表
-            articles = get_articles_with_begin(account["fakeid"], begin, batch_size, token)
-            if not articles:
+            page = article_source.get_page(begin, batch_size)
+            if not page:
                 print(f"第 {begin//batch_size + 1} 批次未获取到文章，下载完成")
                 break
             
+            # 发布时间范围外的文章在下载和分类之前跳过；页中最早一篇已早于范围起点时不再翻页
+            articles, past_window = window.split(page)
+            if len(articles) < len(page):
+                print(f"跳过发布时间范围（{window}）外的 {len(page) - len(articles)} 篇文章")
+            if not articles:
+                if past_window or len(page) < batch_size:
+                    print("已到达发布时间范围的起点，下载完成" if past_window else "已下载完所有文章")
+                    break
+                begin += batch_size
+                continue
+            
             # 更新状态
             task_status['current_batch'] = begin//batch_size + 1
             task_status['total_articles'] += len(articles)
@@ -834,28 +1189,42 @@ def download_task_worker(account, token, output_folder, classification_folder, c
                 print(f"第 {task_status['current_batch']} 批次：没有相关文章需要保存")
             
             # 发送统计更新
+            throughput = update_throughput(article_source)
+            print(format_throughput(throughput))
             socketio.emit('stats_update', {
                 'total_articles': task_status['total_articles'],
                 'processed_articles': task_status['processed_articles'],
-                'classification_count': task_status['classification_count']
+                'classification_count': task_status['classification_count'],
+                'throughput': throughput
             })
             
             # 如果获取的文章数少于batch_size，说明已经是最后一批
-            if len(articles) < batch_size:
-                print("已下载完所有文章")
+            if len(page) < batch_size or past_window:
+                print(f"已到达发布时间范围的起点（{window.start_date}），停止翻页" if past_window else "已下载完所有文章")
                 break
             
             # 准备下一批次
             begin += batch_size
             if task_status['running']:
                 print(f"\n第 {task_status['current_batch']} 批次完成，等待20秒后继续...")
-                time.sleep(20)
+                socketio.sleep(20)
         
         if task_status['running']:
             print(f"\n所有批次处理完成！")
             print(f"总计成功分类并保存 {len(all_classification_records)} 篇相关文章")
+            placement = get_placement_stats()
+            task_status['placement'] = placement
+            print(f"文件放置: 硬链接 {placement['linked']} 篇，移动 {placement['moved']} 篇，复制 {placement['copied']} 篇，写入 {placement['bytes_written']} 字节")
+            llm = get_llm_stats()
+            task_status['llm'] = llm
+            print(f"大模型调用 {llm['calls']} 次，提前结束 {llm['early_stops']} 次，平均决策耗时 {llm['avg_decision_seconds']} 秒，平均生成耗时 {llm['avg_generation_seconds']} 秒，平均提示词 {llm['avg_prompt_tokens']} tokens，num_ctx {llm['num_ctx']}，摘要共节省 {llm['summary_tokens_saved']} tokens")
+            cascade = llm['cascade']
+            if cascade['screened']:
+                print(f"标题初筛 {cascade['screened']} 篇，直接判为无关 {cascade['rejected']} 篇，交给主模型 {cascade['escalated']} 篇，估算节省 {cascade['estimated_saved_seconds']} 秒（提速 {cascade['estimated_speedup']} 倍）")
             socketio.emit('task_completed', {
-                'total_classified': len(all_classification_records)
+                'total_classified': len(all_classification_records),
+                'placement': placement,
+                'llm': llm
             })
         else:
             print("\n任务已被用户停止")
@@ -865,13 +1234,18 @@ def download_task_worker(account, token, output_folder, classification_folder, c
         print(f"下载任务执行过程中发生错误: {str(e)}")
         socketio.emit('task_error', {'error': str(e)})
     finally:
-        global current_download_thread
+        global current_download_thread, current_estimator
+        finish_job_trace()
+        current_estimator = None
         task_status['running'] = False
         current_download_thread = None
 
-def download_only_task_worker(account, token, output_folder):
-    """只下载不分类任务工作线程"""
+def download_only_task_worker(account, token, output_folder, trace_options=None, window=None):
+    """只下载不分类任务工作线程，window 为发布时间范围（PublishWindow），范围外的文章不下载"""
+    window = window or PublishWindow()
     try:
+        start_task_trace(account, output_folder, trace_options)
+        start_throughput_estimate(direct_seconds_per_article())
         print(f"开始处理公众号: {account['nickname']}")
         print(f"使用Token: {token[:20]}...")
         print(f"下载文件路径: {output_folder}")
@@ -886,14 +1260,36 @@ def download_only_task_worker(account, token, output_folder):
         print("\n开始批量下载文章...")
         begin = 0
         batch_size = 20
+        article_source = create_article_source(account["fakeid"], token, output_directory, task_status, window)
+        if window:
+            print(f"只下载发布时间在 {window} 的文章")
+        
+        # 启用异步下载时，整个任务共用一个下载器（速率预算跨批次保持）
+        global current_async_downloader
+        app_config = load_app_config()
+        if app_config.get('async_download', True):
+            from AsyncDownload import create_async_downloader
+            current_async_downloader = create_async_downloader(output_directory, token, task_status, app_config)
+            print("使用异步下载引擎")
         
         while task_status['running']:
             # 获取当前批次的文章列表
-            articles = get_articles_with_begin(account["fakeid"], begin, batch_size, token)
-            if not articles:
+            page = article_source.get_page(begin, batch_size)
+            if not page:
                 print(f"第 {begin//batch_size + 1} 批次未获取到文章，下载完成")
                 break
             
+            # 发布时间范围外的文章在下载和分类之前跳过；页中最早一篇已早于范围起点时不再翻页
+            articles, past_window = window.split(page)
+            if len(articles) < len(page):
+                print(f"跳过发布时间范围（{window}）外的 {len(page) - len(articles)} 篇文章")
+            if not articles:
+                if past_window or len(page) < batch_size:
+                    print("已到达发布时间范围的起点，下载完成" if past_window else "已下载完所有文章")
+                    break
+                begin += batch_size
+                continue
+            
             # 更新状态
             task_status['current_batch'] = begin//batch_size + 1
             task_status['total_articles'] += len(articles)
@@ -908,30 +1304,36 @@ def download_only_task_worker(account, token, output_folder):
             })
             
             # 只下载当前批次的文章，不进行分类
-            from WeChat import download_articles_only
-            download_articles_only(articles, output_directory, batch_size, task_status, token)
+            if current_async_downloader is not None:
+                current_async_downloader.run(articles)
+            else:
+                from WeChat import download_articles_only
+                download_articles_only(articles, output_directory, batch_size, task_status, token)
             
             # 如果任务被停止，退出循环
             if not task_status['running']:
                 break
             
             # 发送统计更新
+            throughput = update_throughput(article_source)
+            print(format_throughput(throughput))
             socketio.emit('stats_update', {
                 'total_articles': task_status['total_articles'],
                 'processed_articles': task_status['processed_articles'],
-                'classification_count': 0  # 不分类时为0
+                'classification_count': 0,  # 不分类时为0
+                'throughput': throughput
             })
             
             # 如果获取的文章数少于batch_size，说明已经是最后一批
-            if len(articles) < batch_size:
-                print("已下载完所有文章")
+            if len(page) < batch_size or past_window:
+                print(f"已到达发布时间范围的起点（{window.start_date}），停止翻页" if past_window else "已下载完所有文章")
                 break
             
-            # 准备下一批次
+            # 准备下一批次；异步下载由速率预算控制请求节奏，不再固定暂停
             begin += batch_size
-            if task_status['running']:
+            if task_status['running'] and current_async_downloader is None:
                 print(f"\n第 {task_status['current_batch']} 批次完成，等待20秒后继续...")
-                time.sleep(20)
+                socketio.sleep(20)
         
         if task_status['running']:
             print(f"\n所有批次处理完成！")
@@ -946,6 +1348,215 @@ def download_only_task_worker(account, token, output_folder):
     except Exception as e:
         print(f"只下载任务执行过程中发生错误: {str(e)}")
         socketio.emit('task_error', {'error': str(e)})
+    finally:
+        global current_download_thread, current_estimator
+        finish_job_trace()
+        current_estimator = None
+        current_async_downloader = None
+        task_status['running'] = False
+        current_download_thread = None
+
+def start_local_workers(queue_path, job_id, count, token):
+    """
+    启动本机的处理进程（处理完该任务后自动退出），其输出转发到任务日志；
+    Token 通过环境变量传给处理进程，不写入共享的队列文件
+    """
+    from Worker import TOKEN_ENV_VAR
+    if count <= 0:
+        print("未启动本机处理进程，等待其他处理进程领取任务")
+        return None
+    worker_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Worker.py')
+    process = subprocess.Popen(
+        [sys.executable, '-u', worker_script, '--queue', queue_path, '--job', job_id,
+         '--exit-when-idle', '--processes', str(count)],
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        text=True, encoding='utf-8', errors='replace',
+        env=dict(os.environ, PYTHONIOENCODING='utf-8', **{TOKEN_ENV_VAR: token})
+    )
+
+    def relay_output():
+        for line in process.stdout:
+            print(f"[处理进程] {line.rstrip()}")
+
+    socketio.start_background_task(relay_output)
+    print(f"已启动 {count} 个本机处理进程")
+    return process
+
+def queue_task_worker(mode, account, token, output_folder, classification_folder=None, category_name=None, trace_options=None,
+                      window=None):
+    """
+    工作队列模式的任务线程：获取文章列表写入队列（生产者），汇总处理结果并写入资料汇总表（监控者）
+    window 为发布时间范围（PublishWindow），范围外的文章不加入队列
+    """
+    window = window or PublishWindow()
+    work_queue = None
+    job_id = None
+    try:
+        start_task_trace(account, output_folder, trace_options)
+        start_throughput_estimate(queue_seconds_per_article())
+        app_config = load_app_config()
+        print(f"开始处理公众号: {account['nickname']}（工作队列模式）")
+        print(f"使用Token: {token[:20]}...")
+        print(f"下载文件路径: {output_folder}")
+        
+        output_directory = os.path.join(output_folder, account["nickname"].strip())
+        if not os.path.exists(output_directory):
+            os.makedirs(output_directory)
+            print(f"创建目录: {output_directory}")
+        
+        queue_path = get_queue_path(output_folder)
+        work_queue = get_work_queue(queue_path)
+        job_id = work_queue.create_job(mode, {
+            'account': account['nickname'],
+            # 保存相对于队列文件夹的路径，其他电脑上的处理进程按自己的挂载路径还原
+            'output_dir': work_queue.portable_path(output_directory),
+            'classification_folder': work_queue.portable_path(classification_folder),
+            'category_name': category_name,
+            'start_date': window.start_date,
+            'end_date': window.end_date
+        })
+        print(f"任务 {job_id} 已创建，队列: {queue_path}")
+        start_local_workers(queue_path, job_id, int(app_config.get('work_queue_local_workers', 2)), token)
+        
+        all_classification_records = []
+        status_counts = {}
+        begin = 0
+        batch_size = 20
+        producing = True
+        last_report = time.time()
+        article_source = create_article_source(account["fakeid"], token, output_directory, task_status, window)
+        if window:
+            print(f"只处理发布时间在 {window} 的文章")
+        
+        while task_status['running']:
+            if producing:
+                page = article_source.get_page(begin, batch_size)
+                # 发布时间范围外的文章不加入队列；页中最早一篇已早于范围起点时不再翻页
+                articles, past_window = window.split(page or [])
+                if page:
+                    added = work_queue.enqueue(job_id, articles) if articles else 0
+                    task_status['current_batch'] = begin//batch_size + 1
+                    task_status['total_articles'] += added
+                    if added:
+                        print(f"第 {task_status['current_batch']} 批次：{added} 篇文章已加入队列")
+                    begin += batch_size
+                if not page or len(page) < batch_size or past_window:
+                    producing = False
+                    work_queue.set_job_state(job_id, 'running')
+                    print(f"文章列表已全部加入队列（共 {task_status['total_articles']} 篇），等待处理进程完成")
+            
+            # 汇总已完成的文章，资料汇总表只由本进程写入
+            results = work_queue.collect_results(job_id)
+            for result in results:
+                status_counts[result.get('status')] = status_counts.get(result.get('status'), 0) + 1
+            records = [result['record'] for result in results if result.get('record')]
+            if records:
+                save_classification_results(records, classification_folder, category_name)
+                all_classification_records.extend(records)
+                task_status['classification_count'] += len(records)
+            
+            stats = work_queue.job_stats(job_id)
+            task_status['work_queue'] = stats
+            task_status['processed_articles'] = stats['done'] + stats['failed']
+            task_status['outcomes'] = dict(status_counts, failed=stats['failed'])
+            if stats['total']:
+                task_status['progress'] = int(task_status['processed_articles'] / stats['total'] * 100)
+            socketio.emit('stats_update', {
+                'total_articles': task_status['total_articles'],
+                'processed_articles': task_status['processed_articles'],
+                'classification_count': task_status['classification_count'],
+                'throughput': update_throughput(article_source)
+            })
+            # 每分钟在日志中报告一次速度和剩余时间
+            if time.time() - last_report >= 60:
+                print(format_throughput(task_status['throughput']))
+                last_report = time.time()
+            
+            if not producing:
+                if stats['queued'] + stats['leased'] == 0:
+                    break
+                socketio.sleep(2)
+        
+        if task_status['running']:
+            work_queue.set_job_state(job_id, 'finished')
+            stats = work_queue.job_stats(job_id)
+            print(f"\n所有文章处理完成！成功 {stats['done']} 篇，失败 {stats['failed']} 篇")
+            print("处理结果: " + "，".join(f"{status} {count} 篇" for status, count in status_counts.items()))
+            if mode == 'classify':
+                print(f"总计成功分类并保存 {len(all_classification_records)} 篇相关文章")
+            socketio.emit('task_completed', {
+                'total_classified': len(all_classification_records),
+                'work_queue': stats
+            })
+        else:
+            # 未处理的文章不再被领取，处理中的文章由处理进程完成后退出
+            work_queue.set_job_state(job_id, 'cancelled')
+            print("\n任务已被用户停止")
+            socketio.emit('task_stopped', {})
+            
+    except Exception as e:
+        if work_queue is not None and job_id is not None:
+            work_queue.set_job_state(job_id, 'cancelled')
+        print(f"工作队列任务执行过程中发生错误: {str(e)}")
+        socketio.emit('task_error', {'error': str(e)})
+    finally:
+        global current_download_thread, current_estimator
+        finish_job_trace()
+        current_estimator = None
+        task_status['running'] = False
+        current_download_thread = None
+
+def estimate_task_worker(mode, account, token, output_folder, sample_size, window=None):
+    """抽样试运行任务线程：抽取 sample_size 篇文章走完整流程，估算全部文章（或发布时间范围内）的处理时间和无关比例"""
+    try:
+        print(f"开始抽样试运行: {account['nickname']}（{sample_size} 篇，{'下载并分类' if mode == 'classify' else '只下载'}）")
+        output_directory = os.path.join(output_folder, account["nickname"].strip())
+        estimate = sample_pipeline(account, token, output_directory, sample_size, mode, task_status, window)
+        task_status['estimate'] = estimate
+        print("\n" + format_estimate(estimate))
+        
+        if task_status['running']:
+            socketio.emit('estimate_completed', estimate)
+            socketio.emit('task_completed', {
+                'total_classified': 0,
+                'estimate': estimate
+            })
+        else:
+            socketio.emit('task_stopped', {})
+            
+    except Exception as e:
+        print(f"抽样试运行过程中发生错误: {str(e)}")
+        socketio.emit('task_error', {'error': str(e)})
+    finally:
+        global current_download_thread
+        task_status['running'] = False
+        current_download_thread = None
+
+def reclassify_task_worker(classification_folder, category_name, concurrency, dry_run, include_raw_store, raw_store_root):
+    """离线重新分类任务工作线程"""
+    try:
+        from Reclassify import reclassify_corpus
+        report = reclassify_corpus(
+            classification_folder, category_name,
+            concurrency=concurrency, dry_run=dry_run,
+            include_raw_store=include_raw_store, raw_store_root=raw_store_root,
+            task_status=task_status
+        )
+        task_status['total_articles'] = report['total']
+        task_status['classification_count'] = report['changed'] + report['added']
+        
+        if task_status['running']:
+            socketio.emit('reclassify_completed', report)
+            socketio.emit('task_completed', {
+                'total_classified': report['changed'] + report['added']
+            })
+        else:
+            print("\n任务已被用户停止")
+            socketio.emit('task_stopped', {})
+            
+    except Exception as e:
+        print(f"重新分类任务执行过程中发生错误: {str(e)}")
+        socketio.emit('task_error', {'error': str(e)})
     finally:
         global current_download_thread
         task_status['running'] = False
@@ -960,12 +1571,37 @@ def handle_connect():
 def handle_disconnect():
     print('客户端已断开连接')
 
+@socketio.on('latency_probe')
+def handle_latency_probe(data=None):
+    """通过Socket.IO测量往返耗时：客户端发送时带回调，服务器原样返回client_time并附上服务器时间"""
+    ensure_loop_lag_probe()
+    return {
+        'client_time': (data or {}).get('client_time'),
+        'server_time': time.time(),
+        'loop_lag': get_loop_lag_stats()
+    }
+
 if __name__ == '__main__':
+    web_logger = WebLogger()
+    sys.stdout = web_logger
+    
     # 创建templates目录
     templates_dir = os.path.join(os.path.dirname(__file__), 'templates')
     if not os.path.exists(templates_dir):
         os.makedirs(templates_dir)
     
+    app_config = load_app_config()
+    host = app_config.get('web_host', '127.0.0.1')
+    port = int(app_config.get('web_port', 5000))
+    debug = bool(app_config.get('web_debug', False))
+    if debug and host not in ('127.0.0.1', 'localhost', '::1'):
+        print(f"警告: 调试模式的交互式调试器可执行任意代码，监听 {host} 时已关闭调试模式")
+        debug = False
+    
     print("WeChat文章下载器Web版启动中...")
-    print("访问地址: http://localhost:5000")
-    socketio.run(app, debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    print(f"访问地址: http://localhost:{port}（监听 {host}）")
+    print(f"Socket.IO 异步模式: {socketio.async_mode}")
+    ensure_loop_lag_probe()
+    # threading 模式使用 Werkzeug 服务器；不启用自动重载，否则应用被导入两次，
+    # 延迟探测和后台任务也会各启动两份
+    socketio.run(app, host=host, port=port, debug=debug, use_reloader=False, allow_unsafe_werkzeug=True)
\ No newline at end of file
@@ -0,0 +1,351 @@
+# -*- coding: utf-8 -*-
+"""
+无界面批量运行入口，适用于定时任务和批量同步。
+
+示例:
+    python src/cli.py --account 零售案例 --account 超市周刊 --mode classify \
+        --output-folder D:\\智能分类\\原文章 --classification-folder D:\\智能分类 --concurrency 2
+
+    # 只处理最近一年发布的文章，翻页到更早的文章即停止
+    python src/cli.py --account 零售案例 --start-date 2025-10-01
+
+    # 抽样试运行：每个公众号抽取30篇走完整流程，估算全部处理完所需的时间和无关比例（不写入分类结果）
+    python src/cli.py --account 零售案例 --mode classify --sample 30
+
+运行结束后在标准输出的最后一行打印JSON格式的汇总（也可用 --summary-file 写入文件），
+全部公众号处理成功时退出码为0，否则为1，参数错误时为2。
+"""
+
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+sys.path.append(os.path.dirname(__file__))
+
+from Config import load_app_config
+from Tracing import start_job_trace, finish_job_trace
+from Throughput import ThroughputEstimator, format_throughput, format_estimate, direct_seconds_per_article
+
+MODES = ("download", "classify", "reclassify")
+
+# 所有公众号任务共享的停止标志，收到 Ctrl+C / SIGTERM 时置位
+_stop_event = threading.Event()
+
+
+def parse_args(argv=None):
+    """解析命令行参数，未指定的路径和token从 app_config.json 读取"""
+    app_config = load_app_config()
+
+    parser = argparse.ArgumentParser(description="微信公众号文章批量下载/分类（无界面模式）")
+    parser.add_argument("--account", action="append", default=[],
+                        help="公众号名称，可重复指定；按名称搜索并选择第一个匹配结果")
+    parser.add_argument("--fakeid", action="append", default=[],
+                        help="公众号fakeid，可重复指定；格式 fakeid 或 fakeid:名称")
+    parser.add_argument("--accounts-file",
+                        help="公众号列表文件，每行一个名称，或 fakeid:名称")
+    parser.add_argument("--mode", choices=MODES, default="classify",
+                        help="download: 只下载; classify: 下载并分类; reclassify: 对分类结果文件夹中已保存的文章离线重新分类")
+    parser.add_argument("--token", default=app_config.get("api_token"),
+                        help="wechat-article-exporter 的 API Token")
+    parser.add_argument("--output-folder", default=app_config.get("output_folder"),
+                        help="下载文件夹")
+    parser.add_argument("--classification-folder", default=app_config.get("classification_folder"),
+                        help="分类结果文件夹")
+    parser.add_argument("--category-name", default=app_config.get("category_name"),
+                        help="大类名称")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="同时处理的公众号数量；reclassify模式下为同时分类的文章数量")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="reclassify模式下只报告分类变化，不移动文件、不修改资料汇总表")
+    parser.add_argument("--include-raw-store", action="store_true",
+                        help="reclassify模式下把原始HTML存储中未入库的文章也重新分类")
+    parser.add_argument("--start-date",
+                        help="只处理该日期（YYYY-MM-DD，含）之后发布的文章，翻页到更早的文章即停止")
+    parser.add_argument("--end-date",
+                        help="只处理该日期（YYYY-MM-DD，含）之前发布的文章")
+    parser.add_argument("--sample", type=int, default=0,
+                        help="抽样试运行：每个公众号抽取N篇文章走完整流程，估算总耗时和无关比例，不写入分类结果")
+    parser.add_argument("--summary-file",
+                        help="将JSON汇总额外写入该文件")
+    parser.add_argument("--trace", action="store_true",
+                        help="记录任务追踪（每个公众号一个追踪文件）")
+    parser.add_argument("--trace-format", choices=("chrome", "jsonl"), default=app_config.get("trace_format", "chrome"))
+    parser.add_argument("--profile", action="store_true",
+                        help="用cProfile包裹每个公众号任务")
+    return parser.parse_args(argv)
+
+
+def read_accounts_file(path):
+    """读取公众号列表文件，返回 (名称列表, fakeid列表)"""
+    names, fakeids = [], []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if ":" in line:
+                fakeids.append(line)
+            else:
+                names.append(line)
+    return names, fakeids
+
+
+def resolve_accounts(names, fakeids, token):
+    """
+    将名称和fakeid解析为账号字典列表
+    返回 (accounts, errors)
+    """
+    accounts = []
+    errors = []
+
+    for entry in fakeids:
+        fakeid, _, nickname = entry.partition(":")
+        fakeid = fakeid.strip()
+        nickname = nickname.strip() or fakeid
+        accounts.append({"fakeid": fakeid, "nickname": nickname})
+
+    if names:
+        from WeChat import search_accounts
+
+    for name in names:
+        found = search_accounts(name, token)
+        if not found:
+            errors.append({"account": name, "error": "未找到匹配的公众号"})
+            continue
+        exact = [a for a in found if a.get("nickname", "").strip() == name]
+        accounts.append((exact or found)[0])
+
+    return accounts, errors
+
+
+def wait_or_stop(seconds):
+    """等待指定秒数，收到停止信号时立即返回True"""
+    return _stop_event.wait(seconds)
+
+
+def run_account(account, args):
+    """处理单个公众号，返回该公众号的结果汇总"""
+    nickname = account["nickname"].strip()
+    started = time.time()
+    task_status = {"running": True, "progress": 0, "processed_articles": 0}
+    result = {
+        "account": nickname,
+        "fakeid": account.get("fakeid", ""),
+        "mode": args.mode,
+        "status": "ok",
+        "total_articles": 0,
+        "processed_articles": 0,
+        "classified_articles": 0,
+        "batches": 0,
+    }
+
+    # 停止信号传递给各批次函数
+    def watch_stop():
+        _stop_event.wait()
+        task_status["running"] = False
+    threading.Thread(target=watch_stop, daemon=True).start()
+
+    article_source = None
+    if args.trace or args.profile:
+        start_job_trace(nickname, os.path.join(args.output_folder, "_traces"), args.trace_format, args.profile)
+
+    try:
+        output_directory = os.path.join(args.output_folder, nickname)
+        os.makedirs(output_directory, exist_ok=True)
+
+        if args.sample > 0:
+            from Throughput import sample_pipeline
+            estimate = sample_pipeline(account, args.token, output_directory, args.sample, args.mode, task_status,
+                                       args.window)
+            print(f"[{nickname}] " + format_estimate(estimate))
+            result["estimate"] = estimate
+            if not task_status["running"]:
+                result["status"] = "stopped"
+            return result
+
+        from WeChat import download_articles_only, download_and_classify_batch
+        from Classification import save_classification_results
+        from ArticleIndex import create_article_source
+        article_source = create_article_source(account["fakeid"], args.token, output_directory, task_status, args.window)
+        estimator = ThroughputEstimator(direct_seconds_per_article())
+
+        begin = 0
+        batch_size = 20
+        while task_status["running"]:
+            page = article_source.get_page(begin, batch_size)
+            if not page:
+                break
+            # 发布时间范围外的文章在下载和分类之前跳过；页中最早一篇已早于范围起点时不再翻页
+            articles, past_window = args.window.split(page)
+            if not articles:
+                if past_window or len(page) < batch_size:
+                    break
+                begin += batch_size
+                continue
+
+            result["batches"] += 1
+            result["total_articles"] += len(articles)
+
+            if args.mode == "download":
+                download_articles_only(articles, output_directory, batch_size, task_status, args.token)
+            else:
+                records = download_and_classify_batch(articles, output_directory, batch_size, task_status,
+                                                      args.token, args.classification_folder, args.category_name)
+                if records:
+                    save_classification_results(records, args.classification_folder, args.category_name)
+                result["classified_articles"] += len(records)
+
+            estimator.set_total(article_source.known_total())
+            result["throughput"] = estimator.snapshot(task_status["processed_articles"], result["total_articles"],
+                                                      task_status.get("outcomes"))
+            print(f"[{nickname}] " + format_throughput(result["throughput"]))
+
+            if len(page) < batch_size or past_window or not task_status["running"]:
+                break
+
+            begin += batch_size
+            print(f"[{nickname}] 第 {result['batches']} 批次完成，等待20秒后继续...")
+            if wait_or_stop(20):
+                break
+
+        if not task_status["running"]:
+            result["status"] = "stopped"
+
+    except Exception as e:
+        print(f"[{nickname}] 处理过程中发生错误: {e}")
+        result["status"] = "error"
+        result["error"] = str(e)
+    finally:
+        if args.trace or args.profile:
+            finish_job_trace()
+        result["processed_articles"] = task_status.get("processed_articles", 0)
+        if article_source is not None:
+            result["article_list"] = article_source.stats
+        result["elapsed_seconds"] = round(time.time() - started, 1)
+
+    return result
+
+
+def run_reclassify(args):
+    """离线重新分类，返回汇总"""
+    from Reclassify import reclassify_corpus
+    from RawStore import STORE_FOLDER_NAME
+
+    task_status = {"running": True}
+    def watch_stop():
+        _stop_event.wait()
+        task_status["running"] = False
+    threading.Thread(target=watch_stop, daemon=True).start()
+
+    raw_store_root = load_app_config().get("raw_store_folder") or os.path.join(args.output_folder or ".", STORE_FOLDER_NAME)
+    report = reclassify_corpus(
+        args.classification_folder, args.category_name,
+        concurrency=max(1, args.concurrency), dry_run=args.dry_run,
+        include_raw_store=args.include_raw_store, raw_store_root=raw_store_root,
+        task_status=task_status
+    )
+    report["mode"] = args.mode
+    report["status"] = "stopped" if not task_status["running"] else "ok"
+    report["failed_accounts"] = 0
+    return report
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    names = list(args.account)
+    fakeids = list(args.fakeid)
+    if args.accounts_file:
+        file_names, file_fakeids = read_accounts_file(args.accounts_file)
+        names.extend(file_names)
+        fakeids.extend(file_fakeids)
+
+    if args.mode == "reclassify":
+        if not args.classification_folder:
+            print("错误: 重新分类需要分类结果文件夹（--classification-folder）", file=sys.stderr)
+            return 2
+        if not args.category_name:
+            print("错误: 重新分类需要大类名称（--category-name）", file=sys.stderr)
+            return 2
+        signal.signal(signal.SIGINT, lambda signum, frame: _stop_event.set())
+        summary = run_reclassify(args)
+        if args.summary_file:
+            with open(args.summary_file, "w", encoding="utf-8") as f:
+                json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(json.dumps(summary, ensure_ascii=False))
+        return 0 if not summary["errors"] else 1
+
+    if not names and not fakeids:
+        print("错误: 请通过 --account、--fakeid 或 --accounts-file 指定至少一个公众号", file=sys.stderr)
+        return 2
+    if not args.token:
+        print("错误: 缺少API Token（--token 或 app_config.json 中的 api_token）", file=sys.stderr)
+        return 2
+    if not args.output_folder:
+        print("错误: 缺少下载文件夹（--output-folder）", file=sys.stderr)
+        return 2
+    if args.mode != "download" and not args.classification_folder:
+        print("错误: 分类模式需要分类结果文件夹（--classification-folder）", file=sys.stderr)
+        return 2
+    from ArticleIndex import PublishWindow
+    try:
+        args.window = PublishWindow(args.start_date, args.end_date)
+    except ValueError as e:
+        print(f"错误: {e}", file=sys.stderr)
+        return 2
+    if (args.trace or args.profile) and (args.concurrency > 1):
+        print("提示: 任务追踪和cProfile只能同时记录一个公众号，已将并发数调整为1")
+        args.concurrency = 1
+
+    def handle_signal(signum, frame):
+        print("\n收到停止信号，正在结束当前任务...")
+        _stop_event.set()
+    signal.signal(signal.SIGINT, handle_signal)
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, handle_signal)
+
+    started_at = datetime.now()
+    if args.mode == "classify":
+        from Classification import reset_placement_stats, reset_llm_stats
+        reset_placement_stats()
+        reset_llm_stats()
+    accounts, errors = resolve_accounts(names, fakeids, args.token)
+
+    results = [dict(e, status="error") for e in errors]
+    with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as executor:
+        results.extend(executor.map(lambda account: run_account(account, args), accounts))
+
+    summary = {
+        "mode": args.mode,
+        "started_at": started_at.strftime("%Y-%m-%d %H:%M:%S"),
+        "finished_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "accounts": results,
+        "total_articles": sum(r.get("total_articles", 0) for r in results),
+        "processed_articles": sum(r.get("processed_articles", 0) for r in results),
+        "classified_articles": sum(r.get("classified_articles", 0) for r in results),
+        "failed_accounts": sum(1 for r in results if r["status"] != "ok"),
+    }
+    if args.mode == "classify":
+        from Classification import get_placement_stats, get_llm_stats
+        summary["placement"] = get_placement_stats()
+        summary["llm"] = get_llm_stats()
+    from Resilience import get_breaker_stats
+    summary["circuit_breakers"] = get_breaker_stats()
+
+    summary_json = json.dumps(summary, ensure_ascii=False)
+    if args.summary_file:
+        with open(args.summary_file, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+    print(summary_json)
+
+    return 0 if summary["failed_accounts"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
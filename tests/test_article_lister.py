@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+import ArticleLister
+from ArticleLister import ArticleLister as Lister
+
+
+@pytest.fixture(autouse=True)
+def known_page_size(monkeypatch):
+    monkeypatch.setattr(ArticleLister, '_discovered_page_size', 20)
+    monkeypatch.setattr(ArticleLister.time, 'sleep', lambda seconds: None)
+
+
+def make_fetch(total, failing_calls):
+    """共 total 篇文章；第 n 次调用（从1开始）在 failing_calls 中时返回None"""
+    calls = []
+
+    def fetch(fakeid, begin, size, token):
+        calls.append(begin)
+        if len(calls) in failing_calls:
+            return None
+        return [{'title': f'文章{i}', 'create_time': 0} for i in range(begin, min(begin + size, total))]
+
+    return fetch
+
+
+def test_intermittent_failures_do_not_stop_listing():
+    # 每两次失败之间都有成功的一页：失败次数累计超过上限，但从未连续达到上限
+    fetch = make_fetch(100, failing_calls={1, 2, 4, 5, 7, 8})
+    articles, reached_end = Lister(fetch, 'fakeid', concurrency=1).list_from(0)
+    assert reached_end
+    assert len(articles) == 100
+
+
+def test_consecutive_failures_stop_listing():
+    fetch = make_fetch(100, failing_calls={2, 3, 4})
+    articles, reached_end = Lister(fetch, 'fakeid', concurrency=1).list_from(0)
+    assert not reached_end
+    assert len(articles) == 20
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+import os
+import stat
+
+import pytest
+
+import Layout
+
+JAN = 1705000000  # 2024-01
+MAR = 1710000000  # 2024-03
+
+
+@pytest.fixture
+def layout(monkeypatch):
+    """按月份分片、启用清单，每个测试使用独立的清单实例"""
+    config = {'directory_layout': 'month', 'enable_manifest': True}
+    monkeypatch.setattr(Layout, 'load_app_config', lambda: config)
+    monkeypatch.setattr(Layout, '_manifests', {})
+    return config
+
+
+def write_article(folder, filename, publish_time):
+    path = Layout.article_path(folder, filename, publish_time)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('正文')
+    Layout.record_file(path, folder)
+    return path
+
+
+def test_same_title_in_different_months_kept_separately(layout, tmp_path):
+    folder = str(tmp_path / '经营决策类')
+    first = write_article(folder, '同名.md', JAN)
+    second = write_article(folder, '同名.md', MAR)
+
+    assert sorted(Layout.list_article_files(folder)) == sorted([first, second])
+
+    Layout.remove_article_file(first, folder)
+    assert Layout.list_article_files(folder) == [second]
+    assert Layout.find_article(folder, '同名.md') == second
+
+
+def test_manifest_survives_reload(layout, tmp_path):
+    folder = str(tmp_path / '公众号')
+    first = write_article(folder, 'a.md', JAN)
+    second = write_article(folder, 'a.md', MAR)
+    Layout.remove_article_file(first, folder)
+
+    # 新进程（新的清单实例）读取同一个清单文件
+    Layout._manifests.clear()
+    assert Layout.list_article_files(folder) == [second]
+
+
+def test_file_deleted_by_hand_is_not_reported(layout, tmp_path):
+    folder = str(tmp_path / '公众号')
+    path = write_article(folder, '手动删除.md', JAN)
+    os.remove(path)
+
+    assert Layout.find_article(folder, '手动删除.md') is None
+    assert Layout.list_article_files(folder) == []
+    # 过期的条目已从清单中去掉
+    Layout._manifests.clear()
+    assert Layout.get_manifest(folder).files() == []
+
+
+def test_file_added_by_hand_is_found_on_disk(layout, tmp_path):
+    folder = str(tmp_path / '公众号')
+    write_article(folder, '已登记.md', JAN)
+    manual = os.path.join(folder, '手动添加.md')
+    with open(manual, 'w', encoding='utf-8') as f:
+        f.write('正文')
+
+    assert Layout.find_article(folder, '手动添加.md') == manual
+
+
+def test_label_folder_named_like_a_shard_is_not_a_shard(layout, tmp_path):
+    label = str(tmp_path / '2024-01')
+    path = write_article(label, 'x.md', MAR)
+
+    assert os.path.exists(os.path.join(label, Layout.MANIFEST_FILENAME))
+    assert not os.path.exists(os.path.join(str(tmp_path), Layout.MANIFEST_FILENAME))
+    assert Layout.list_article_files(label) == [path]
+
+
+def test_rebuild_scans_folder_and_keeps_default_permissions(layout, tmp_path):
+    folder = str(tmp_path / '公众号')
+    for filename, publish_time in (('a.md', JAN), ('b.md', MAR)):
+        path = Layout.article_path(folder, filename, publish_time)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, 'w').close()
+
+    assert Layout.get_manifest(folder).rebuild() == 2
+    assert len(Layout.list_article_files(folder)) == 2
+    manifest_path = os.path.join(folder, Layout.MANIFEST_FILENAME)
+    assert stat.S_IMODE(os.stat(manifest_path).st_mode) == Layout.FILE_MODE
+    assert not [name for name in os.listdir(folder) if name.endswith('.tmp')]
+
+
+def test_flat_layout_does_not_use_manifest(layout, tmp_path):
+    layout['directory_layout'] = 'flat'
+    folder = str(tmp_path / '公众号')
+    path = write_article(folder, 'a.md', JAN)
+
+    assert not os.path.exists(os.path.join(folder, Layout.MANIFEST_FILENAME))
+    assert Layout.find_article(folder, 'a.md') == path
+
+
+def test_written_article_keeps_default_permissions_and_hardlink(tmp_path):
+    from WeChat import write_article_file
+
+    path = tmp_path / '文章.md'
+    path.write_text('旧内容', encoding='utf-8-sig')
+    linked = tmp_path / '已分类.md'
+    os.link(path, linked)
+
+    write_article_file(str(path), '新内容')
+    assert path.read_text(encoding='utf-8-sig') == '新内容'
+    assert linked.read_text(encoding='utf-8-sig') == '旧内容'
+    assert stat.S_IMODE(os.stat(path).st_mode) == Layout.FILE_MODE
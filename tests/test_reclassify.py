@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import pandas as pd
+import pytest
+
+import Reclassify
+
+
+@pytest.fixture
+def corpus(tmp_path, monkeypatch):
+    """两篇文章：一篇改判为其他分类，一篇分类时抛出异常"""
+    config = {'enable_search_index': False}
+    monkeypatch.setattr(Reclassify, 'load_app_config', lambda: config)
+    monkeypatch.setattr(Reclassify, 'rebuild_catalog_parquet', lambda folder: 0)
+    monkeypatch.setattr(Reclassify.Classification, 'reload_config', lambda: None)
+    monkeypatch.setattr(Reclassify, '_import_pandas', lambda: pd)
+
+    category_folder = tmp_path / '核心案例库'
+    for title in ('会改判的文章', '会出错的文章'):
+        folder = category_folder / '运营操作类'
+        folder.mkdir(parents=True, exist_ok=True)
+        (folder / f'{title}.md').write_text('正文', encoding='utf-8-sig')
+    pd.DataFrame([
+        {'序号': 1, '大类': '核心案例库', '小类': '运营操作类', '文档名称': '会改判的文章', '来源': 'a'},
+        {'序号': 2, '大类': '核心案例库', '小类': '运营操作类', '文档名称': '会出错的文章', '来源': 'b'},
+    ]).to_csv(category_folder / Reclassify.CATALOG_FILENAME, index=False, encoding='utf-8-sig')
+
+    def classify_file(file_path):
+        if '出错' in file_path:
+            raise KeyError('message')
+        return '经营决策类'
+
+    monkeypatch.setattr(Reclassify, '_classify_file', classify_file)
+    return tmp_path
+
+
+def test_failed_article_does_not_abort_run(corpus):
+    report = Reclassify.reclassify_corpus(str(corpus), '核心案例库', concurrency=1)
+
+    assert report['changed'] == 1
+    assert len(report['errors']) == 1
+    assert report['errors'][0]['file'] == '会出错的文章.md'
+    assert os.path.exists(corpus / '核心案例库' / '经营决策类' / '会改判的文章.md')
+    assert os.path.exists(corpus / '核心案例库' / '运营操作类' / '会出错的文章.md')
+
+    catalog = pd.read_csv(corpus / '核心案例库' / Reclassify.CATALOG_FILENAME, encoding='utf-8-sig')
+    labels = dict(zip(catalog['文档名称'], catalog['小类']))
+    assert labels == {'会改判的文章': '经营决策类', '会出错的文章': '运营操作类'}
+
+
+def test_catalog_updated_when_run_is_interrupted(corpus, monkeypatch):
+    def broken_raw_store(*args, **kwargs):
+        raise RuntimeError('原始HTML存储损坏')
+
+    monkeypatch.setattr(Reclassify, '_reclassify_raw_store', broken_raw_store)
+    with pytest.raises(RuntimeError):
+        Reclassify.reclassify_corpus(str(corpus), '核心案例库', concurrency=1, include_raw_store=True)
+
+    # 已移动的文章仍然登记到了资料汇总表
+    catalog = pd.read_csv(corpus / '核心案例库' / Reclassify.CATALOG_FILENAME, encoding='utf-8-sig')
+    assert dict(zip(catalog['文档名称'], catalog['小类']))['会改判的文章'] == '经营决策类'
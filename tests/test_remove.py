@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+
+from Remove import clean_catalog_records, clean_excel_records
+
+COLUMNS = ['序号', '大类', '小类', '文档名称', '入库日期', '来源', '发布日期']
+
+
+def write_csv(path, rows):
+    pd.DataFrame(rows, columns=COLUMNS).to_csv(path, index=False, encoding='utf-8-sig')
+
+
+def test_csv_duplicates_removed_and_blank_cells_kept_blank(tmp_path):
+    source = tmp_path / '资料汇总.csv'
+    write_csv(source, [
+        [1, '核心案例库', '经营决策类', '会员体系 (2).md', '2024-05-02', 'a', None],
+        [2, '核心案例库', '经营决策类', '会员体系', '2024-05-01', 'b', None],
+        [3, '核心案例库', '运营操作类', '会员体系', '2024-05-03', None, '2024-04-30'],
+    ])
+    output = tmp_path / 'cleaned.csv'
+    assert clean_catalog_records(str(source), str(output), chunksize=1) == (3, 2)
+
+    cleaned = pd.read_csv(output, encoding='utf-8-sig', dtype=str, keep_default_na=False)
+    assert cleaned['来源'].tolist() == ['b', '']
+    assert cleaned['发布日期'].tolist() == ['', '2024-04-30']
+
+
+def test_header_only_catalog_writes_header_only_file(tmp_path, capsys):
+    write_csv(tmp_path / '资料汇总.csv', [])
+    clean_excel_records(str(tmp_path), '资料汇总.csv', output_format='xlsx')
+
+    output = tmp_path / '资料汇总1_cleaned.xlsx'
+    assert output.exists()
+    assert list(pd.read_excel(output).columns) == COLUMNS
+    assert '没有记录' in capsys.readouterr().out
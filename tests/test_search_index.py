@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+import sqlite3
+
+import pytest
+
+from SearchIndex import SearchIndex, bigram_text
+
+
+@pytest.fixture
+def index(tmp_path):
+    search_index = SearchIndex(str(tmp_path / '_search_index.sqlite'))
+    search_index.add(str(tmp_path / 'a.md'), '会员体系升级', '核心案例库', '经营决策类', '门店推出付费会员，生鲜区客流上涨。')
+    search_index.add(str(tmp_path / 'b.md'), '自有品牌开发', '核心案例库', '运营操作类', '便利店开发自有品牌鲜食，AI选品。')
+    yield search_index
+    search_index.close()
+
+
+def titles(result):
+    return sorted(item['title'] for item in result['results'])
+
+
+def test_bigram_text():
+    assert bigram_text('会员店，AI') == '会员 员店 店 AI I'
+
+
+def test_short_terms_use_bigram_table(index):
+    assert titles(index.search('会员')) == ['会员体系升级']
+    assert titles(index.search('鲜')) == ['会员体系升级', '自有品牌开发']
+    assert titles(index.search('ai')) == ['自有品牌开发']
+    assert titles(index.search('鲜 客流上涨')) == ['会员体系升级']
+    assert index.search('会店')['total'] == 0
+
+
+def test_removed_article_leaves_bigram_table(index, tmp_path):
+    index.remove(str(tmp_path / 'a.md'))
+    assert index.search('会员')['total'] == 0
+    # 重新加入同一路径不会残留旧内容
+    index.add(str(tmp_path / 'b.md'), '自有品牌开发', '核心案例库', '运营操作类', '只剩新内容')
+    assert index.search('鲜食')['total'] == 0
+    assert titles(index.search('内容')) == ['自有品牌开发']
+
+
+def test_existing_index_is_backfilled(tmp_path):
+    path = str(tmp_path / '_search_index.sqlite')
+    old_index = SearchIndex(path)
+    old_index.add(str(tmp_path / 'a.md'), '会员体系升级', '核心案例库', '经营决策类', '付费会员')
+    old_index.close()
+    conn = sqlite3.connect(path)
+    conn.execute("DROP TABLE docs_bigram")
+    conn.commit()
+    conn.close()
+
+    reopened = SearchIndex(path)
+    assert titles(reopened.search('付费')) == ['会员体系升级']
+    reopened.close()
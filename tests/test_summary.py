@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+
+from Summary import is_boilerplate, split_markdown
+
+
+def test_header_and_footer_lines_are_removed():
+    for line in ('点击上方蓝字关注我们', '来源：联商网', '作者：张三', '点击“在看”支持一下',
+                 '点个在看你最好看', '点赞 在看 转发', '阅读原文', '转载请联系授权'):
+        assert is_boilerplate(line), line
+
+
+def test_short_content_lines_mentioning_keywords_are_kept():
+    for line in ('顾客点赞最多的是生鲜区', '门店转发会员群后客流上涨', '供应商投稿的陈列方案',
+                 '数据来源：门店POS系统', '在看板上标注缺货商品', '员工获赞赏后离职率下降'):
+        assert not is_boilerplate(line), line
+
+
+def test_split_markdown_stops_at_footer():
+    md = "点击上方蓝字关注我们\n\n## 生鲜损耗控制\n\n门店每天分三次调价，晚间转发会员群。\n\n往期推荐\n\n另一篇文章"
+    headings, paragraphs = split_markdown(md)
+    assert headings == ['生鲜损耗控制']
+    assert paragraphs == ['门店每天分三次调价，晚间转发会员群。']
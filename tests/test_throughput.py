@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+
+import WeChat
+from Throughput import _sample_article
+
+
+def test_sample_article_error_counts_as_failed(tmp_path, monkeypatch):
+    def broken_download(*args, **kwargs):
+        raise KeyError('content')
+
+    monkeypatch.setattr(WeChat, 'download_article', broken_download)
+    article = {'title': '抽样文章', 'link': 'https://mp.weixin.qq.com/s/1', 'create_time': 1705000000}
+    assert _sample_article(article, str(tmp_path), 'token', False, {}) == 'failed'
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+
+from WorkQueue import WorkQueue
+
+# 负的租约时长：领取后立即过期，模拟处理进程崩溃
+EXPIRED = -1
+
+
+@pytest.fixture
+def queue(tmp_path):
+    work_queue = WorkQueue(str(tmp_path / '原文章' / '_work_queue.sqlite'))
+    yield work_queue
+    work_queue.close()
+
+
+def create_job(queue, count=1):
+    job_id = queue.create_job('download', {'account': '测试号'})
+    queue.enqueue(job_id, [{'title': f'文章{i}', 'link': f'https://mp.weixin.qq.com/s/{i}'} for i in range(count)])
+    queue.set_job_state(job_id, 'running')
+    return job_id
+
+
+def test_leased_item_is_hidden_until_completed(queue):
+    job_id = create_job(queue)
+    item = queue.lease('worker-a')
+    assert item['attempts'] == 1
+    assert item['article']['title'] == '文章0'
+    assert queue.lease('worker-b') is None
+
+    assert queue.complete(item['id'], 'worker-a', {'status': 'downloaded'})
+    assert queue.collect_results(job_id) == [{'status': 'downloaded'}]
+    assert queue.collect_results(job_id) == []
+    assert not queue.has_pending(job_id)
+
+
+def test_expired_lease_is_taken_over(queue):
+    create_job(queue)
+    first = queue.lease('worker-a', visibility_timeout=EXPIRED)
+    second = queue.lease('worker-b')
+    assert second['id'] == first['id']
+    assert second['attempts'] == 2
+    # 原进程的租约已被接管，续租和提交结果都不再生效
+    assert not queue.extend(first['id'], 'worker-a')
+    assert not queue.complete(first['id'], 'worker-a', {'status': 'downloaded'})
+    assert queue.complete(second['id'], 'worker-b', {'status': 'downloaded'})
+
+
+def test_failed_item_requeued_until_max_attempts(queue):
+    job_id = create_job(queue)
+    for attempt in range(1, 4):
+        item = queue.lease('worker-a')
+        assert item['attempts'] == attempt
+        assert queue.fail(item['id'], 'worker-a', '下载失败', max_attempts=3)
+    assert queue.lease('worker-a') is None
+    stats = queue.job_stats(job_id)
+    assert stats['failed'] == 1
+    assert stats['queued'] == 0
+
+
+def test_expired_lease_at_max_attempts_is_failed(queue):
+    job_id = create_job(queue)
+    for _ in range(3):
+        assert queue.lease('worker-a', visibility_timeout=EXPIRED, max_attempts=3) is not None
+    assert queue.lease('worker-b', max_attempts=3) is None
+    stats = queue.job_stats(job_id)
+    assert stats['failed'] == 1
+    assert stats['leased'] == 0
+    assert not queue.has_pending(job_id)
+
+
+def test_cancelled_job_is_not_leased(queue):
+    job_id = create_job(queue)
+    queue.set_job_state(job_id, 'cancelled')
+    assert queue.lease('worker-a') is None
+
+
+def test_paths_saved_relative_to_queue_folder(queue, tmp_path):
+    output_dir = str(tmp_path / '原文章' / '测试号')
+    classification_folder = str(tmp_path / '智能分类')
+    assert queue.portable_path(output_dir) == '测试号'
+    assert queue.portable_path(classification_folder) == os.path.join('..', '智能分类')
+
+    # 其他电脑通过不同的挂载路径访问同一个队列文件
+    mounted = WorkQueue(str(tmp_path / 'mnt' / '原文章' / '_work_queue.sqlite'))
+    try:
+        assert mounted.resolve_path('测试号') == str(tmp_path / 'mnt' / '原文章' / '测试号')
+        assert mounted.resolve_path(os.path.join('..', '智能分类')) == str(tmp_path / 'mnt' / '智能分类')
+    finally:
+        mounted.close()
+
+
+def test_absolute_path_mapped_by_prefix(queue):
+    path_map = {'/data': '/mnt/share', '/data/智能分类': '/mnt/分类'}
+    assert queue.resolve_path('/data/智能分类/核心案例库', path_map) == '/mnt/分类/核心案例库'
+    assert queue.resolve_path('/data/原文章', path_map) == '/mnt/share/原文章'
+    assert queue.resolve_path('/other/原文章', path_map) == '/other/原文章'
+    assert queue.resolve_path('/database/原文章', path_map) == '/database/原文章'